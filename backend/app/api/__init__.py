@@ -5,6 +5,9 @@ from .canned_messages import router as canned_messages_router
 from .search import router as search_router
 from .websocket import router as websocket_router
 from .external import router as external_router
+from .debug import router as debug_router
+from .export import router as export_router
+from .jobs import router as jobs_router
 
 __all__ = [
     "customers_router",
@@ -13,5 +16,8 @@ __all__ = [
     "canned_messages_router",
     "search_router",
     "websocket_router",
-    "external_router"
+    "external_router",
+    "debug_router",
+    "export_router",
+    "jobs_router"
 ]
@@ -1,24 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from sqlalchemy import select
 from typing import List
 
-from ..database import get_db
+from ..database import get_read_db
 from ..models import Agent
 from ..schemas import AgentCreate, AgentResponse
+from ..services import presence_tracker, write_queue
 
 router = APIRouter(prefix="/agents", tags=["agents"])
 
 
+def with_presence(agent: Agent) -> AgentResponse:
+    """Build an agent response using live presence instead of the stored flag"""
+    return AgentResponse.model_validate(agent).model_copy(update={
+        "is_online": presence_tracker.is_online(agent.id),
+        "last_seen": presence_tracker.get_last_seen(agent.id) or agent.last_seen
+    })
+
+
 @router.get("/", response_model=List[AgentResponse])
-async def get_agents(db: AsyncSession = Depends(get_db)):
-    """Get all agents"""
+async def get_agents(db: AsyncSession = Depends(get_read_db)):
+    """Get all agents, with online state read from live presence"""
     result = await db.execute(select(Agent))
-    return result.scalars().all()
+    return [with_presence(agent) for agent in result.scalars().all()]
 
 
 @router.get("/{agent_id}", response_model=AgentResponse)
-async def get_agent(agent_id: int, db: AsyncSession = Depends(get_db)):
+async def get_agent(agent_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get a specific agent by ID"""
     result = await db.execute(select(Agent).where(Agent.id == agent_id))
     agent = result.scalar_one_or_none()
@@ -26,54 +36,51 @@ async def get_agent(agent_id: int, db: AsyncSession = Depends(get_db)):
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    return agent
+    return with_presence(agent)
 
 
 @router.post("/", response_model=AgentResponse)
-async def create_agent(agent: AgentCreate, db: AsyncSession = Depends(get_db)):
+async def create_agent(agent: AgentCreate):
     """Create a new agent"""
-    # Check if agent with email already exists
-    result = await db.execute(select(Agent).where(Agent.email == agent.email))
-    existing = result.scalar_one_or_none()
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Agent with this email already exists")
-    
-    db_agent = Agent(**agent.model_dump())
-    db.add(db_agent)
-    await db.commit()
-    await db.refresh(db_agent)
+    def store(db: Session):
+        # Check if agent with email already exists
+        result = db.execute(select(Agent).where(Agent.email == agent.email))
+        existing = result.scalar_one_or_none()
+        
+        if existing:
+            raise HTTPException(status_code=400, detail="Agent with this email already exists")
+        
+        db_agent = Agent(**agent.model_dump())
+        db.add(db_agent)
+        db.flush()
+        return db_agent
     
-    return db_agent
+    return await write_queue.submit(store)
 
 
 @router.put("/{agent_id}/online", response_model=AgentResponse)
-async def set_agent_online(agent_id: int, db: AsyncSession = Depends(get_db)):
-    """Set agent as online"""
+async def set_agent_online(agent_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Set agent as online (held in memory and flushed to the database in batches)"""
     result = await db.execute(select(Agent).where(Agent.id == agent_id))
     agent = result.scalar_one_or_none()
     
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    agent.is_online = True
-    await db.commit()
-    await db.refresh(agent)
+    await presence_tracker.set_online(agent_id, True)
     
-    return agent
+    return with_presence(agent)
 
 
 @router.put("/{agent_id}/offline", response_model=AgentResponse)
-async def set_agent_offline(agent_id: int, db: AsyncSession = Depends(get_db)):
-    """Set agent as offline"""
+async def set_agent_offline(agent_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Set agent as offline (held in memory and flushed to the database in batches)"""
     result = await db.execute(select(Agent).where(Agent.id == agent_id))
     agent = result.scalar_one_or_none()
     
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    agent.is_online = False
-    await db.commit()
-    await db.refresh(agent)
+    await presence_tracker.set_online(agent_id, False)
     
-    return agent
+    return with_presence(agent)
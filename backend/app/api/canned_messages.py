@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from sqlalchemy import select, desc
 from typing import List
 
-from ..database import get_db
+from ..database import get_read_db
 from ..models import CannedMessage
 from ..schemas import CannedMessageCreate, CannedMessageUpdate, CannedMessageResponse
+from ..services import write_queue
 
 router = APIRouter(prefix="/canned-messages", tags=["canned-messages"])
 
@@ -13,7 +15,7 @@ router = APIRouter(prefix="/canned-messages", tags=["canned-messages"])
 @router.get("/", response_model=List[CannedMessageResponse])
 async def get_canned_messages(
     category: str = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all canned messages, optionally filtered by category"""
     query = select(CannedMessage)
@@ -28,7 +30,7 @@ async def get_canned_messages(
 
 
 @router.get("/categories")
-async def get_categories(db: AsyncSession = Depends(get_db)):
+async def get_categories(db: AsyncSession = Depends(get_read_db)):
     """Get all unique categories"""
     query = select(CannedMessage.category).distinct().where(
         CannedMessage.category.isnot(None)
@@ -39,7 +41,7 @@ async def get_categories(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/{message_id}", response_model=CannedMessageResponse)
-async def get_canned_message(message_id: int, db: AsyncSession = Depends(get_db)):
+async def get_canned_message(message_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get a specific canned message"""
     result = await db.execute(
         select(CannedMessage).where(CannedMessage.id == message_id)
@@ -54,84 +56,87 @@ async def get_canned_message(message_id: int, db: AsyncSession = Depends(get_db)
 
 @router.post("/", response_model=CannedMessageResponse)
 async def create_canned_message(
-    message: CannedMessageCreate,
-    db: AsyncSession = Depends(get_db)
+    message: CannedMessageCreate
 ):
     """Create a new canned message"""
-    # Check if shortcut already exists
-    if message.shortcut:
-        result = await db.execute(
-            select(CannedMessage).where(CannedMessage.shortcut == message.shortcut)
-        )
-        if result.scalar_one_or_none():
-            raise HTTPException(
-                status_code=400,
-                detail="A canned message with this shortcut already exists"
+    def store(db: Session):
+        # Check if shortcut already exists
+        if message.shortcut:
+            result = db.execute(
+                select(CannedMessage).where(CannedMessage.shortcut == message.shortcut)
             )
+            if result.scalar_one_or_none():
+                raise HTTPException(
+                    status_code=400,
+                    detail="A canned message with this shortcut already exists"
+                )
+        
+        db_message = CannedMessage(**message.model_dump())
+        db.add(db_message)
+        db.flush()
+        return db_message
     
-    db_message = CannedMessage(**message.model_dump())
-    db.add(db_message)
-    await db.commit()
-    await db.refresh(db_message)
-    
-    return db_message
+    return await write_queue.submit(store)
 
 
 @router.put("/{message_id}", response_model=CannedMessageResponse)
 async def update_canned_message(
     message_id: int,
-    message: CannedMessageUpdate,
-    db: AsyncSession = Depends(get_db)
+    message: CannedMessageUpdate
 ):
     """Update a canned message"""
-    result = await db.execute(
-        select(CannedMessage).where(CannedMessage.id == message_id)
-    )
-    db_message = result.scalar_one_or_none()
-    
-    if not db_message:
-        raise HTTPException(status_code=404, detail="Canned message not found")
-    
-    update_data = message.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_message, field, value)
-    
-    await db.commit()
-    await db.refresh(db_message)
+    def store(db: Session):
+        result = db.execute(
+            select(CannedMessage).where(CannedMessage.id == message_id)
+        )
+        db_message = result.scalar_one_or_none()
+        
+        if not db_message:
+            raise HTTPException(status_code=404, detail="Canned message not found")
+        
+        update_data = message.model_dump(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(db_message, field, value)
+        
+        db.flush()
+        return db_message
     
-    return db_message
+    return await write_queue.submit(store)
 
 
 @router.delete("/{message_id}")
-async def delete_canned_message(message_id: int, db: AsyncSession = Depends(get_db)):
+async def delete_canned_message(message_id: int):
     """Delete a canned message"""
-    result = await db.execute(
-        select(CannedMessage).where(CannedMessage.id == message_id)
-    )
-    db_message = result.scalar_one_or_none()
-    
-    if not db_message:
-        raise HTTPException(status_code=404, detail="Canned message not found")
+    def store(db: Session):
+        result = db.execute(
+            select(CannedMessage).where(CannedMessage.id == message_id)
+        )
+        db_message = result.scalar_one_or_none()
+        
+        if not db_message:
+            raise HTTPException(status_code=404, detail="Canned message not found")
+        
+        db.delete(db_message)
     
-    await db.delete(db_message)
-    await db.commit()
+    await write_queue.submit(store)
     
     return {"success": True}
 
 
 @router.post("/{message_id}/use", response_model=CannedMessageResponse)
-async def use_canned_message(message_id: int, db: AsyncSession = Depends(get_db)):
+async def use_canned_message(message_id: int):
     """Increment usage count when a canned message is used"""
-    result = await db.execute(
-        select(CannedMessage).where(CannedMessage.id == message_id)
-    )
-    db_message = result.scalar_one_or_none()
-    
-    if not db_message:
-        raise HTTPException(status_code=404, detail="Canned message not found")
-    
-    db_message.usage_count += 1
-    await db.commit()
-    await db.refresh(db_message)
-    
-    return db_message
+    def store(db: Session):
+        result = db.execute(
+            select(CannedMessage).where(CannedMessage.id == message_id)
+        )
+        db_message = result.scalar_one_or_none()
+        
+        if not db_message:
+            raise HTTPException(status_code=404, detail="Canned message not found")
+        
+        db_message.usage_count += 1
+        db.flush()
+        return db_message
+    
+    return await write_queue.submit(store)
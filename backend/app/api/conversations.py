@@ -1,20 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, desc, func, and_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, or_, desc, func, and_, case, update
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 from datetime import datetime
 
-from ..database import get_db
-from ..models import Conversation, Message, Customer, Agent, MessagePriority, MessageStatus
+from ..database import get_read_db
+from ..models import Conversation, ArchivedConversation, Message, Customer, Agent, MessagePriority, MessageStatus
 from ..schemas import (
     ConversationResponse, ConversationListResponse, ConversationUpdate,
     AgentMessageSend, MessageResponse, MessagePriorityEnum, MessageStatusEnum
 )
-from ..services import manager
+from ..services import (
+    manager, routing_engine, sla_scheduler, write_queue, get_replica_db, customer_overviews, inbox_views,
+    conversation_cache
+)
+from ..services.event_service import bump_version, stats_state, stats_delta, conversation_summary
 
 router = APIRouter(prefix="/conversations", tags=["conversations"])
 
+PRIORITY_RANK = {
+    MessagePriority.URGENT: 3,
+    MessagePriority.HIGH: 2,
+    MessagePriority.MEDIUM: 1,
+    MessagePriority.LOW: 0
+}
+
 
 @router.get("/", response_model=List[ConversationListResponse])
 async def get_conversations(
@@ -24,7 +35,7 @@ async def get_conversations(
     priority: Optional[MessagePriorityEnum] = None,
     agent_id: Optional[int] = None,
     unassigned: bool = False,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_replica_db)
 ):
     """
     Get all conversations with filters.
@@ -50,11 +61,10 @@ async def get_conversations(
     
     # Order by priority (URGENT > HIGH > MEDIUM > LOW) and then by update time
     query = query.order_by(
-        # Priority ordering - urgent first
-        desc(Conversation.priority == MessagePriority.URGENT),
-        desc(Conversation.priority == MessagePriority.HIGH),
-        desc(Conversation.priority == MessagePriority.MEDIUM),
-        desc(Conversation.updated_at)
+        # Priority ordering - urgent first, as a single sort key
+        case(*[(Conversation.priority == p, rank) for p, rank in PRIORITY_RANK.items()], else_=0).desc(),
+        desc(Conversation.updated_at),
+        desc(Conversation.id)
     ).offset(skip).limit(limit)
     
     result = await db.execute(query)
@@ -74,6 +84,7 @@ async def get_conversations(
             subject=conv.subject,
             created_at=conv.created_at,
             updated_at=conv.updated_at,
+            version=conv.version,
             customer=conv.customer,
             assigned_agent=conv.assigned_agent,
             last_message=last_message,
@@ -84,7 +95,7 @@ async def get_conversations(
 
 
 @router.get("/stats")
-async def get_conversation_stats(db: AsyncSession = Depends(get_db)):
+async def get_conversation_stats(db: AsyncSession = Depends(get_replica_db)):
     """Get conversation statistics"""
     # Total conversations by status
     status_query = select(
@@ -112,69 +123,141 @@ async def get_conversation_stats(db: AsyncSession = Depends(get_db)):
     result = await db.execute(unassigned_query)
     unassigned_count = result.scalar()
     
+    archived_count = await db.scalar(select(func.count(ArchivedConversation.id)))
+    
     return {
         "by_status": status_counts,
         "by_priority": priority_counts,
-        "unassigned": unassigned_count
+        "unassigned": unassigned_count,
+        "archived": archived_count
     }
 
 
+@router.get("/views")
+async def get_inbox_views():
+    """Get live inbox views and their subscribers"""
+    return inbox_views.get_stats()
+
+
+@router.get("/routing")
+async def get_routing_stats():
+    """Get automatic routing queue and agent load statistics"""
+    return routing_engine.get_stats()
+
+
+@router.get("/sla")
+async def get_sla_stats():
+    """Get response-time SLA tracking statistics"""
+    return sla_scheduler.get_stats()
+
+
+@router.get("/cache")
+async def get_conversation_cache_stats():
+    """Get hot conversation cache statistics"""
+    return conversation_cache.get_stats()
+
+
 @router.get("/{conversation_id}", response_model=ConversationResponse)
-async def get_conversation(conversation_id: int, db: AsyncSession = Depends(get_db)):
-    """Get a specific conversation with all messages"""
-    query = select(Conversation).where(
-        Conversation.id == conversation_id
-    ).options(
-        selectinload(Conversation.customer),
-        selectinload(Conversation.assigned_agent),
-        selectinload(Conversation.messages)
-    )
-    
-    result = await db.execute(query)
-    conversation = result.scalar_one_or_none()
-    
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
+async def get_conversation(
+    conversation_id: int,
+    message_limit: Optional[int] = Query(default=None, ge=1, description="Only the most recent messages"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get a specific conversation with all messages, or its most recent ones"""
+    # Open and in-progress conversations are usually answered from memory
+    body = conversation_cache.get(conversation_id, message_limit)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+    token = conversation_cache.reserve(conversation_id)
+    try:
+        query = select(Conversation).where(
+            Conversation.id == conversation_id
+        ).options(
+            selectinload(Conversation.customer),
+            selectinload(Conversation.assigned_agent),
+            selectinload(Conversation.messages)
+        )
+        
+        result = await db.execute(query)
+        conversation = result.scalar_one_or_none()
+        
+        if not conversation:
+            # Old resolved conversations live in the archive tables
+            result = await db.execute(
+                select(ArchivedConversation).where(
+                    ArchivedConversation.id == conversation_id
+                ).options(
+                    selectinload(ArchivedConversation.customer),
+                    selectinload(ArchivedConversation.assigned_agent),
+                    selectinload(ArchivedConversation.messages)
+                )
+            )
+            conversation = result.scalar_one_or_none()
+        
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        conversation_cache.fill(token, conversation)
+    finally:
+        # Not found or failed: nothing will fill this reservation
+        conversation_cache.release(conversation_id, token)
+    
+    if message_limit is not None:
+        response = ConversationResponse.model_validate(conversation)
+        response.messages = response.messages[-message_limit:]
+        return response
     return conversation
 
 
 @router.put("/{conversation_id}", response_model=ConversationResponse)
 async def update_conversation(
     conversation_id: int,
-    update: ConversationUpdate,
-    db: AsyncSession = Depends(get_db)
+    update: ConversationUpdate
 ):
     """Update conversation status, priority, or assign agent"""
-    query = select(Conversation).where(
-        Conversation.id == conversation_id
-    ).options(
-        selectinload(Conversation.customer),
-        selectinload(Conversation.assigned_agent),
-        selectinload(Conversation.messages)
-    )
-    
-    result = await db.execute(query)
-    conversation = result.scalar_one_or_none()
-    
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    update_data = update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(conversation, field, value)
+    def store(db: Session):
+        query = select(Conversation).where(
+            Conversation.id == conversation_id
+        ).options(
+            selectinload(Conversation.customer),
+            selectinload(Conversation.assigned_agent),
+            selectinload(Conversation.messages)
+        )
+        
+        result = db.execute(query)
+        conversation = result.scalar_one_or_none()
+        
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        before = stats_state(conversation)
+        
+        update_data = update.model_dump(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(conversation, field, value)
+        
+        conversation.updated_at = datetime.utcnow()
+        bump_version(conversation)
+        db.flush()
+        # Reload the assigned agent if the assignment changed
+        db.refresh(conversation, ["assigned_agent"])
+        return conversation, before
     
-    conversation.updated_at = datetime.utcnow()
-    await db.commit()
-    await db.refresh(conversation)
+    conversation, before = await write_queue.submit(store)
+    customer_overviews.invalidate(conversation.customer_id)
+    conversation_cache.conversation_changed(conversation, conversation.assigned_agent)
     
     # Broadcast update
+    agent_name = conversation.assigned_agent.name if conversation.assigned_agent else None
     await manager.broadcast_conversation_update({
         "id": conversation.id,
         "status": conversation.status.value,
         "priority": conversation.priority.value,
-        "agent_id": conversation.agent_id
+        "agent_id": conversation.agent_id,
+        "agent_name": agent_name,
+        "conversation": conversation_summary(conversation, agent_name),
+        "stats_delta": stats_delta(before, stats_state(conversation))
     })
+    sla_scheduler.conversation_updated(conversation)
+    await routing_engine.sync_conversation(conversation)
     
     return conversation
 
@@ -182,55 +265,61 @@ async def update_conversation(
 @router.post("/{conversation_id}/messages", response_model=MessageResponse)
 async def send_agent_message(
     conversation_id: int,
-    message: AgentMessageSend,
-    db: AsyncSession = Depends(get_db)
+    message: AgentMessageSend
 ):
     """Agent sends a message in a conversation"""
-    # Verify conversation exists
-    conv_query = select(Conversation).where(
-        Conversation.id == conversation_id
-    ).options(selectinload(Conversation.customer))
-    
-    result = await db.execute(conv_query)
-    conversation = result.scalar_one_or_none()
-    
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    # Check if conversation is assigned to another agent
-    if conversation.agent_id is not None and conversation.agent_id != message.agent_id:
-        raise HTTPException(
-            status_code=403, 
-            detail="This conversation is assigned to another agent. You cannot send messages here."
+    def store(db: Session):
+        # Verify conversation exists
+        conv_query = select(Conversation).where(
+            Conversation.id == conversation_id
+        ).options(selectinload(Conversation.customer))
+        
+        result = db.execute(conv_query)
+        conversation = result.scalar_one_or_none()
+        
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        
+        # Check if conversation is assigned to another agent
+        if conversation.agent_id is not None and conversation.agent_id != message.agent_id:
+            raise HTTPException(
+                status_code=403, 
+                detail="This conversation is assigned to another agent. You cannot send messages here."
+            )
+        
+        # Verify agent exists
+        agent_query = select(Agent).where(Agent.id == message.agent_id)
+        result = db.execute(agent_query)
+        agent = result.scalar_one_or_none()
+        
+        if not agent:
+            raise HTTPException(status_code=404, detail="Agent not found")
+        before = stats_state(conversation)
+        
+        # Create the message
+        db_message = Message(
+            conversation_id=conversation_id,
+            agent_id=message.agent_id,
+            content=message.content,
+            is_from_customer=False,
+            priority=MessagePriority.MEDIUM
         )
+        db.add(db_message)
+        
+        # Update conversation
+        conversation.updated_at = datetime.utcnow()
+        if conversation.agent_id is None:
+            conversation.agent_id = message.agent_id
+        if conversation.status == MessageStatus.OPEN:
+            conversation.status = MessageStatus.IN_PROGRESS
+        bump_version(conversation)
+        
+        db.flush()
+        return conversation, agent, db_message, before, conversation_cache.load_for_write(db, conversation)
     
-    # Verify agent exists
-    agent_query = select(Agent).where(Agent.id == message.agent_id)
-    result = await db.execute(agent_query)
-    agent = result.scalar_one_or_none()
-    
-    if not agent:
-        raise HTTPException(status_code=404, detail="Agent not found")
-    
-    # Create the message
-    db_message = Message(
-        conversation_id=conversation_id,
-        agent_id=message.agent_id,
-        content=message.content,
-        is_from_customer=False,
-        priority=MessagePriority.MEDIUM
-    )
-    db.add(db_message)
-    
-    # Update conversation
-    conversation.updated_at = datetime.utcnow()
-    if conversation.agent_id is None:
-        conversation.agent_id = message.agent_id
-    if conversation.status == MessageStatus.OPEN:
-        conversation.status = MessageStatus.IN_PROGRESS
-    
-    await db.commit()
-    await db.refresh(db_message)
+    conversation, agent, db_message, before, loaded = await write_queue.submit(store)
+    customer_overviews.invalidate(conversation.customer_id)
+    conversation_cache.add_message(conversation, db_message, agent, conversation.customer, loaded)
     
     # Broadcast new message
     await manager.broadcast_new_message({
@@ -241,86 +330,109 @@ async def send_agent_message(
         "is_from_customer": False,
         "priority": db_message.priority.value,
         "created_at": db_message.created_at.isoformat() + "Z",
-        "agent_name": agent.name
+        "agent_name": agent.name,
+        "conversation": conversation_summary(conversation, agent.name),
+        "stats_delta": stats_delta(before, stats_state(conversation))
     })
+    sla_scheduler.agent_replied(conversation)
+    await routing_engine.sync_conversation(conversation)
     
     return db_message
 
 
 @router.post("/{conversation_id}/read")
 async def mark_messages_read(
-    conversation_id: int,
-    db: AsyncSession = Depends(get_db)
+    conversation_id: int
 ):
     """Mark all customer messages in a conversation as read"""
-    query = select(Message).where(
-        Message.conversation_id == conversation_id,
-        Message.is_from_customer == True,
-        Message.read_at.is_(None)
-    )
-    
-    result = await db.execute(query)
-    messages = result.scalars().all()
-    
-    now = datetime.utcnow()
-    for msg in messages:
-        msg.read_at = now
-    
-    await db.commit()
-    
-    return {"marked_read": len(messages)}
+    def store(db: Session):
+        read_at = datetime.utcnow()
+        result = db.execute(
+            update(Message)
+            .where(
+                Message.conversation_id == conversation_id,
+                Message.is_from_customer.is_(True),
+                Message.read_at.is_(None)
+            )
+            .values(read_at=read_at)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            return 0, None, read_at
+        customer_id = db.execute(
+            select(Conversation.customer_id).where(Conversation.id == conversation_id)
+        ).scalar_one_or_none()
+        return result.rowcount, customer_id, read_at
+    
+    marked, customer_id, read_at = await write_queue.submit(store)
+    if customer_id is not None:
+        customer_overviews.invalidate(customer_id)
+        conversation_cache.mark_read(conversation_id, read_at)
+        await manager.broadcast_messages_read({"conversation_id": conversation_id, "unread_count": 0})
+    
+    return {"marked_read": marked}
 
 
 @router.post("/{conversation_id}/assign/{agent_id}")
 async def assign_conversation(
     conversation_id: int,
     agent_id: int,
-    force: bool = Query(default=False, description="Force reassignment even if already assigned"),
-    db: AsyncSession = Depends(get_db)
+    force: bool = Query(default=False, description="Force reassignment even if already assigned")
 ):
     """Assign a conversation to an agent"""
-    # Verify conversation exists
-    conv_result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
-    )
-    conversation = conv_result.scalar_one_or_none()
-    
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    # Check if already assigned to another agent
-    if conversation.agent_id is not None and conversation.agent_id != agent_id and not force:
-        # Get the current agent's name
-        current_agent_result = await db.execute(
-            select(Agent).where(Agent.id == conversation.agent_id)
+    def store(db: Session):
+        # Verify conversation exists
+        conv_result = db.execute(
+            select(Conversation).where(Conversation.id == conversation_id)
         )
-        current_agent = current_agent_result.scalar_one_or_none()
-        agent_name = current_agent.name if current_agent else "another agent"
-        raise HTTPException(
-            status_code=409, 
-            detail=f"This conversation is already assigned to {agent_name}. Use force=true to reassign."
+        conversation = conv_result.scalar_one_or_none()
+        
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        
+        # Check if already assigned to another agent
+        if conversation.agent_id is not None and conversation.agent_id != agent_id and not force:
+            # Get the current agent's name
+            current_agent_result = db.execute(
+                select(Agent).where(Agent.id == conversation.agent_id)
+            )
+            current_agent = current_agent_result.scalar_one_or_none()
+            agent_name = current_agent.name if current_agent else "another agent"
+            raise HTTPException(
+                status_code=409, 
+                detail=f"This conversation is already assigned to {agent_name}. Use force=true to reassign."
+            )
+        
+        # Verify agent exists
+        agent_result = db.execute(
+            select(Agent).where(Agent.id == agent_id)
         )
+        agent = agent_result.scalar_one_or_none()
+        
+        if not agent:
+            raise HTTPException(status_code=404, detail="Agent not found")
+        before = stats_state(conversation)
+        
+        conversation.agent_id = agent_id
+        conversation.updated_at = datetime.utcnow()
+        bump_version(conversation)
+        db.flush()
+        return conversation, agent, before
     
-    # Verify agent exists
-    agent_result = await db.execute(
-        select(Agent).where(Agent.id == agent_id)
-    )
-    agent = agent_result.scalar_one_or_none()
-    
-    if not agent:
-        raise HTTPException(status_code=404, detail="Agent not found")
-    
-    conversation.agent_id = agent_id
-    conversation.updated_at = datetime.utcnow()
-    
-    await db.commit()
+    conversation, agent, before = await write_queue.submit(store)
+    customer_overviews.invalidate(conversation.customer_id)
+    conversation_cache.conversation_changed(conversation, agent)
     
     # Broadcast update
     await manager.broadcast_conversation_update({
         "id": conversation.id,
         "agent_id": agent_id,
-        "agent_name": agent.name
+        "agent_name": agent.name,
+        "conversation": conversation_summary(conversation, agent.name),
+        "stats_delta": stats_delta(before, stats_state(conversation))
     })
+    sla_scheduler.conversation_updated(conversation)
+    await routing_engine.sync_conversation(conversation)
     
     return {"success": True, "agent_id": agent_id, "agent_name": agent.name}
 
@@ -328,36 +440,47 @@ async def assign_conversation(
 @router.post("/{conversation_id}/release")
 async def release_conversation(
     conversation_id: int,
-    agent_id: int = Query(..., description="ID of the agent releasing the conversation"),
-    db: AsyncSession = Depends(get_db)
+    agent_id: int = Query(..., description="ID of the agent releasing the conversation")
 ):
     """Release a conversation from an agent (unassign)"""
-    # Verify conversation exists
-    conv_result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
-    )
-    conversation = conv_result.scalar_one_or_none()
-    
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    # Check if the requesting agent owns this conversation
-    if conversation.agent_id != agent_id:
-        raise HTTPException(
-            status_code=403, 
-            detail="You can only release conversations assigned to you"
+    def store(db: Session):
+        # Verify conversation exists
+        conv_result = db.execute(
+            select(Conversation).where(Conversation.id == conversation_id)
         )
+        conversation = conv_result.scalar_one_or_none()
+        
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        
+        # Check if the requesting agent owns this conversation
+        if conversation.agent_id != agent_id:
+            raise HTTPException(
+                status_code=403, 
+                detail="You can only release conversations assigned to you"
+            )
+        
+        before = stats_state(conversation)
+        conversation.agent_id = None
+        conversation.updated_at = datetime.utcnow()
+        bump_version(conversation)
+        db.flush()
+        return conversation, before
     
-    conversation.agent_id = None
-    conversation.updated_at = datetime.utcnow()
-    
-    await db.commit()
+    conversation, before = await write_queue.submit(store)
+    customer_overviews.invalidate(conversation.customer_id)
+    conversation_cache.conversation_changed(conversation)
     
     # Broadcast update
     await manager.broadcast_conversation_update({
         "id": conversation.id,
         "agent_id": None,
-        "agent_name": None
+        "agent_name": None,
+        "conversation": conversation_summary(conversation),
+        "stats_delta": stats_delta(before, stats_state(conversation))
     })
+    # Released conversations go back to the routing queue
+    sla_scheduler.conversation_updated(conversation)
+    await routing_engine.sync_conversation(conversation)
     
     return {"success": True, "message": "Conversation released"}
@@ -1,27 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, desc, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, or_, and_, desc, func, case
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 from datetime import datetime
 
-from ..database import get_db
-from ..models import Customer, Conversation, Message, MessagePriority, MessageStatus
+from ..database import get_read_db, read_session_maker
+from ..models import (
+    Customer, Conversation, ArchivedConversation, Message, ArchivedMessage, MessagePriority, MessageStatus
+)
 from ..schemas import (
-    CustomerCreate, CustomerUpdate, CustomerResponse,
+    CustomerCreate, CustomerUpdate, CustomerResponse, CustomerOverviewResponse,
     MessageSend, ConversationListResponse, MessageResponse
 )
-from ..services import detect_priority, manager
+from ..services import (
+    detect_priority, manager, routing_engine, sla_scheduler, write_queue, get_replica_db, customer_overviews,
+    conversation_cache
+)
+from ..services.metrics_service import messages_ingested
+from ..services.event_service import bump_version, stats_state, stats_delta, unread_count, conversation_summary
 
 router = APIRouter(prefix="/customers", tags=["customers"])
 
+# Conversation summaries and recent messages included in the customer overview
+OVERVIEW_CONVERSATIONS = 50
+OVERVIEW_RECENT_MESSAGES = 10
+
 
 @router.get("/", response_model=List[CustomerResponse])
 async def get_customers(
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_replica_db)
 ):
     """Get all customers with optional search"""
     query = select(Customer)
@@ -42,7 +53,7 @@ async def get_customers(
 
 
 @router.get("/{customer_id}", response_model=CustomerResponse)
-async def get_customer(customer_id: int, db: AsyncSession = Depends(get_db)):
+async def get_customer(customer_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get a specific customer by ID"""
     result = await db.execute(select(Customer).where(Customer.id == customer_id))
     customer = result.scalar_one_or_none()
@@ -54,51 +65,55 @@ async def get_customer(customer_id: int, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/", response_model=CustomerResponse)
-async def create_customer(customer: CustomerCreate, db: AsyncSession = Depends(get_db)):
+async def create_customer(customer: CustomerCreate):
     """Create a new customer"""
-    # Check if customer with email already exists
-    result = await db.execute(select(Customer).where(Customer.email == customer.email))
-    existing = result.scalar_one_or_none()
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Customer with this email already exists")
-    
-    db_customer = Customer(**customer.model_dump())
-    db.add(db_customer)
-    await db.commit()
-    await db.refresh(db_customer)
+    def store(db: Session):
+        # Check if customer with email already exists
+        result = db.execute(select(Customer).where(Customer.email == customer.email))
+        existing = result.scalar_one_or_none()
+        
+        if existing:
+            raise HTTPException(status_code=400, detail="Customer with this email already exists")
+        
+        db_customer = Customer(**customer.model_dump())
+        db.add(db_customer)
+        db.flush()
+        return db_customer
     
-    return db_customer
+    return await write_queue.submit(store)
 
 
 @router.put("/{customer_id}", response_model=CustomerResponse)
 async def update_customer(
     customer_id: int,
-    customer: CustomerUpdate,
-    db: AsyncSession = Depends(get_db)
+    customer: CustomerUpdate
 ):
     """Update a customer"""
-    result = await db.execute(select(Customer).where(Customer.id == customer_id))
-    db_customer = result.scalar_one_or_none()
-    
-    if not db_customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
-    
-    update_data = customer.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_customer, field, value)
-    
-    db_customer.last_activity = datetime.utcnow()
-    await db.commit()
-    await db.refresh(db_customer)
+    def store(db: Session):
+        result = db.execute(select(Customer).where(Customer.id == customer_id))
+        db_customer = result.scalar_one_or_none()
+        
+        if not db_customer:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        
+        update_data = customer.model_dump(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(db_customer, field, value)
+        
+        db_customer.last_activity = datetime.utcnow()
+        db.flush()
+        return db_customer
     
+    db_customer = await write_queue.submit(store)
+    customer_overviews.invalidate(customer_id)
+    conversation_cache.drop_customer(customer_id)
     return db_customer
 
 
 @router.get("/{customer_id}/conversations", response_model=List[ConversationListResponse])
 async def get_customer_conversations(
     customer_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_replica_db)
 ):
     """Get all conversations for a customer"""
     query = select(Conversation).where(
@@ -110,7 +125,20 @@ async def get_customer_conversations(
     ).order_by(desc(Conversation.updated_at))
     
     result = await db.execute(query)
-    conversations = result.scalars().all()
+    conversations = list(result.scalars().all())
+    
+    # Include history moved to the archive tables
+    archived_query = select(ArchivedConversation).where(
+        ArchivedConversation.customer_id == customer_id
+    ).options(
+        selectinload(ArchivedConversation.customer),
+        selectinload(ArchivedConversation.assigned_agent),
+        selectinload(ArchivedConversation.messages)
+    ).order_by(desc(ArchivedConversation.updated_at))
+    result = await db.execute(archived_query)
+    archived = result.scalars().all()
+    if archived:
+        conversations = sorted(conversations + list(archived), key=lambda c: c.updated_at, reverse=True)
     
     response = []
     for conv in conversations:
@@ -126,53 +154,210 @@ async def get_customer_conversations(
             subject=conv.subject,
             created_at=conv.created_at,
             updated_at=conv.updated_at,
+            version=conv.version,
             customer=conv.customer,
             assigned_agent=conv.assigned_agent,
             last_message=last_message,
-            unread_count=unread_count
+            unread_count=unread_count,
+            archived=getattr(conv, "archived", False)
         ))
     
     return response
 
 
+async def build_customer_overview(customer_id: int) -> Optional[bytes]:
+    """
+    Encoded overview of a customer, or None if there is no such customer.
+    Counts and last messages come from aggregate queries, so no conversation's
+    full message history is loaded. Reads the primary: a cached overview must
+    not come from a lagging replica.
+    """
+    async with read_session_maker() as db:
+        result = await db.execute(select(Customer).where(Customer.id == customer_id))
+        customer = result.scalar_one_or_none()
+        if not customer:
+            return None
+        
+        conversations = []
+        stats = {}
+        last_messages = {}
+        recent_messages = []
+        # Hot tables first; the archive only holds older history
+        for conversation_model, message_model in (
+            (Conversation, Message), (ArchivedConversation, ArchivedMessage)
+        ):
+            result = await db.execute(
+                select(conversation_model)
+                .where(conversation_model.customer_id == customer_id)
+                .options(selectinload(conversation_model.assigned_agent))
+            )
+            found = result.scalars().all()
+            if not found:
+                continue
+            conversations.extend(found)
+            ids = [c.id for c in found]
+            
+            unread = and_(message_model.is_from_customer.is_(True), message_model.read_at.is_(None))
+            result = await db.execute(
+                select(
+                    message_model.conversation_id,
+                    func.count(message_model.id),
+                    func.sum(case((unread, 1), else_=0)),
+                    func.min(message_model.created_at),
+                    func.max(message_model.created_at)
+                )
+                .where(message_model.conversation_id.in_(ids))
+                .group_by(message_model.conversation_id)
+            )
+            stats.update({row[0]: row[1:] for row in result.all()})
+            
+            # Newest message of each conversation
+            ranked = select(
+                message_model.id,
+                func.row_number().over(
+                    partition_by=message_model.conversation_id,
+                    order_by=(desc(message_model.created_at), desc(message_model.id))
+                ).label("rank")
+            ).where(message_model.conversation_id.in_(ids)).subquery()
+            result = await db.execute(
+                select(message_model).join(ranked, ranked.c.id == message_model.id).where(ranked.c.rank == 1)
+            )
+            last_messages.update({m.conversation_id: m for m in result.scalars().all()})
+            
+            if len(recent_messages) < OVERVIEW_RECENT_MESSAGES:
+                result = await db.execute(
+                    select(message_model)
+                    .where(message_model.conversation_id.in_(ids))
+                    .order_by(desc(message_model.created_at), desc(message_model.id))
+                    .limit(OVERVIEW_RECENT_MESSAGES - len(recent_messages))
+                )
+                recent_messages.extend(result.scalars().all())
+    
+    conversations.sort(key=lambda c: c.updated_at, reverse=True)
+    priority_counts = {priority: 0 for priority in MessagePriority}
+    for conv in conversations:
+        priority_counts[conv.priority] += 1
+    contacts = [(first, last) for _, _, first, last in stats.values()]
+    
+    overview = CustomerOverviewResponse(
+        customer=customer,
+        conversations=[
+            ConversationListResponse(
+                id=conv.id,
+                customer_id=conv.customer_id,
+                agent_id=conv.agent_id,
+                status=conv.status,
+                priority=conv.priority,
+                subject=conv.subject,
+                created_at=conv.created_at,
+                updated_at=conv.updated_at,
+                version=conv.version,
+                assigned_agent=conv.assigned_agent,
+                last_message=last_messages.get(conv.id),
+                unread_count=stats[conv.id][1] if conv.id in stats else 0,
+                archived=getattr(conv, "archived", False)
+            )
+            for conv in conversations[:OVERVIEW_CONVERSATIONS]
+        ],
+        total_conversations=len(conversations),
+        open_conversations=sum(
+            1 for c in conversations if c.status in (MessageStatus.OPEN, MessageStatus.IN_PROGRESS)
+        ),
+        total_messages=sum(count for count, _, _, _ in stats.values()),
+        unread_count=sum(unread for _, unread, _, _ in stats.values()),
+        priority_counts={priority.value: count for priority, count in priority_counts.items()},
+        first_contact_at=min((first for first, _ in contacts), default=None),
+        last_contact_at=max((last for _, last in contacts), default=None),
+        recent_messages=recent_messages
+    )
+    return overview.model_dump_json().encode()
+
+
+@router.get("/{customer_id}/overview", response_model=CustomerOverviewResponse)
+async def get_customer_overview(customer_id: int):
+    """
+    Everything the customer panel shows in one request: profile, conversation
+    summaries, message and unread counts, a priority histogram, first and last
+    contact and the latest messages. Cached per customer for a few seconds.
+    """
+    body = await customer_overviews.get(customer_id, lambda: build_customer_overview(customer_id))
+    if body is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return Response(content=body, media_type="application/json")
+
+
 @router.post("/{customer_id}/messages", response_model=MessageResponse)
 async def send_customer_message(
     customer_id: int,
-    message: MessageSend,
-    db: AsyncSession = Depends(get_db)
+    message: MessageSend
 ):
     """Customer sends a new message (creates conversation if needed)"""
-    # Verify customer exists
-    result = await db.execute(select(Customer).where(Customer.id == customer_id))
-    customer = result.scalar_one_or_none()
-    
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
-    
     # Detect message priority
     priority, confidence = detect_priority(message.content)
     
-    # Find open conversation or create new one
-    conv_query = select(Conversation).where(
-        Conversation.customer_id == customer_id,
-        Conversation.status.in_([MessageStatus.OPEN, MessageStatus.IN_PROGRESS])
-    ).order_by(desc(Conversation.updated_at))
-    
-    result = await db.execute(conv_query)
-    conversation = result.scalar_one_or_none()
-    
-    if not conversation:
-        # Create new conversation
-        conversation = Conversation(
+    def store(db: Session):
+        # Verify customer exists
+        result = db.execute(select(Customer).where(Customer.id == customer_id))
+        customer = result.scalar_one_or_none()
+        
+        if not customer:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        
+        # Find open conversation or create new one
+        conv_query = select(Conversation).where(
+            Conversation.customer_id == customer_id,
+            Conversation.status.in_([MessageStatus.OPEN, MessageStatus.IN_PROGRESS])
+        ).order_by(desc(Conversation.updated_at))
+        
+        result = db.execute(conv_query)
+        conversation = result.scalar_one_or_none()
+        created = conversation is None
+        before = None if created else stats_state(conversation)
+        
+        if created:
+            # Create new conversation
+            conversation = Conversation(
+                customer_id=customer_id,
+                status=MessageStatus.OPEN,
+                priority=priority,
+                subject=message.content[:100] if len(message.content) > 100 else message.content
+            )
+            db.add(conversation)
+            db.flush()
+        else:
+            # Update conversation priority if new message is more urgent
+            if priority.value > conversation.priority.value:
+                conversation.priority = priority
+            bump_version(conversation)
+        
+        # Create the message
+        db_message = Message(
+            conversation_id=conversation.id,
             customer_id=customer_id,
-            status=MessageStatus.OPEN,
-            priority=priority,
-            subject=message.content[:100] if len(message.content) > 100 else message.content
+            content=message.content,
+            is_from_customer=True,
+            priority=priority
         )
-        db.add(conversation)
-        await db.commit()
-        await db.refresh(conversation)
+        db.add(db_message)
         
+        # Update conversation and customer timestamps
+        conversation.updated_at = datetime.utcnow()
+        customer.last_activity = datetime.utcnow()
+        db.flush()
+        loaded = None if created else conversation_cache.load_for_write(db, conversation)
+        return customer, conversation, db_message, created, before, unread_count(db, conversation.id), loaded
+    
+    customer, conversation, db_message, created, before, unread, loaded = await write_queue.submit(store)
+    messages_ingested.inc(("customer", priority.value))
+    customer_overviews.invalidate(customer_id)
+    if created:
+        conversation_cache.started(conversation, customer, db_message)
+    else:
+        conversation_cache.add_message(conversation, db_message, customer=customer, loaded=loaded)
+    state = conversation_summary(conversation, customer=customer)
+    delta = stats_delta(before, stats_state(conversation))
+    
+    if created:
         # Broadcast new conversation
         await manager.broadcast_new_conversation({
             "id": conversation.id,
@@ -181,40 +366,30 @@ async def send_customer_message(
             "status": conversation.status.value,
             "subject": conversation.subject,
             "customer_name": customer.name,
-            "customer_email": customer.email
+            "customer_email": customer.email,
+            "conversation": state,
+            "stats_delta": delta
         })
-    else:
-        # Update conversation priority if new message is more urgent
-        if priority.value > conversation.priority.value:
-            conversation.priority = priority
-    
-    # Create the message
-    db_message = Message(
-        conversation_id=conversation.id,
-        customer_id=customer_id,
-        content=message.content,
-        is_from_customer=True,
-        priority=priority
-    )
-    db.add(db_message)
-    
-    # Update conversation and customer timestamps
-    conversation.updated_at = datetime.utcnow()
-    customer.last_activity = datetime.utcnow()
-    
-    await db.commit()
-    await db.refresh(db_message)
     
     # Broadcast new message to all agents
-    await manager.broadcast_new_message({
+    event = {
         "id": db_message.id,
         "conversation_id": conversation.id,
         "customer_id": customer_id,
         "content": message.content,
         "is_from_customer": True,
         "priority": priority.value,
-        "created_at": db_message.created_at.isoformat(),
-        "customer_name": customer.name
-    })
+        "created_at": db_message.created_at.isoformat() + "Z",
+        "customer_name": customer.name,
+        "unread_count": unread
+    }
+    if not created:
+        # A new conversation's state and counts went out with new_conversation
+        event.update(conversation=state, stats_delta=delta)
+    await manager.broadcast_new_message(event)
+    
+    # Start the response clock and route the conversation if it is waiting for an agent
+    sla_scheduler.customer_message(conversation, db_message.created_at)
+    await routing_engine.sync_conversation(conversation)
     
     return db_message
@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+
+from ..services import sql_profiler, sampling_profiler, stall_monitor
+from ..services.profiler_service import ADMIN_TOKEN, PROFILER_MAX_SECONDS, PROFILER_INTERVAL_SECONDS, is_admin
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+def require_sql_profiling():
+    if not sql_profiler.enabled:
+        raise HTTPException(status_code=404, detail="SQL profiling is disabled; set SQL_PROFILING=true")
+
+
+@router.get("/sql")
+async def get_sql_summary():
+    """Per-route SQL query counts and DB time over recent requests"""
+    require_sql_profiling()
+    return {
+        "default_budget": sql_profiler.default_budget,
+        "budgets": sql_profiler.budgets,
+        "routes": sql_profiler.get_summary()
+    }
+
+
+@router.get("/sql/requests")
+async def get_sql_requests(
+    route: Optional[str] = Query(None, description="Route template, e.g. /api/conversations/{conversation_id}"),
+    over_budget: bool = Query(False, description="Only requests that exceeded their query budget"),
+    limit: int = Query(50, le=200)
+):
+    """Recent request profiles with their normalized statements, newest first"""
+    require_sql_profiling()
+    return sql_profiler.get_profiles(route=route, over_budget=over_budget, limit=limit)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def collapsed_response(profile) -> PlainTextResponse:
+    return PlainTextResponse(
+        profile.collapsed(),
+        headers={
+            "X-Profile-Id": profile.id,
+            "Content-Disposition": f'attachment; filename="profile-{profile.id}.collapsed.txt"'
+        }
+    )
+
+
+@router.post("/profile", dependencies=[Depends(require_admin)])
+async def run_profile(
+    seconds: float = Query(10, gt=0, le=PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(PROFILER_INTERVAL_SECONDS * 1000, ge=1, le=1000),
+    all_threads: bool = Query(False, description="Sample every thread, not just the event loop")
+):
+    """
+    Sample stacks for a number of seconds and return them in collapsed format,
+    ready for flamegraph.pl, speedscope or inferno.
+    """
+    if sampling_profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    profile = await sampling_profiler.run(seconds, interval_ms / 1000, all_threads)
+    return collapsed_response(profile)
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Recently finished profiles, newest first"""
+    return sampling_profiler.list()
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: str):
+    """Download a finished profile in collapsed stack format"""
+    profile = sampling_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return collapsed_response(profile)
+
+
+@router.get("/stalls", dependencies=[Depends(require_admin)])
+async def get_stalls():
+    """Recent event loop stalls with the stacks sampled while the loop was blocked"""
+    return {
+        "threshold_ms": stall_monitor.threshold * 1000,
+        "stalls": stall_monitor.get_stalls()
+    }
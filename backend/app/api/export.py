@@ -0,0 +1,79 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Optional
+
+from ..models import MessagePriority, MessageStatus
+from ..schemas import MessagePriorityEnum, MessageStatusEnum
+from ..services.export_service import ExportFilters, export_stream, MEDIA_TYPES
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+FORMAT_PATTERN = "^(ndjson|csv|parquet)$"
+
+
+def streaming_export(kind: str, export_format: str, filters: ExportFilters) -> StreamingResponse:
+    try:
+        body = export_stream(kind, export_format, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"{kind}-{datetime.utcnow():%Y%m%dT%H%M%S}.{export_format}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def export_filters(
+    since: Optional[datetime],
+    until: Optional[datetime],
+    status: Optional[MessageStatusEnum],
+    priority: Optional[MessagePriorityEnum],
+    agent_id: Optional[int],
+    include_archived: bool
+) -> ExportFilters:
+    return ExportFilters(
+        since=since,
+        until=until,
+        status=MessageStatus(status.value) if status else None,
+        priority=MessagePriority(priority.value) if priority else None,
+        agent_id=agent_id,
+        include_archived=include_archived
+    )
+
+
+@router.get("/conversations")
+async def export_conversations(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    since: Optional[datetime] = Query(None, description="Created at or after (UTC)"),
+    until: Optional[datetime] = Query(None, description="Created before (UTC)"),
+    status: Optional[MessageStatusEnum] = None,
+    priority: Optional[MessagePriorityEnum] = None,
+    agent_id: Optional[int] = None,
+    include_archived: bool = True
+):
+    """
+    Stream every matching conversation as NDJSON, CSV or Parquet.
+    Memory use is constant however many rows match.
+    """
+    filters = export_filters(since, until, status, priority, agent_id, include_archived)
+    return streaming_export("conversations", format, filters)
+
+
+@router.get("/messages")
+async def export_messages(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    since: Optional[datetime] = Query(None, description="Sent at or after (UTC)"),
+    until: Optional[datetime] = Query(None, description="Sent before (UTC)"),
+    status: Optional[MessageStatusEnum] = Query(None, description="Status of the message's conversation"),
+    priority: Optional[MessagePriorityEnum] = Query(None, description="Priority of the message's conversation"),
+    agent_id: Optional[int] = Query(None, description="Agent assigned to the message's conversation"),
+    include_archived: bool = True
+):
+    """
+    Stream every matching message as NDJSON, CSV or Parquet.
+    Memory use is constant however many rows match.
+    """
+    filters = export_filters(since, until, status, priority, agent_id, include_archived)
+    return streaming_export("messages", format, filters)
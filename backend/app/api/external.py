@@ -1,83 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, HTTPException
+from sqlalchemy.orm import Session
 from sqlalchemy import select
 from datetime import datetime
 
-from ..database import get_db
+from ..database import upsert
 from ..models import Customer, Conversation, Message, MessagePriority, MessageStatus
 from ..schemas import MessageSend
-from ..services import detect_priority, manager
+from ..services import (
+    detect_priority, manager, routing_engine, sla_scheduler, write_queue, customer_overviews,
+    conversation_cache, admission
+)
+from ..services.metrics_service import messages_ingested
+from ..services.event_service import bump_version, stats_state, stats_delta, unread_count, conversation_summary
 
 router = APIRouter(prefix="/external", tags=["external"])
 
 
+@router.get("/admission")
+async def get_admission_stats():
+    """Admission control of the message routes: slots in use, waiting and turned away requests"""
+    return admission.get_stats()
+
+
 @router.post("/messages")
-async def receive_external_message(
-    message: MessageSend,
-    db: AsyncSession = Depends(get_db)
-):
+async def receive_external_message(message: MessageSend):
     """
     External API endpoint to receive customer messages.
     This simulates messages coming from external channels (SMS, app, etc.)
     
     Can be used with Postman or any HTTP client to send messages.
     """
-    # Find or create customer
-    customer = None
-    
-    if message.customer_id:
-        result = await db.execute(
-            select(Customer).where(Customer.id == message.customer_id)
-        )
-        customer = result.scalar_one_or_none()
-    
-    if not customer and message.customer_email:
-        result = await db.execute(
-            select(Customer).where(Customer.email == message.customer_email)
-        )
-        customer = result.scalar_one_or_none()
-    
-    if not customer:
-        # Create new customer
-        if not message.customer_email:
-            raise HTTPException(
-                status_code=400,
-                detail="Either customer_id or customer_email is required"
-            )
-        
-        customer = Customer(
-            name=message.customer_name or "Unknown Customer",
-            email=message.customer_email,
-            account_status="active"
+    if not message.customer_id and not message.customer_email:
+        raise HTTPException(
+            status_code=400,
+            detail="Either customer_id or customer_email is required"
         )
-        db.add(customer)
-        await db.commit()
-        await db.refresh(customer)
     
     # Detect message priority
     priority, confidence = detect_priority(message.content)
     
-    # Find open conversation or create new one
-    conv_query = select(Conversation).where(
-        Conversation.customer_id == customer.id,
-        Conversation.status.in_([MessageStatus.OPEN, MessageStatus.IN_PROGRESS])
-    ).order_by(Conversation.updated_at.desc())
-    
-    result = await db.execute(conv_query)
-    conversation = result.scalar_one_or_none()
-    
-    if not conversation:
-        # Create new conversation
-        conversation = Conversation(
+    def store(db: Session):
+        # Find or create customer
+        customer = None
+        
+        if message.customer_id:
+            result = db.execute(
+                select(Customer).where(Customer.id == message.customer_id)
+            )
+            customer = result.scalar_one_or_none()
+        
+        if not customer:
+            if not message.customer_email:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Either customer_id or customer_email is required"
+                )
+
+            # Most messages come from known customers; the upsert below can't use
+            # the compiled statement cache, so only pay for it on a miss
+            result = db.execute(
+                select(Customer).where(Customer.email == message.customer_email)
+            )
+            customer = result.scalar_one_or_none()
+
+        if not customer:
+            # Find or create the customer in one statement; concurrent first
+            # messages from the same address can't race into a duplicate insert
+            insert_customer = upsert(Customer).values(
+                name=message.customer_name or "Unknown Customer",
+                email=message.customer_email,
+                account_status="active"
+            )
+            insert_customer = insert_customer.on_conflict_do_update(
+                index_elements=[Customer.email],
+                set_={"last_activity": insert_customer.excluded.last_activity}
+            ).returning(Customer)
+            result = db.execute(
+                insert_customer, execution_options={"populate_existing": True}
+            )
+            customer = result.scalar_one()
+        
+        # Find open conversation or create new one
+        conv_query = select(Conversation).where(
+            Conversation.customer_id == customer.id,
+            Conversation.status.in_([MessageStatus.OPEN, MessageStatus.IN_PROGRESS])
+        ).order_by(Conversation.updated_at.desc())
+        
+        result = db.execute(conv_query)
+        conversation = result.scalar_one_or_none()
+        created = conversation is None
+        before = None if created else stats_state(conversation)
+        
+        if created:
+            # Create new conversation
+            conversation = Conversation(
+                customer_id=customer.id,
+                status=MessageStatus.OPEN,
+                priority=priority,
+                subject=message.content[:100] if len(message.content) > 100 else message.content
+            )
+            db.add(conversation)
+            db.flush()
+        else:
+            # Update priority if new message is more urgent
+            priority_order = {
+                MessagePriority.LOW: 0,
+                MessagePriority.MEDIUM: 1,
+                MessagePriority.HIGH: 2,
+                MessagePriority.URGENT: 3
+            }
+            if priority_order.get(priority, 0) > priority_order.get(conversation.priority, 0):
+                conversation.priority = priority
+            bump_version(conversation)
+        
+        # Create the message
+        db_message = Message(
+            conversation_id=conversation.id,
             customer_id=customer.id,
-            status=MessageStatus.OPEN,
-            priority=priority,
-            subject=message.content[:100] if len(message.content) > 100 else message.content
+            content=message.content,
+            is_from_customer=True,
+            priority=priority
         )
-        db.add(conversation)
-        await db.commit()
-        await db.refresh(conversation)
+        db.add(db_message)
         
+        # Update timestamps
+        conversation.updated_at = datetime.utcnow()
+        customer.last_activity = datetime.utcnow()
+        db.flush()
+        loaded = None if created else conversation_cache.load_for_write(db, conversation)
+        return customer, conversation, db_message, created, before, unread_count(db, conversation.id), loaded
+    
+    customer, conversation, db_message, created, before, unread, loaded = await write_queue.submit(store)
+    messages_ingested.inc(("external", priority.value))
+    customer_overviews.invalidate(customer.id)
+    if created:
+        conversation_cache.started(conversation, customer, db_message)
+    else:
+        conversation_cache.add_message(conversation, db_message, customer=customer, loaded=loaded)
+    state = conversation_summary(conversation, customer=customer)
+    delta = stats_delta(before, stats_state(conversation))
+    
+    if created:
         # Broadcast new conversation
         await manager.broadcast_new_conversation({
             "id": conversation.id,
@@ -86,38 +149,13 @@ async def receive_external_message(
             "status": conversation.status.value,
             "subject": conversation.subject,
             "customer_name": customer.name,
-            "customer_email": customer.email
+            "customer_email": customer.email,
+            "conversation": state,
+            "stats_delta": delta
         })
-    else:
-        # Update priority if new message is more urgent
-        priority_order = {
-            MessagePriority.LOW: 0,
-            MessagePriority.MEDIUM: 1,
-            MessagePriority.HIGH: 2,
-            MessagePriority.URGENT: 3
-        }
-        if priority_order.get(priority, 0) > priority_order.get(conversation.priority, 0):
-            conversation.priority = priority
-    
-    # Create the message
-    db_message = Message(
-        conversation_id=conversation.id,
-        customer_id=customer.id,
-        content=message.content,
-        is_from_customer=True,
-        priority=priority
-    )
-    db.add(db_message)
-    
-    # Update timestamps
-    conversation.updated_at = datetime.utcnow()
-    customer.last_activity = datetime.utcnow()
-    
-    await db.commit()
-    await db.refresh(db_message)
     
     # Broadcast new message to all connected agents
-    await manager.broadcast_new_message({
+    event = {
         "id": db_message.id,
         "conversation_id": conversation.id,
         "customer_id": customer.id,
@@ -126,8 +164,17 @@ async def receive_external_message(
         "priority": priority.value,
         "created_at": db_message.created_at.isoformat() + "Z",
         "customer_name": customer.name,
-        "customer_email": customer.email
-    })
+        "customer_email": customer.email,
+        "unread_count": unread
+    }
+    if not created:
+        # A new conversation's state and counts went out with new_conversation
+        event.update(conversation=state, stats_delta=delta)
+    await manager.broadcast_new_message(event)
+    
+    # Start the response clock and route the conversation if it is waiting for an agent
+    sla_scheduler.customer_message(conversation, db_message.created_at)
+    await routing_engine.sync_conversation(conversation)
     
     return {
         "success": True,
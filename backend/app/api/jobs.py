@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from ..services import scheduler
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/")
+async def get_jobs():
+    """Background jobs: triggers, next and last runs, run counts and singleton leases"""
+    return await scheduler.get_status()
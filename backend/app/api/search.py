@@ -4,8 +4,8 @@ from sqlalchemy import select, or_, desc
 from sqlalchemy.orm import selectinload
 from typing import Optional
 
-from ..database import get_db
 from ..models import Conversation, Message, Customer, MessagePriority, MessageStatus
+from ..services import get_replica_db
 
 router = APIRouter(prefix="/search", tags=["search"])
 
@@ -17,7 +17,7 @@ async def search(
     priority: Optional[str] = Query(None, description="Filter by priority: urgent, high, medium, low"),
     status: Optional[str] = Query(None, description="Filter by status: open, in_progress, resolved, closed"),
     limit: int = Query(50, le=100),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_replica_db)
 ):
     """
     Search across messages and customers.
@@ -52,8 +52,9 @@ async def search(
             selectinload(Conversation.customer),
             selectinload(Conversation.assigned_agent),
             selectinload(Conversation.messages)
-        ).join(Message).where(
-            Message.content.ilike(search_term)
+        ).where(
+            # EXISTS stops at the first matching message instead of joining and de-duplicating
+            Conversation.messages.any(Message.content.ilike(search_term))
         )
         
         if priority_enum:
@@ -62,7 +63,7 @@ async def search(
         if status_enum:
             conv_query = conv_query.where(Conversation.status == status_enum)
         
-        conv_query = conv_query.distinct().order_by(
+        conv_query = conv_query.order_by(
             desc(Conversation.updated_at)
         ).limit(limit)
         
@@ -149,7 +150,7 @@ async def search(
 @router.get("/suggestions")
 async def get_search_suggestions(
     q: str = Query(..., min_length=2),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_replica_db)
 ):
     """Get search suggestions based on partial query"""
     search_term = f"%{q}%"
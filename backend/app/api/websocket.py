@@ -1,9 +1,8 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-import json
 
 from ..database import get_db
-from ..services import manager
+from ..services import manager, decode_frame, typing_tracker, presence_tracker, inbox_views
 
 router = APIRouter(tags=["websocket"])
 
@@ -14,21 +13,35 @@ async def websocket_endpoint(websocket: WebSocket, agent_id: int = Query(None)):
     WebSocket endpoint for real-time messaging.
     Agents connect with their agent_id to receive real-time updates.
     """
-    await manager.connect(websocket, agent_id)
+    connection = await manager.connect(websocket, agent_id)
     
     try:
         # Send initial connection confirmation
         await manager.send_personal_message({
             "type": "connected",
-            "data": {"agent_id": agent_id, "message": "Connected to messaging server"}
+            "data": {
+                "agent_id": agent_id,
+                "connection_id": connection.id,
+                "message": "Connected to messaging server",
+                "stream_id": manager.stream_id,
+                "seq": manager.sequence
+            }
         }, websocket)
         
+        if agent_id:
+            await presence_tracker.agent_connected(agent_id)
+        
         while True:
-            # Receive messages from the WebSocket
-            data = await websocket.receive_text()
+            # Receive messages from the WebSocket (text for JSON, binary for msgpack)
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            
+            # Any frame from the client proves the connection is alive
+            connection.touch()
             
             try:
-                message = json.loads(data)
+                message = decode_frame(frame, manager.get_encoding(websocket))
                 message_type = message.get("type")
                 
                 if message_type == "ping":
@@ -38,15 +51,30 @@ async def websocket_endpoint(websocket: WebSocket, agent_id: int = Query(None)):
                         "data": {}
                     }, websocket)
                 
+                elif message_type == "pong":
+                    # Reply to a server heartbeat; liveness was already recorded
+                    pass
+                
+                elif message_type == "resume":
+                    # Replay events missed while the client was disconnected
+                    stream_id = message.get("data", {}).get("stream_id")
+                    last_seq = message.get("data", {}).get("last_seq")
+                    
+                    if isinstance(last_seq, int):
+                        await manager.resume(websocket, stream_id, last_seq)
+                    else:
+                        await manager.send_personal_message({
+                            "type": "error",
+                            "data": {"message": "resume requires an integer last_seq"}
+                        }, websocket)
+                
                 elif message_type == "typing":
-                    # Broadcast typing indicator
+                    # Record typing state; changes are broadcast in periodic batches
                     conversation_id = message.get("data", {}).get("conversation_id")
                     is_typing = message.get("data", {}).get("is_typing", False)
                     
                     if conversation_id and agent_id:
-                        await manager.notify_agent_typing(
-                            conversation_id, agent_id, is_typing
-                        )
+                        typing_tracker.update(conversation_id, agent_id, bool(is_typing))
                 
                 elif message_type == "viewing":
                     # Track which conversation agent is viewing
@@ -60,14 +88,37 @@ async def websocket_endpoint(websocket: WebSocket, agent_id: int = Query(None)):
                     if conversation_id and agent_id:
                         manager.remove_agent_viewing(agent_id, conversation_id)
                 
-            except json.JSONDecodeError:
+                elif message_type == "subscribe_inbox":
+                    # Live inbox for these filters: a snapshot, then diffs
+                    inbox_views.subscribe(connection.id, message.get("data", {}))
+                
+                elif message_type == "unsubscribe_inbox":
+                    inbox_views.unsubscribe(connection.id)
+                
+            except ValueError:
                 await manager.send_personal_message({
                     "type": "error",
-                    "data": {"message": "Invalid JSON format"}
+                    "data": {"message": "Invalid message format"}
                 }, websocket)
                 
     except WebSocketDisconnect:
-        manager.disconnect(websocket, agent_id)
+        manager.disconnect(connection.id)
     except Exception as e:
         print(f"WebSocket error: {e}")
-        manager.disconnect(websocket, agent_id)
+        manager.disconnect(connection.id)
+    finally:
+        inbox_views.unsubscribe(connection.id)
+        if agent_id and agent_id not in manager.agent_connections:
+            typing_tracker.clear_agent(agent_id)
+            await presence_tracker.agent_disconnected(agent_id)
+
+
+@router.get("/ws/connections")
+async def get_connections():
+    """List live WebSocket connections with their last-seen time"""
+    connections = manager.get_connections()
+    return {
+        "total": len(connections),
+        "agents": len(manager.agent_connections),
+        "connections": connections
+    }
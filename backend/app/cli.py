@@ -0,0 +1,162 @@
+"""
+One-time database setup, run before starting the app workers.
+
+    python -m app.cli init-db   # create missing tables and upgrade the schema (also: migrate)
+    python -m app.cli seed      # same, then load sample data if empty
+    python -m app.cli import-sqlite branch_synthetic.db   # copy a SQLite database into DATABASE_URL
+    python -m app.cli archive   # move old resolved/closed conversations to the archive tables now
+    python -m app.cli export messages --format csv --output messages.csv --since 2024-01-01
+"""
+
+import argparse
+import asyncio
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Boolean, DateTime, func, select
+
+from .database import (
+    Base, engine, init_db, schema_problems, seed_initial_data, copy_rows, reset_sequences, dispose_engines
+)
+from .models import MessagePriority, MessageStatus
+
+# Rows per COPY batch when importing
+IMPORT_BATCH_SIZE = 50_000
+# Commands that create and upgrade the schema; the others only use it
+SCHEMA_COMMANDS = {"init-db", "migrate", "seed", "import-sqlite"}
+
+
+def column_converters(columns) -> list:
+    """SQLite hands back text timestamps and integer booleans; convert them for the target driver"""
+    converters = []
+    for column in columns:
+        if isinstance(column.type, DateTime):
+            converters.append(lambda value: datetime.fromisoformat(value) if value is not None else None)
+        elif isinstance(column.type, Boolean):
+            converters.append(lambda value: bool(value) if value is not None else None)
+        else:
+            converters.append(None)
+    return converters
+
+
+async def import_sqlite(path: str):
+    """
+    Copy every table from a SQLite database (e.g. one built by data/generate.py)
+    into the configured database, which must be empty. Uses COPY on PostgreSQL.
+    """
+    source = sqlite3.connect(path)
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        existing = await conn.scalar(select(func.count()).select_from(Base.metadata.tables["messages"]))
+        if existing:
+            raise SystemExit("Target database already has messages; import into an empty database")
+
+        source_tables = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in Base.metadata.sorted_tables:
+            if table.name not in source_tables:
+                continue
+            # Columns added since the source was built keep their defaults
+            source_columns = {row[1] for row in source.execute(f"PRAGMA table_info({table.name})")}
+            copied_columns = [column for column in table.columns if column.name in source_columns]
+            columns = [column.name for column in copied_columns]
+            converters = column_converters(copied_columns)
+            cursor = source.execute(f"SELECT {', '.join(columns)} FROM {table.name}")
+            copied = 0
+            while True:
+                batch = cursor.fetchmany(IMPORT_BATCH_SIZE)
+                if not batch:
+                    break
+                rows = [
+                    tuple(value if convert is None else convert(value) for value, convert in zip(row, converters))
+                    for row in batch
+                ]
+                await copy_rows(conn, table, columns, rows)
+                copied += len(rows)
+            print(f"  {table.name}: {copied:,} rows ({time.perf_counter() - started:.1f}s)")
+        await reset_sequences(conn)
+    source.close()
+
+
+async def export(kind: str, args):
+    """Stream an export to a file, or stdout, without holding it in memory"""
+    from .services.export_service import ExportFilters, export_stream
+
+    filters = ExportFilters(
+        since=args.since,
+        until=args.until,
+        status=MessageStatus(args.status) if args.status else None,
+        priority=MessagePriority(args.priority) if args.priority else None,
+        agent_id=args.agent_id,
+        include_archived=not args.no_archived
+    )
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        async for chunk in export_stream(kind, args.format, filters):
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+    print(f"Exported {kind}: {written:,} bytes", file=sys.stderr)
+
+
+async def check_schema():
+    """Refuse to run against a database whose schema this version would change"""
+    async with engine.connect() as conn:
+        problems = await conn.run_sync(schema_problems)
+    if problems:
+        more = f" and {len(problems) - 5} more" if len(problems) > 5 else ""
+        raise SystemExit(
+            f"Database schema is out of date (missing {', '.join(problems[:5])}{more}); "
+            "run python -m app.cli migrate first"
+        )
+
+
+async def run(command: str, path: Optional[str] = None, args=None):
+    try:
+        if command in SCHEMA_COMMANDS:
+            await init_db()
+            print("Database tables are ready")
+        else:
+            await check_schema()
+        if command == "seed":
+            await seed_initial_data()
+        elif command == "import-sqlite":
+            await import_sqlite(path)
+        elif command == "archive":
+            from .services import archiver
+            print(f"Archived {await archiver.archive()} conversations")
+        elif command == "export":
+            await export(path, args)
+    finally:
+        await dispose_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Branch Messaging database setup")
+    parser.add_argument("command", choices=["init-db", "migrate", "seed", "import-sqlite", "archive", "export"])
+    parser.add_argument("path", nargs="?",
+                        help="SQLite file to import (import-sqlite), or conversations / messages (export)")
+    export_options = parser.add_argument_group("export options")
+    export_options.add_argument("--format", choices=["ndjson", "csv", "parquet"], default="ndjson")
+    export_options.add_argument("--output", help="File to write (default: stdout)")
+    export_options.add_argument("--since", type=datetime.fromisoformat, help="Created at or after (UTC)")
+    export_options.add_argument("--until", type=datetime.fromisoformat, help="Created before (UTC)")
+    export_options.add_argument("--status", choices=[s.value for s in MessageStatus])
+    export_options.add_argument("--priority", choices=[p.value for p in MessagePriority])
+    export_options.add_argument("--agent-id", type=int)
+    export_options.add_argument("--no-archived", action="store_true", help="Leave out archived conversations")
+    args = parser.parse_args()
+    if args.command == "import-sqlite" and not args.path:
+        parser.error("import-sqlite needs the path of a SQLite database")
+    if args.command == "export" and args.path not in ("conversations", "messages"):
+        parser.error("export needs what to export: conversations or messages")
+    asyncio.run(run(args.command, args.path, args))
+
+
+if __name__ == "__main__":
+    main()
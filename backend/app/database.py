@@ -1,16 +1,135 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncConnection, AsyncEngine
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import select, func
+from sqlalchemy import create_engine, select, func, text, event, inspect, Table, Engine
+from sqlalchemy.schema import CreateColumn, CreateTable
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import List, Union
+import asyncio
 import os
 import csv
 from datetime import datetime
 from pathlib import Path
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./branch_messaging.db")
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+def normalize_url(url: str) -> str:
+    """Hosting providers hand out postgres:// URLs; run them on asyncpg"""
+    if url.startswith("postgres://") or url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+
+DATABASE_URL = normalize_url(os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./branch_messaging.db"))
+# Comma-separated read replicas for the heavy list and search endpoints (see replica_router)
+DATABASE_REPLICA_URLS = [
+    normalize_url(url.strip()) for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+# Log every SQL statement; useful when debugging, expensive under load
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
+# Connection pool sizing for PostgreSQL
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Rows fetched per round trip when streaming large results
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+# Hot table -> archive table its rows move to; new ids must stay above both
+ARCHIVE_TABLES = {"conversations": "archived_conversations", "messages": "archived_messages"}
+
+
+
+def is_sqlite_file(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and "mode=memory" not in url
+
+
+IS_POSTGRES = DATABASE_URL.startswith("postgresql")
+IS_SQLITE_FILE = is_sqlite_file(DATABASE_URL)
+
+# SQLite: route writes through one dedicated connection (see write_queue) and
+# reads through a pool of read-only connections, so writers never fight over the lock
+SQLITE_SINGLE_WRITER = IS_SQLITE_FILE and os.getenv("SQLITE_SINGLE_WRITER", "true").lower() == "true"
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "4"))
+# How long a connection waits for SQLite's write lock before "database is locked"
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "30"))
+
+
+def engine_options(url: str = DATABASE_URL) -> dict:
+    """Driver profile for a database URL (the primary by default)"""
+    if is_sqlite_file(url):
+        # aiosqlite defaults to NullPool: a new connection and thread per session
+        return {"poolclass": AsyncAdaptedQueuePool, "connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_SECONDS}}
+    if not url.startswith("postgresql"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_pre_ping": True,
+        "connect_args": {
+            # Short OLTP queries don't benefit from JIT compilation, which can add tens of ms
+            "server_settings": {"application_name": "branch-messaging", "jit": "off"}
+        }
+    }
+
+
+def configure_sqlite(engine: Union[AsyncEngine, Engine], read_only: bool = False, immediate: bool = False):
+    """
+    WAL lets readers run alongside the writer; synchronous=NORMAL only syncs at
+    checkpoints, which is still safe against corruption in WAL mode.
+    immediate takes the write lock at BEGIN, which also makes SAVEPOINT work
+    (pysqlite's own transaction handling does not).
+    """
+    engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        if immediate:
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    if immediate:
+        @event.listens_for(engine, "begin")
+        def on_begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+engine = create_async_engine(DATABASE_URL, echo=SQL_ECHO, **engine_options())
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+if SQLITE_SINGLE_WRITER:
+    # The writer is a plain synchronous engine holding one connection, used only
+    # from the write queue's thread; read-only requests use their own async pool
+    write_engine = create_engine(
+        DATABASE_URL.replace("+aiosqlite", ""), echo=SQL_ECHO, poolclass=QueuePool, pool_size=1, max_overflow=0,
+        connect_args={"timeout": SQLITE_BUSY_TIMEOUT_SECONDS, "check_same_thread": False}
+    )
+    read_engine = create_async_engine(
+        DATABASE_URL, echo=SQL_ECHO, pool_size=SQLITE_READ_POOL_SIZE, max_overflow=0, **engine_options()
+    )
+    configure_sqlite(engine)
+    configure_sqlite(write_engine, immediate=True)
+    configure_sqlite(read_engine, read_only=True)
+else:
+    write_engine = None
+    read_engine = engine
+    if IS_SQLITE_FILE:
+        configure_sqlite(engine)
+read_session_maker = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+replica_engines = [create_async_engine(url, echo=SQL_ECHO, **engine_options(url)) for url in DATABASE_REPLICA_URLS]
+for replica_engine in replica_engines:
+    if replica_engine.dialect.name == "sqlite":
+        configure_sqlite(replica_engine, read_only=True)
+
+
+def all_engines() -> List[Union[AsyncEngine, Engine]]:
+    """Every distinct engine, for instrumentation and shutdown"""
+    primaries = [e for e in (engine, write_engine, read_engine) if e is not None]
+    return list({id(e): e for e in primaries + replica_engines}.values())
+
 
 class Base(DeclarativeBase):
     pass
@@ -24,12 +143,180 @@ async def get_db():
             await session.close()
 
 
+async def get_read_db():
+    """Session for read-only routes; on SQLite it comes from the read-only pool"""
+    async with read_session_maker() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+async def dispose_engines():
+    for e in all_engines():
+        if isinstance(e, AsyncEngine):
+            await e.dispose()
+        else:
+            e.dispose()
+
+
 async def init_db():
+    """Create any missing tables. Run once per deployment, not in every worker."""
+    from . import models  # noqa: F401 - registers the tables on Base.metadata
+    
     async with engine.begin() as conn:
+        if IS_POSTGRES:
+            # Trigram indexes back the ILIKE searches
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
-    
-    # Auto-seed if database is empty
-    await seed_initial_data()
+        await conn.run_sync(upgrade_schema)
+
+
+def upgrade_schema(conn):
+    """
+    Add columns and indexes declared after an existing database was created;
+    create_all only creates missing tables. New columns need a server default.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                definition = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {definition}"))
+                print(f"Added column {table.name}.{column.name}")
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(conn, checkfirst=True)
+        if conn.dialect.name == "sqlite" and table.dialect_options["sqlite"]["autoincrement"]:
+            _sqlite_autoincrement(conn, table)
+
+
+def schema_problems(conn) -> List[str]:
+    """What upgrade_schema would change: missing tables, columns and indexes"""
+    from . import models  # noqa: F401 - registers the tables on Base.metadata
+
+    inspector = inspect(conn)
+    problems = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            problems.append(f"table {table.name}")
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        problems.extend(
+            f"column {table.name}.{column.name}" for column in table.columns if column.name not in existing_columns
+        )
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        # Trigram (GIN) indexes only exist on PostgreSQL
+        problems.extend(
+            f"index {index.name}" for index in table.indexes
+            if index.name not in existing_indexes
+            and (conn.dialect.name == "postgresql" or index.dialect_options["postgresql"]["using"] != "gin")
+        )
+        if conn.dialect.name == "sqlite" and table.dialect_options["sqlite"]["autoincrement"]:
+            created = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+            ).scalar()
+            if "AUTOINCREMENT" not in created.upper():
+                problems.append(f"AUTOINCREMENT on {table.name}")
+    return problems
+
+
+def _sqlite_autoincrement(conn, table: Table):
+    """
+    Rebuild a SQLite table created without AUTOINCREMENT, and keep its id
+    counter above the ids already moved to its archive table
+    """
+    created = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+    ).scalar()
+    if "AUTOINCREMENT" not in created.upper():
+        rebuilt = f"{table.name}_rebuild"
+        definition = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+        columns = ", ".join(column.name for column in table.columns)
+        conn.execute(text(definition.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {rebuilt} ", 1)))
+        conn.execute(text(f"INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {table.name}"))
+        conn.execute(text(f"DROP TABLE {table.name}"))
+        conn.execute(text(f"ALTER TABLE {rebuilt} RENAME TO {table.name}"))
+        for index in table.indexes:
+            index.create(conn)
+        print(f"Rebuilt {table.name} with AUTOINCREMENT")
+
+    archive = ARCHIVE_TABLES.get(table.name)
+    highest = f"(SELECT COALESCE(MAX(id), 0) FROM {table.name})"
+    if archive and inspect(conn).has_table(archive):
+        highest = f"MAX({highest}, (SELECT COALESCE(MAX(id), 0) FROM {archive}))"
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name AND seq < " + highest), {"name": table.name})
+    conn.execute(text(
+        f"INSERT INTO sqlite_sequence (name, seq) SELECT :name, {highest} "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"
+    ), {"name": table.name})
+
+
+def upsert(model):
+    """INSERT that supports ON CONFLICT clauses on both PostgreSQL and SQLite"""
+    return (postgresql.insert if IS_POSTGRES else sqlite.insert)(model)
+
+
+async def stream_query(session: AsyncSession, statement, batch_size: int = STREAM_BATCH_SIZE):
+    """
+    Iterate over a large result without loading it into memory.
+    On PostgreSQL this runs on a server-side cursor fetching batch_size rows at a time.
+    """
+    result = await session.stream(statement.execution_options(yield_per=batch_size))
+    async for partition in result.partitions():
+        for row in partition:
+            yield row
+
+
+async def copy_rows(conn: AsyncConnection, table: Table, columns: list, rows: list):
+    """
+    Bulk load rows (tuples in column order) into a table.
+    Uses COPY on PostgreSQL and a single executemany INSERT elsewhere.
+    """
+    if not rows:
+        return
+    if IS_POSTGRES:
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(table.name, records=rows, columns=columns)
+    else:
+        await conn.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+async def reset_sequences(conn: AsyncConnection):
+    """Move PostgreSQL id sequences past rows loaded with explicit ids"""
+    if not IS_POSTGRES:
+        return
+    for table in Base.metadata.sorted_tables:
+        highest = f"COALESCE((SELECT MAX(id) FROM {table.name}), 0)"
+        if table.name in ARCHIVE_TABLES:
+            highest = f"GREATEST({highest}, COALESCE((SELECT MAX(id) FROM {ARCHIVE_TABLES[table.name]}), 0))"
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), {highest} + 1, false)"
+        ))
+
+
+async def warm_pool():
+    """
+    Open a pooled connection per engine so the first request doesn't pay for it.
+    Replicas are left to replica_router, which must not fail startup when one is down.
+    """
+    for e in all_engines():
+        if e in replica_engines:
+            continue
+        if isinstance(e, AsyncEngine):
+            async with e.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        else:
+            await asyncio.to_thread(_ping, e)
+
+
+def _ping(e: Engine):
+    with e.connect() as conn:
+        conn.execute(text("SELECT 1"))
 
 
 def detect_priority(message: str) -> str:
@@ -1,12 +1,23 @@
 import os
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from datetime import datetime
+from sqlalchemy import text
 import json
 
-from .database import init_db
+from .database import warm_pool, all_engines, async_session_maker
+from .middleware import (
+    MetricsMiddleware, SQLProfilingMiddleware, ProfilingMiddleware, ReplicaRoutingMiddleware, AdmissionMiddleware
+)
+from .services import (
+    manager, typing_tracker, presence_tracker, routing_engine, sla_scheduler,
+    metrics, instrument_engine, loop_lag_monitor, sql_profiler, stall_monitor, write_queue,
+    replica_router, inbox_views, scheduler, admission
+)
+from .services.profiler_service import ADMIN_TOKEN
 from .api import (
     customers_router,
     agents_router,
@@ -14,9 +25,16 @@ from .api import (
     canned_messages_router,
     search_router,
     websocket_router,
-    external_router
+    external_router,
+    debug_router,
+    export_router,
+    jobs_router
 )
 
+# Readiness thresholds for /health
+HEALTH_DB_TIMEOUT_SECONDS = float(os.getenv("HEALTH_DB_TIMEOUT_SECONDS", "2"))
+HEALTH_MAX_LOOP_LAG_SECONDS = float(os.getenv("HEALTH_MAX_LOOP_LAG_SECONDS", "1"))
+
 
 class CustomJSONEncoder(json.JSONEncoder):
     """Custom JSON encoder that handles datetime with UTC timezone"""
@@ -29,9 +47,32 @@ class CustomJSONEncoder(json.JSONEncoder):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup"""
-    await init_db()
+    """
+    Open the connection pool, warm in-memory state and start background tasks.
+    Schema creation and seeding are a separate one-time step (python -m app.cli seed).
+    """
+    loop_lag_monitor.start()
+    stall_monitor.start()
+    await warm_pool()
+    write_queue.start()
+    replica_router.start()
+    await routing_engine.load()
+    await sla_scheduler.start()
+    typing_tracker.start()
+    manager.start_heartbeat()
+    inbox_views.start()
+    scheduler.start()
     yield
+    await scheduler.stop()
+    await inbox_views.stop()
+    await sla_scheduler.stop()
+    await presence_tracker.stop()
+    await manager.stop_heartbeat()
+    await typing_tracker.stop()
+    await replica_router.stop()
+    await write_queue.stop()
+    await loop_lag_monitor.stop()
+    stall_monitor.stop()
 
 
 app = FastAPI(
@@ -53,6 +94,9 @@ else:
 # Also allow any Vercel preview URLs
 cors_origins.append("https://*.vercel.app")
 
+if admission.enabled:
+    # Inside CORS, so browsers can read a 429 and its Retry-After
+    app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
@@ -60,7 +104,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
+if ADMIN_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
+if sql_profiler.enabled:
+    app.add_middleware(SQLProfilingMiddleware)
+    for db_engine in all_engines():
+        sql_profiler.instrument(db_engine)
+if replica_router.enabled:
+    app.add_middleware(ReplicaRoutingMiddleware)
+app.add_middleware(MetricsMiddleware)
+for db_engine in all_engines():
+    instrument_engine(db_engine)
 
 # Include routers
 app.include_router(customers_router, prefix="/api")
@@ -70,6 +126,9 @@ app.include_router(canned_messages_router, prefix="/api")
 app.include_router(search_router, prefix="/api")
 app.include_router(websocket_router)
 app.include_router(external_router, prefix="/api")
+app.include_router(debug_router, prefix="/api")
+app.include_router(export_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api")
 
 
 @app.get("/")
@@ -83,4 +142,33 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    """Readiness check: the database answers and the event loop is responsive"""
+    checks = {}
+    healthy = True
+    
+    try:
+        async with async_session_maker() as db:
+            await asyncio.wait_for(db.execute(text("SELECT 1")), HEALTH_DB_TIMEOUT_SECONDS)
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"error: {e.__class__.__name__}"
+        healthy = False
+    
+    if replica_router.enabled:
+        # Informational: reads fall back to the primary when replicas are down
+        checks["replicas"] = replica_router.get_status()
+
+    checks["event_loop_lag_seconds"] = round(loop_lag_monitor.lag, 4)
+    if loop_lag_monitor.lag > HEALTH_MAX_LOOP_LAG_SECONDS:
+        healthy = False
+    
+    return JSONResponse(
+        {"status": "healthy" if healthy else "unhealthy", "checks": checks},
+        status_code=200 if healthy else 503
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,235 @@
+import json
+import math
+import time
+
+from .services.admission_service import admission, Refusal
+from .services.sql_profiling_service import sql_profiler
+from .services.profiler_service import sampling_profiler, is_admin
+from .services.replica_service import replica_router, request_agent_id
+from .services.metrics_service import (
+    http_requests, http_request_duration, http_requests_in_flight,
+    http_request_db_queries, http_request_db_duration, request_db_stats
+)
+
+
+def route_label(scope: dict) -> str:
+    """
+    The matched route template (e.g. /api/conversations/{conversation_id}),
+    so metrics stay bounded no matter which IDs are requested.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Requests turned away before routing
+    return scope.get("admission_route", "<unmatched>")
+
+
+class MetricsMiddleware:
+    """
+    Records request counts, latency, in-flight requests and per-request
+    database usage. Written as plain ASGI middleware to keep the per-request
+    overhead to a few microseconds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = [0, 0.0]
+        token = request_db_stats.set(stats)
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            request_db_stats.reset(token)
+            method = scope["method"]
+            route = route_label(scope)
+            http_requests.inc((method, route, status))
+            http_request_duration.observe(elapsed, (method, route))
+            http_request_db_queries.observe(stats[0], (route,))
+            http_request_db_duration.observe(stats[1], (route,))
+
+
+class SQLProfilingMiddleware:
+    """
+    Attaches per-request SQL statistics as X-SQL-* response headers and
+    records the request's profile. Only installed when SQL_PROFILING is on.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = sql_profiler.begin(scope["method"], scope["path"])
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-sql-queries", str(profile.query_count).encode()))
+                headers.append((b"x-sql-time-ms", f"{profile.db_seconds * 1000:.3f}".encode()))
+                headers.append((b"x-sql-repeated", str(len(profile.repeated())).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            sql_profiler.finish(profile, route_label(scope))
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a single request when it carries an X-Profile header and a valid
+    X-Admin-Token. The profile samples the event loop thread while the request
+    is in flight; its ID is returned in X-Profile-Id for download.
+    Only installed when ADMIN_TOKEN is set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if b"x-profile" not in headers or sampling_profiler.busy:
+            await self.app(scope, receive, send)
+            return
+        token = headers.get(b"x-admin-token")
+        if not is_admin(token.decode("latin-1") if token else None):
+            await self.app(scope, receive, send)
+            return
+
+        profile = sampling_profiler.start(f"request {scope['method']} {scope['path']}")
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampling_profiler.stop()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Makes the X-Agent-Id header available to replica_router and records when
+    that agent's write requests succeed, so their next reads see the change.
+    Only installed when read replicas are configured.
+    """
+
+    SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = dict(scope["headers"]).get(b"x-agent-id", b"")
+        agent_id = int(header) if header.isdigit() else None
+        if agent_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        writes = scope["method"] not in self.SAFE_METHODS
+
+        async def send_noting_write(message):
+            # The handler has returned, so its writes are committed
+            if writes and message["type"] == "http.response.start" and message["status"] < 400:
+                replica_router.note_write(agent_id)
+            await send(message)
+
+        token = request_agent_id.set(agent_id)
+        try:
+            await self.app(scope, receive, send_noting_write)
+        finally:
+            request_agent_id.reset(token)
+
+
+class AdmissionMiddleware:
+    """
+    Admission control for the customer message routes: reads the request
+    body, classifies the message and waits for a slot on the route before
+    passing the request on, or answers 429 with Retry-After.
+    Only installed when ADMISSION_ENABLED is on.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        matched = admission.match(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if matched is None:
+            await self.app(scope, receive, send)
+            return
+        route, path_customer = matched
+
+        # The body is read once here and replayed to the route
+        received, body, more_body = [], b"", True
+        while more_body:
+            message = await receive()
+            received.append(message)
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        async def replay():
+            return received.pop(0) if received else await receive()
+
+        if more_body:
+            # Disconnected mid-body; let the route see it
+            await self.app(scope, replay, send)
+            return
+
+        priority, customer = admission.classify(body, path_customer)
+        try:
+            await admission.acquire(route, priority, customer)
+        except Refusal as refusal:
+            scope["admission_route"] = route
+            content = json.dumps({
+                "detail": "Too many messages, retry later",
+                "reason": refusal.reason,
+                "priority": priority.value
+            }).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(content)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(refusal.retry_after))).encode())
+                ]
+            })
+            await send({"type": "http.response.body", "body": content})
+            return
+        try:
+            await self.app(scope, replay, send)
+        finally:
+            admission.release(route)
@@ -1,4 +1,7 @@
-from .models import Customer, Agent, Conversation, Message, CannedMessage, MessagePriority, MessageStatus
+from .models import (
+    Customer, Agent, Conversation, Message, CannedMessage, ArchivedConversation, ArchivedMessage,
+    ReplicationHeartbeat, JobLease, MessagePriority, MessageStatus
+)
 
 __all__ = [
     "Customer",
@@ -6,6 +9,10 @@ __all__ = [
     "Conversation",
     "Message",
     "CannedMessage",
+    "ArchivedConversation",
+    "ArchivedMessage",
+    "ReplicationHeartbeat",
+    "JobLease",
     "MessagePriority",
     "MessageStatus"
 ]
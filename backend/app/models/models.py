@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum, Float, Index, and_
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -37,6 +37,15 @@ class Customer(Base):
     conversations = relationship("Conversation", back_populates="customer")
 
 
+# Trigram indexes let PostgreSQL serve the ILIKE '%term%' searches without a full scan
+Index("ix_customers_name_trgm", Customer.name, postgresql_using="gin",
+      postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+Index("ix_customers_email_trgm", Customer.email, postgresql_using="gin",
+      postgresql_ops={"email": "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+Index("ix_customers_phone_trgm", Customer.phone, postgresql_using="gin",
+      postgresql_ops={"phone": "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+
+
 class Agent(Base):
     __tablename__ = "agents"
 
@@ -45,6 +54,7 @@ class Agent(Base):
     email = Column(String(255), unique=True, index=True)
     avatar_url = Column(String(500), nullable=True)
     is_online = Column(Boolean, default=False)
+    last_seen = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     messages = relationship("Message", back_populates="agent")
@@ -62,12 +72,32 @@ class Conversation(Base):
     subject = Column(String(500), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped by every change to the row; orders the state carried by WebSocket events
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
+    # Fetch a server-side version bump with the UPDATE (RETURNING on PostgreSQL)
+    __mapper_args__ = {"eager_defaults": True}
+    # Never reuse the ids of rows moved to the archive (SQLite otherwise hands out MAX(id) + 1)
+    __table_args__ = {"sqlite_autoincrement": True}
     
     customer = relationship("Customer", back_populates="conversations")
     assigned_agent = relationship("Agent", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation", order_by="Message.created_at")
 
 
+# A customer's conversations, newest first, for the customer panel
+Index("ix_conversations_customer_updated", Conversation.customer_id, Conversation.updated_at)
+
+# Partial index over active conversations only: finding a customer's open
+# conversation and the unassigned queue never touch resolved history
+Index(
+    "ix_conversations_active_customer",
+    Conversation.customer_id, Conversation.updated_at,
+    postgresql_where=Conversation.status.in_([MessageStatus.OPEN, MessageStatus.IN_PROGRESS]),
+    sqlite_where=Conversation.status.in_([MessageStatus.OPEN, MessageStatus.IN_PROGRESS])
+)
+
+
 class Message(Base):
     __tablename__ = "messages"
 
@@ -80,12 +110,26 @@ class Message(Base):
     priority = Column(Enum(MessagePriority), default=MessagePriority.MEDIUM)
     created_at = Column(DateTime, default=datetime.utcnow)
     read_at = Column(DateTime, nullable=True)
+
+    __table_args__ = {"sqlite_autoincrement": True}
     
     conversation = relationship("Conversation", back_populates="messages")
     customer = relationship("Customer", back_populates="messages")
     agent = relationship("Agent", back_populates="messages")
 
 
+# Message history per conversation, and the small set of unread customer messages
+Index("ix_messages_conversation_created", Message.conversation_id, Message.created_at)
+Index(
+    "ix_messages_unread",
+    Message.conversation_id,
+    postgresql_where=and_(Message.is_from_customer.is_(True), Message.read_at.is_(None)),
+    sqlite_where=and_(Message.is_from_customer.is_(True), Message.read_at.is_(None))
+)
+Index("ix_messages_content_trgm", Message.content, postgresql_using="gin",
+      postgresql_ops={"content": "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+
+
 class CannedMessage(Base):
     __tablename__ = "canned_messages"
 
@@ -97,3 +141,64 @@ class CannedMessage(Base):
     usage_count = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ArchivedConversation(Base):
+    """
+    Resolved or closed conversation moved out of the hot tables by the archiver.
+    Same columns as Conversation, so the API serves both with the same schemas.
+    """
+    __tablename__ = "archived_conversations"
+    archived = True
+
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
+    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True)
+    status = Column(Enum(MessageStatus), nullable=False)
+    priority = Column(Enum(MessagePriority), nullable=False)
+    subject = Column(String(500), nullable=True)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    customer = relationship("Customer")
+    assigned_agent = relationship("Agent")
+    messages = relationship("ArchivedMessage", back_populates="conversation", order_by="ArchivedMessage.created_at")
+
+
+class ArchivedMessage(Base):
+    """Message of an archived conversation; same columns as Message"""
+    __tablename__ = "archived_messages"
+
+    id = Column(Integer, primary_key=True)
+    conversation_id = Column(Integer, ForeignKey("archived_conversations.id"), nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=True)
+    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True)
+    content = Column(Text, nullable=False)
+    is_from_customer = Column(Boolean, default=True)
+    priority = Column(Enum(MessagePriority), default=MessagePriority.MEDIUM)
+    created_at = Column(DateTime)
+    read_at = Column(DateTime, nullable=True)
+
+    conversation = relationship("ArchivedConversation", back_populates="messages")
+
+
+Index("ix_archived_messages_conversation_created", ArchivedMessage.conversation_id, ArchivedMessage.created_at)
+
+class ReplicationHeartbeat(Base):
+    """One row the primary rewrites periodically; a replica's copy shows how far behind it is"""
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True)
+    written_at = Column(Float, nullable=False)  # Unix time on the primary
+
+
+class JobLease(Base):
+    """Which worker runs a singleton background job, until when"""
+    __tablename__ = "job_leases"
+
+    name = Column(String(100), primary_key=True)
+    owner = Column(String(255), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    acquired_at = Column(DateTime, nullable=False)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 from enum import Enum
 
 
@@ -66,6 +66,7 @@ class AgentCreate(AgentBase):
 class AgentResponse(AgentBase):
     id: int
     is_online: bool
+    last_seen: Optional[datetime] = None
     created_at: datetime
 
     class Config:
@@ -136,6 +137,9 @@ class ConversationResponse(ConversationBase):
     customer: Optional[CustomerResponse] = None
     assigned_agent: Optional[AgentResponse] = None
     messages: List[MessageResponse] = []
+    archived: bool = False
+    # Bumped on every change; see "Real-time events" in the README
+    version: int = 1
 
     class Config:
         from_attributes = True
@@ -154,11 +158,29 @@ class ConversationListResponse(BaseModel):
     assigned_agent: Optional[AgentResponse] = None
     last_message: Optional[MessageResponse] = None
     unread_count: int = 0
+    archived: bool = False
+    version: int = 1
 
     class Config:
         from_attributes = True
 
 
+class CustomerOverviewResponse(BaseModel):
+    customer: CustomerResponse
+    # Most recently updated first; customer is left out, it is the one above
+    conversations: List[ConversationListResponse] = []
+    total_conversations: int = 0
+    open_conversations: int = 0
+    total_messages: int = 0
+    unread_count: int = 0
+    # Conversations per priority
+    priority_counts: Dict[MessagePriorityEnum, int] = {}
+    first_contact_at: Optional[datetime] = None
+    last_contact_at: Optional[datetime] = None
+    # Newest first, across all conversations
+    recent_messages: List[MessageResponse] = []
+
+
 # Canned Message Schemas
 class CannedMessageBase(BaseModel):
     title: str
@@ -1,10 +1,69 @@
+from .metrics_service import metrics, MetricsRegistry, instrument_engine, loop_lag_monitor
+from .sql_profiling_service import sql_profiler, SQLProfiler, QueryBudgetExceeded
+from .profiler_service import sampling_profiler, SamplingProfiler, stall_monitor, StallMonitor
+from .write_queue_service import write_queue, WriteQueue
+from .scheduler_service import scheduler, JobScheduler, IntervalTrigger, CronTrigger
+from .replica_service import replica_router, ReplicaRouter, get_replica_db
+from .archive_service import archiver, Archiver
+from .customer_overview_service import customer_overviews, CustomerOverviewCache
+from .conversation_cache_service import conversation_cache, ConversationCache
+from .admission_service import admission, AdmissionController
 from .priority_service import detect_priority, analyze_sentiment, extract_keywords
-from .websocket_manager import manager, ConnectionManager
+from .websocket_manager import manager, ConnectionManager, encode_frame, decode_frame
+from .typing_service import typing_tracker, TypingTracker
+from .presence_service import presence_tracker, PresenceTracker
+from .routing_service import routing_engine, RoutingEngine, RoutingQueue
+from .sla_service import sla_scheduler, SLAScheduler
+from .inbox_view_service import inbox_views, InboxViews
+from .auto_close_service import auto_closer, AutoCloser
 
 __all__ = [
+    "metrics",
+    "MetricsRegistry",
+    "instrument_engine",
+    "loop_lag_monitor",
+    "sql_profiler",
+    "SQLProfiler",
+    "QueryBudgetExceeded",
+    "sampling_profiler",
+    "SamplingProfiler",
+    "stall_monitor",
+    "StallMonitor",
+    "write_queue",
+    "WriteQueue",
+    "scheduler",
+    "JobScheduler",
+    "IntervalTrigger",
+    "CronTrigger",
+    "replica_router",
+    "ReplicaRouter",
+    "get_replica_db",
+    "archiver",
+    "Archiver",
+    "customer_overviews",
+    "CustomerOverviewCache",
+    "conversation_cache",
+    "ConversationCache",
+    "admission",
+    "AdmissionController",
     "detect_priority",
     "analyze_sentiment", 
     "extract_keywords",
     "manager",
-    "ConnectionManager"
+    "ConnectionManager",
+    "encode_frame",
+    "decode_frame",
+    "typing_tracker",
+    "TypingTracker",
+    "presence_tracker",
+    "PresenceTracker",
+    "routing_engine",
+    "RoutingEngine",
+    "RoutingQueue",
+    "sla_scheduler",
+    "SLAScheduler",
+    "inbox_views",
+    "InboxViews",
+    "auto_closer",
+    "AutoCloser"
 ]
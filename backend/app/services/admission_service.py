@@ -0,0 +1,260 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import re
+import time
+
+from ..models import MessagePriority
+from .metrics_service import metrics
+from .priority_service import detect_priority
+from .routing_service import PRIORITY_RANK
+
+# Set to "false" to admit every ingest request as it arrives
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Requests each ingest route serves at once; the rest wait, most urgent first
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "16"))
+# Requests that can wait per route; when full, a more urgent request displaces the least urgent waiter
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "256"))
+# Longest wait for a slot before the request is turned away with 429
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "5"))
+# Low-priority messages ("hi", "thanks") give up sooner
+ADMISSION_LOW_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_LOW_MAX_WAIT_SECONDS", "0.5"))
+# Retry-After sent when a route is overloaded
+ADMISSION_RETRY_AFTER_SECONDS = float(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+# Messages per second each customer can keep sending, after a burst of
+# ADMISSION_CUSTOMER_BURST; urgent messages are never rate limited. 0 turns it off
+ADMISSION_CUSTOMER_RATE = float(os.getenv("ADMISSION_CUSTOMER_RATE", "1"))
+ADMISSION_CUSTOMER_BURST = float(os.getenv("ADMISSION_CUSTOMER_BURST", "20"))
+# Customers whose token buckets are kept; least recently seen go first
+ADMISSION_CUSTOMER_KEYS = int(os.getenv("ADMISSION_CUSTOMER_KEYS", "100000"))
+
+# POST routes whose messages are admitted by priority: (route template, path pattern)
+INGEST_ROUTES = [
+    ("/api/external/messages", re.compile(r"^/api/external/messages/?$")),
+    ("/api/customers/{customer_id}/messages", re.compile(r"^/api/customers/(\d+)/messages/?$")),
+]
+
+admission_admitted = metrics.counter(
+    "admission_admitted_total", "Ingest requests admitted by route and priority", ["route", "priority"]
+)
+admission_shed = metrics.counter(
+    "admission_shed_total",
+    "Ingest requests turned away with 429 by reason (rate_limited, queue_full, displaced, timeout)",
+    ["route", "priority", "reason"]
+)
+admission_wait = metrics.histogram(
+    "admission_wait_seconds", "Time ingest requests waited for a slot", ["route", "priority"]
+)
+
+
+class Refusal(Exception):
+    """A request turned away, with the seconds the client should wait before retrying"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """Per-key token buckets, bounded to the most recently seen keys"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> [tokens, monotonic time of the last update]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """Take a token; returns 0, or the seconds until one is available"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RouteBudget:
+    """
+    Concurrency limit of one route. Requests past the limit wait in a
+    priority queue; a finishing request hands its slot straight to the most
+    urgent waiter (oldest first within a priority).
+    """
+
+    def __init__(self, limit: int, queue_size: int):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self.queued = 0
+        # [-rank, arrival, future]; futures that are done are skipped when popped
+        self._waiters: List[list] = []
+        self._arrivals = itertools.count()
+
+    async def acquire(self, rank: int, timeout: float) -> Optional[str]:
+        """Take a slot; returns None once it is held, or why the request was turned away"""
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return None
+        if self.queued >= self.queue_size:
+            # The newest of the least urgent waiters goes, if this request outranks it
+            lowest = max(
+                (w for w in self._waiters if not w[2].done()), key=lambda w: (w[0], w[1]), default=None
+            )
+            if lowest is None or -lowest[0] >= rank:
+                return "queue_full"
+            lowest[2].set_result("displaced")
+            self.queued -= 1
+
+        waiter = [-rank, next(self._arrivals), asyncio.get_running_loop().create_future()]
+        heapq.heappush(self._waiters, waiter)
+        self.queued += 1
+        future = waiter[2]
+        try:
+            await asyncio.wait({future}, timeout=timeout)
+        finally:
+            if not future.done():
+                # Timed out, or the client went away
+                future.cancel()
+                self.queued -= 1
+            elif future.result() is None and asyncio.current_task().cancelling():
+                self.release()
+        return future.result() if not future.cancelled() else "timeout"
+
+    def release(self):
+        """Give the slot to the next waiter, or free it"""
+        while self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            if not waiter[2].done():
+                waiter[2].set_result(None)
+                self.queued -= 1
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    """
+    Admission control for the customer message routes. Each message is
+    classified with detect_priority before its request runs; urgent messages
+    skip the per-customer rate limit and take the first free slot of their
+    route, while low-priority messages wait only briefly and are the first
+    displaced when the queue fills. Requests turned away get 429 with
+    Retry-After, so the sender retries once the burst has passed.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = ADMISSION_ENABLED,
+        concurrency: int = ADMISSION_CONCURRENCY,
+        queue_size: int = ADMISSION_QUEUE_SIZE
+    ):
+        self.enabled = enabled
+        self.budgets: Dict[str, RouteBudget] = {
+            route: RouteBudget(concurrency, queue_size) for route, _ in INGEST_ROUTES
+        }
+        self.customers = TokenBuckets(ADMISSION_CUSTOMER_RATE, ADMISSION_CUSTOMER_BURST, ADMISSION_CUSTOMER_KEYS)
+        metrics.gauge(
+            "admission_queue_depth", "Ingest requests waiting for a slot", ["route"],
+            callback=lambda: {(route,): budget.queued for route, budget in self.budgets.items()}
+        )
+        metrics.gauge(
+            "admission_in_flight", "Ingest requests holding a slot", ["route"],
+            callback=lambda: {(route,): budget.active for route, budget in self.budgets.items()}
+        )
+
+    def match(self, method: str, path: str) -> Optional[Tuple[str, Optional[str]]]:
+        """(route, customer ID from the path) if this request is admission controlled"""
+        if method != "POST":
+            return None
+        for route, pattern in INGEST_ROUTES:
+            found = pattern.match(path)
+            if found:
+                return route, found.group(1) if pattern.groups else None
+        return None
+
+    def classify(self, body: bytes, path_customer: Optional[str]) -> Tuple[MessagePriority, Optional[str]]:
+        """Priority of the message in a request body and the customer sending it"""
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            # The route rejects it; let it through at the default priority
+            return MessagePriority.MEDIUM, None
+        content = payload.get("content")
+        priority = detect_priority(content)[0] if isinstance(content, str) else MessagePriority.MEDIUM
+        if path_customer is not None:
+            customer = f"id:{path_customer}"
+        elif payload.get("customer_id"):
+            customer = f"id:{payload['customer_id']}"
+        elif isinstance(payload.get("customer_email"), str):
+            customer = f"email:{payload['customer_email'].strip().lower()}"
+        else:
+            customer = None
+        return priority, customer
+
+    async def acquire(self, route: str, priority: MessagePriority, customer: Optional[str]):
+        """Wait for a slot on route; raises Refusal if the request is turned away"""
+        labels = (route, priority.value)
+        if priority != MessagePriority.URGENT and customer is not None:
+            wait = self.customers.take(customer)
+            if wait:
+                admission_shed.inc((*labels, "rate_limited"))
+                raise Refusal("rate_limited", wait)
+
+        timeout = ADMISSION_LOW_MAX_WAIT_SECONDS if priority == MessagePriority.LOW else ADMISSION_MAX_WAIT_SECONDS
+        started = time.perf_counter()
+        reason = await self.budgets[route].acquire(PRIORITY_RANK[priority], timeout)
+        if reason is not None:
+            admission_shed.inc((*labels, reason))
+            raise Refusal(reason, ADMISSION_RETRY_AFTER_SECONDS)
+        admission_wait.observe(time.perf_counter() - started, labels)
+        admission_admitted.inc(labels)
+
+    def release(self, route: str):
+        self.budgets[route].release()
+
+    def get_stats(self) -> dict:
+        shed: Dict[str, Dict[str, int]] = {}
+        for (route, priority, reason), count in admission_shed.values.items():
+            by_reason = shed.setdefault(route, {})
+            by_reason[reason] = by_reason.get(reason, 0) + int(count)
+        return {
+            "enabled": self.enabled,
+            "routes": {
+                route: {
+                    "limit": budget.limit,
+                    "in_flight": budget.active,
+                    "queued": budget.queued,
+                    "queue_size": budget.queue_size,
+                    "admitted": int(sum(
+                        count for labels, count in admission_admitted.values.items() if labels[0] == route
+                    )),
+                    "shed": shed.get(route, {})
+                }
+                for route, budget in self.budgets.items()
+            },
+            "customers_tracked": len(self.customers)
+        }
+
+
+# Global admission controller instance
+admission = AdmissionController()
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import os
+
+from sqlalchemy import select, insert, delete
+
+from ..models import Conversation, Message, ArchivedConversation, ArchivedMessage, MessageStatus
+from .conversation_cache_service import conversation_cache
+from .customer_overview_service import customer_overviews
+from .event_service import combine_deltas
+from .metrics_service import metrics
+from .scheduler_service import scheduler, IntervalTrigger
+from .websocket_manager import manager
+from .write_queue_service import write_queue
+
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "true").lower() == "true"
+# Resolved or closed conversations untouched for this long leave the hot tables
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+# Conversations moved per transaction; keeps each write short
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "200"))
+# How often the background pass runs (one worker per run)
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+ARCHIVABLE_STATUSES = [MessageStatus.RESOLVED, MessageStatus.CLOSED]
+CONVERSATION_COLUMNS = [column.name for column in Conversation.__table__.columns]
+MESSAGE_COLUMNS = [column.name for column in Message.__table__.columns]
+
+conversations_archived = metrics.counter(
+    "conversations_archived_total", "Conversations moved to the archive tables"
+)
+messages_archived = metrics.counter(
+    "messages_archived_total", "Messages moved to the archive tables"
+)
+
+
+class Archiver:
+    """
+    Moves conversations resolved or closed more than ARCHIVE_AFTER_DAYS ago,
+    with their messages, into archived_conversations / archived_messages, so
+    the hot tables and their indexes only hold the active workload.
+    Each chunk of ARCHIVE_BATCH_SIZE conversations is one write unit.
+    get_conversation and get_customer_conversations fall back to the archive.
+    """
+
+    def __init__(self, batch_size: int = ARCHIVE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.last_run: Optional[datetime] = None
+        self.last_archived = 0
+
+    async def archive_chunk(self, cutoff: datetime) -> int:
+        """Move up to batch_size conversations older than cutoff; returns how many moved"""
+        def move(session):
+            # Lock the chosen rows on PostgreSQL so a concurrent reopen waits for us
+            rows = session.execute(
+                select(Conversation.id, Conversation.status, Conversation.priority)
+                .where(Conversation.status.in_(ARCHIVABLE_STATUSES), Conversation.updated_at < cutoff)
+                .order_by(Conversation.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                return [], 0
+            ids = [row.id for row in rows]
+            session.execute(insert(ArchivedConversation).from_select(
+                CONVERSATION_COLUMNS,
+                select(*[Conversation.__table__.c[name] for name in CONVERSATION_COLUMNS])
+                .where(Conversation.id.in_(ids))
+            ))
+            moved_messages = session.execute(insert(ArchivedMessage).from_select(
+                MESSAGE_COLUMNS,
+                select(*[Message.__table__.c[name] for name in MESSAGE_COLUMNS])
+                .where(Message.conversation_id.in_(ids))
+            )).rowcount
+            session.execute(delete(Message).where(Message.conversation_id.in_(ids)))
+            session.execute(delete(Conversation).where(Conversation.id.in_(ids)))
+            return rows, moved_messages
+
+        rows, moved_messages = await write_queue.submit(move)
+        moved = len(rows)
+        conversations_archived.inc(amount=moved)
+        messages_archived.inc(amount=max(moved_messages, 0))
+        if moved:
+            # Cached overviews still show these conversations as live
+            customer_overviews.clear()
+            for row in rows:
+                conversation_cache.drop(row.id)
+            # Archived conversations leave the inbox and move to the "archived" count
+            delta = combine_deltas(((row.status, row.priority, False), -1) for row in rows)
+            delta["archived"] = moved
+            await manager.broadcast({
+                "type": "conversations_archived",
+                "data": {"conversation_ids": [row.id for row in rows], "stats_delta": delta}
+            })
+        return moved
+
+    async def archive(self) -> int:
+        """Archive everything past the retention window, chunk by chunk"""
+        cutoff = datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS)
+        total = 0
+        while True:
+            moved = await self.archive_chunk(cutoff)
+            total += moved
+            if moved < self.batch_size:
+                break
+            # Let requests waiting on the writer go first
+            await asyncio.sleep(0)
+        self.last_run = datetime.utcnow()
+        self.last_archived = total
+        if total:
+            print(f"Archived {total} conversations older than {ARCHIVE_AFTER_DAYS:g} days")
+        return total
+
+# Global archiver instance
+archiver = Archiver()
+if ARCHIVE_ENABLED:
+    scheduler.add("archive", IntervalTrigger(ARCHIVE_INTERVAL_SECONDS), archiver.archive)
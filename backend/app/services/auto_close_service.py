@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+import asyncio
+import os
+
+from sqlalchemy import select, desc
+
+from ..models import Conversation, Message, MessageStatus
+from .conversation_cache_service import conversation_cache
+from .customer_overview_service import customer_overviews
+from .event_service import bump_version, stats_state, stats_delta, conversation_summary
+from .metrics_service import metrics
+from .routing_service import routing_engine
+from .scheduler_service import scheduler, CronTrigger
+from .sla_service import sla_scheduler
+from .websocket_manager import manager
+from .write_queue_service import write_queue
+
+# In-progress conversations whose last message is an agent's and that have had no
+# activity for this long are closed; 0 turns auto-closing off
+AUTO_CLOSE_IDLE_HOURS = float(os.getenv("AUTO_CLOSE_IDLE_HOURS", "72"))
+# When the auto-close pass runs (cron, UTC; one worker per run)
+AUTO_CLOSE_SCHEDULE = os.getenv("AUTO_CLOSE_SCHEDULE", "*/15 * * * *")
+# Conversations closed per write unit
+AUTO_CLOSE_BATCH_SIZE = int(os.getenv("AUTO_CLOSE_BATCH_SIZE", "100"))
+
+conversations_auto_closed = metrics.counter(
+    "conversations_auto_closed_total", "Idle conversations closed by the auto-close job"
+)
+
+
+class AutoCloser:
+    """
+    Closes conversations that are waiting on a customer who went quiet:
+    in progress, last message from an agent, untouched for AUTO_CLOSE_IDLE_HOURS.
+    Each batch is one write unit and is broadcast like a status change made
+    through PUT /conversations/{id}.
+    """
+
+    def __init__(self, batch_size: int = AUTO_CLOSE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.last_closed = 0
+
+    async def close_batch(self, cutoff: datetime) -> int:
+        """Close up to batch_size idle conversations; returns how many were closed"""
+        last_from_customer = (
+            select(Message.is_from_customer)
+            .where(Message.conversation_id == Conversation.id)
+            .order_by(desc(Message.created_at), desc(Message.id))
+            .limit(1)
+            .scalar_subquery()
+        )
+
+        def close(session):
+            conversations = session.execute(
+                select(Conversation)
+                .where(
+                    Conversation.status == MessageStatus.IN_PROGRESS,
+                    Conversation.updated_at < cutoff,
+                    last_from_customer.is_(False)
+                )
+                .order_by(Conversation.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            closed = []
+            now = datetime.utcnow()
+            for conversation in conversations:
+                before = stats_state(conversation)
+                conversation.status = MessageStatus.CLOSED
+                conversation.updated_at = now
+                bump_version(conversation)
+                closed.append((conversation, before))
+            session.flush()
+            return closed
+
+        closed = await write_queue.submit(close)
+        conversations_auto_closed.inc(amount=len(closed))
+        for conversation, before in closed:
+            customer_overviews.invalidate(conversation.customer_id)
+            conversation_cache.conversation_changed(conversation)
+            await manager.broadcast_conversation_update({
+                "id": conversation.id,
+                "status": conversation.status.value,
+                "priority": conversation.priority.value,
+                "agent_id": conversation.agent_id,
+                "conversation": conversation_summary(conversation),
+                "stats_delta": stats_delta(before, stats_state(conversation))
+            })
+            sla_scheduler.conversation_updated(conversation)
+            await routing_engine.sync_conversation(conversation)
+            # A broadcast with no one listening doesn't yield; keep each slice of work short
+            await asyncio.sleep(0)
+        return len(closed)
+
+    async def close_idle(self) -> int:
+        """Close every idle conversation, batch by batch"""
+        cutoff = datetime.utcnow() - timedelta(hours=AUTO_CLOSE_IDLE_HOURS)
+        total = 0
+        while True:
+            closed = await self.close_batch(cutoff)
+            total += closed
+            if closed < self.batch_size:
+                break
+            # Let requests waiting on the writer go first
+            await asyncio.sleep(0)
+        self.last_closed = total
+        if total:
+            print(f"Closed {total} conversations idle for {AUTO_CLOSE_IDLE_HOURS:g} hours")
+        return total
+
+
+# Global auto-closer instance
+auto_closer = AutoCloser()
+if AUTO_CLOSE_IDLE_HOURS > 0:
+    scheduler.add("auto_close", CronTrigger(AUTO_CLOSE_SCHEDULE), auto_closer.close_idle)
@@ -0,0 +1,314 @@
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+import json
+import os
+import time
+
+from sqlalchemy import select
+
+from ..models import Agent, Conversation, Message
+from ..schemas import ConversationResponse, CustomerResponse, AgentResponse, MessageResponse
+from .event_service import ACTIVE_STATUSES
+from .metrics_service import metrics
+
+# Most recent messages kept per conversation; conversations with more are only
+# served from the cache to requests for at most this many messages
+CONVERSATION_CACHE_MESSAGES = int(os.getenv("CONVERSATION_CACHE_MESSAGES", "50"))
+# Total size of cached conversations (encoded JSON); least recently used go first
+CONVERSATION_CACHE_MAX_BYTES = int(os.getenv("CONVERSATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# How long a loaded conversation is served; writes made through this worker keep
+# it current, writes made through other workers show up within it
+CONVERSATION_CACHE_TTL_SECONDS = float(os.getenv("CONVERSATION_CACHE_TTL_SECONDS", "30"))
+
+cache_lookups = metrics.counter(
+    "conversation_cache_total",
+    "Conversation lookups by result (hit, miss, partial: cached but without the messages asked for)",
+    ["result"]
+)
+
+
+def _size(value) -> int:
+    return len(json.dumps(value, separators=(",", ":")))
+
+
+def _message_key(row: dict):
+    return row["created_at"], row["id"]
+
+
+class CachedConversation:
+    """GET /conversations/{id} body of one active conversation, with its newest messages"""
+
+    def __init__(self, header: dict, messages: list, complete: bool, max_messages: int, ttl: float):
+        # ConversationResponse fields in JSON form; "messages" is filled in per request
+        self.header = header
+        self.messages = deque(messages[-max_messages:], maxlen=max_messages)
+        # Whether messages holds every message of the conversation
+        self.complete = complete and len(messages) <= max_messages
+        self.expires = time.monotonic() + ttl
+        self.size = _size(header) + sum(_size(row) for row in self.messages)
+
+    def add(self, row: dict) -> bool:
+        """Add a message in created_at order; False if it was already there"""
+        if any(cached["id"] == row["id"] for cached in self.messages):
+            return False
+        rows = [*self.messages, row]
+        if len(rows) > 1 and _message_key(rows[-2]) > _message_key(row):
+            # A write that committed earlier was reported later
+            rows.sort(key=_message_key)
+        self.size += _size(row)
+        if len(rows) > self.messages.maxlen:
+            self.complete = False
+            self.size -= _size(rows.pop(0))
+        self.messages = deque(rows, maxlen=self.messages.maxlen)
+        return True
+
+    def body(self, message_limit: Optional[int]) -> Optional[bytes]:
+        """Encoded response, or None if the messages asked for aren't all here"""
+        if message_limit is None and not self.complete:
+            return None
+        if message_limit is not None and message_limit > len(self.messages) and not self.complete:
+            return None
+        messages = list(self.messages)
+        if message_limit is not None:
+            messages = messages[-message_limit:]
+        response = dict(self.header)
+        response["messages"] = messages
+        return json.dumps(response, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class ConversationCache:
+    """
+    In-memory GET /conversations/{id} for open and in-progress conversations.
+    Filled by reads and by the write paths that add messages (ingest and agent
+    replies); the routes that change a conversation report the change here so
+    cached entries stay current, and conversations that are resolved or
+    closed are dropped.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = CONVERSATION_CACHE_MESSAGES,
+        max_bytes: int = CONVERSATION_CACHE_MAX_BYTES,
+        ttl: float = CONVERSATION_CACHE_TTL_SECONDS
+    ):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._entries: "OrderedDict[int, CachedConversation]" = OrderedDict()
+        # Conversation ID -> token of a read that may fill the cache when it finishes
+        self._filling: Dict[int, object] = {}
+        metrics.gauge(
+            "conversation_cache_entries", "Conversations currently cached",
+            callback=lambda: {(): len(self._entries)}
+        )
+        metrics.gauge(
+            "conversation_cache_bytes", "Encoded size of the cached conversations",
+            callback=lambda: {(): self.bytes}
+        )
+
+    def get(self, conversation_id: int, message_limit: Optional[int] = None) -> Optional[bytes]:
+        """Encoded GET /conversations/{id} response, or None if the database has to answer"""
+        entry = self._entries.get(conversation_id)
+        if entry is not None and entry.expires <= time.monotonic():
+            self.drop(conversation_id)
+            entry = None
+        if entry is None:
+            cache_lookups.inc(("miss",))
+            return None
+        body = entry.body(message_limit)
+        if body is None:
+            cache_lookups.inc(("partial",))
+            return None
+        self._entries.move_to_end(conversation_id)
+        cache_lookups.inc(("hit",))
+        return body
+
+    def reserve(self, conversation_id: int) -> object:
+        """Call before reading a conversation to fill() with; a write reported meanwhile voids it"""
+        token = self._filling[conversation_id] = object()
+        return token
+
+    def release(self, conversation_id: int, token: object):
+        """Forget a reservation that ended without fill(), e.g. not found or failed"""
+        if self._filling.get(conversation_id) is token:
+            del self._filling[conversation_id]
+
+    def fill(self, token: object, conversation):
+        """Cache a conversation read with its customer, agent and messages loaded"""
+        if conversation is None or self._filling.get(conversation.id) is not token:
+            return
+        del self._filling[conversation.id]
+        # Archived conversations are never active
+        if not isinstance(conversation, Conversation) or conversation.status not in ACTIVE_STATUSES:
+            return
+        header = ConversationResponse.model_validate(conversation).model_dump(mode="json")
+        messages, header["messages"] = header["messages"], []
+        self._store(conversation.id, CachedConversation(header, messages, True, self.max_messages, self.ttl))
+
+    def _header(self, conversation, customer, agent=None) -> dict:
+        return ConversationResponse(
+            id=conversation.id,
+            customer_id=conversation.customer_id,
+            agent_id=conversation.agent_id,
+            status=conversation.status.value,
+            priority=conversation.priority.value,
+            subject=conversation.subject,
+            created_at=conversation.created_at,
+            updated_at=conversation.updated_at,
+            version=conversation.version,
+            customer=CustomerResponse.model_validate(customer),
+            assigned_agent=AgentResponse.model_validate(agent) if agent is not None else None
+        ).model_dump(mode="json")
+
+    def started(self, conversation, customer, message):
+        """Cache a conversation just created by its first message"""
+        self._filling.pop(conversation.id, None)
+        header = self._header(conversation, customer)
+        row = MessageResponse.model_validate(message).model_dump(mode="json")
+        self._store(conversation.id, CachedConversation(header, [row], True, self.max_messages, self.ttl))
+
+    def load_for_write(self, session, conversation) -> Optional[Tuple[list, Optional[Agent]]]:
+        """
+        Call inside a write unit, after flushing the message it adds: for a
+        conversation that isn't cached, read its newest messages and agent so
+        add_message can cache it. Only a membership check runs on the writer
+        thread; a stale answer costs one extra read or one later miss.
+        """
+        if conversation.id in self._entries or conversation.status not in ACTIVE_STATUSES:
+            return None
+        result = session.execute(
+            select(Message)
+            .where(Message.conversation_id == conversation.id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(self.max_messages + 1)
+        )
+        messages = result.scalars().all()
+        agent = session.get(Agent, conversation.agent_id) if conversation.agent_id is not None else None
+        return messages[::-1], agent
+
+    def add_message(self, conversation, message, agent=None, customer=None, loaded=None):
+        """
+        Report a message added to an existing conversation, with the conversation
+        as written. loaded is what load_for_write read, to cache a conversation
+        that isn't; customer is then required.
+        """
+        self.conversation_changed(conversation, agent, customer)
+        entry = self._entries.get(conversation.id)
+        if entry is None:
+            if loaded is not None and customer is not None and conversation.status in ACTIVE_STATUSES:
+                messages, assigned_agent = loaded
+                rows = [MessageResponse.model_validate(row).model_dump(mode="json") for row in messages]
+                # One row past the buffer means there are older messages
+                self._store(conversation.id, CachedConversation(
+                    self._header(conversation, customer, assigned_agent),
+                    rows, len(rows) <= self.max_messages, self.max_messages, self.ttl
+                ))
+            return
+        size = entry.size
+        if entry.add(MessageResponse.model_validate(message).model_dump(mode="json")):
+            self._resized(conversation.id, entry, size)
+
+    def conversation_changed(self, conversation, agent=None, customer=None):
+        """
+        Report a change to a conversation's status, priority or assignment.
+        agent is the newly assigned agent, if the caller has it; without it a
+        new assignment drops the entry. customer is passed when it was written too.
+        """
+        self._filling.pop(conversation.id, None)
+        entry = self._entries.get(conversation.id)
+        if entry is None:
+            return
+        if conversation.status not in ACTIVE_STATUSES:
+            self.drop(conversation.id)
+            return
+        header = entry.header
+        if conversation.version <= header["version"]:
+            return
+        size, header_size = entry.size, _size(header)
+        if conversation.agent_id != header["agent_id"]:
+            if conversation.agent_id is None:
+                header["assigned_agent"] = None
+            elif agent is not None and agent.id == conversation.agent_id:
+                header["assigned_agent"] = AgentResponse.model_validate(agent).model_dump(mode="json")
+            else:
+                self.drop(conversation.id)
+                return
+        if customer is not None:
+            header["customer"] = CustomerResponse.model_validate(customer).model_dump(mode="json")
+        header.update(
+            agent_id=conversation.agent_id,
+            status=conversation.status.value,
+            priority=conversation.priority.value,
+            subject=conversation.subject,
+            updated_at=conversation.updated_at.isoformat(),
+            version=conversation.version
+        )
+        entry.size += _size(header) - header_size
+        self._resized(conversation.id, entry, size)
+
+    def mark_read(self, conversation_id: int, read_at):
+        """Report customer messages up to read_at marked read"""
+        self._filling.pop(conversation_id, None)
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            return
+        read_at = read_at.isoformat()
+        size = entry.size
+        for row in entry.messages:
+            if row["is_from_customer"] and row["read_at"] is None and row["created_at"] <= read_at:
+                row_size = _size(row)
+                row["read_at"] = read_at
+                entry.size += _size(row) - row_size
+        if entry.size != size:
+            self._resized(conversation_id, entry, size)
+
+    def drop(self, conversation_id: int):
+        self._filling.pop(conversation_id, None)
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def drop_customer(self, customer_id: int):
+        """Drop a customer's conversations after the customer changes"""
+        for conversation_id, entry in list(self._entries.items()):
+            if entry.header["customer_id"] == customer_id:
+                self.drop(conversation_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._filling.clear()
+        self.bytes = 0
+
+    def _store(self, conversation_id: int, entry: CachedConversation):
+        self.drop(conversation_id)
+        self._entries[conversation_id] = entry
+        self.bytes += entry.size
+        self._evict()
+
+    def _resized(self, conversation_id: int, entry: CachedConversation, previous_size: int):
+        self.bytes += entry.size - previous_size
+        self._entries.move_to_end(conversation_id)
+        self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.bytes -= entry.size
+
+    def get_stats(self) -> dict:
+        lookups = {labels[0]: int(count) for labels, count in cache_lookups.values.items()}
+        total = sum(lookups.values())
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "messages_per_conversation": self.max_messages,
+            "ttl_seconds": self.ttl,
+            "lookups": lookups,
+            "hit_rate": round(lookups.get("hit", 0) / total, 3) if total else None
+        }
+
+
+# Global conversation cache instance
+conversation_cache = ConversationCache()
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import os
+import time
+
+from .metrics_service import metrics
+
+# How long a built overview is served before it is rebuilt; writes made through
+# this worker drop it sooner, writes made through other workers show up within it
+CUSTOMER_OVERVIEW_TTL_SECONDS = float(os.getenv("CUSTOMER_OVERVIEW_TTL_SECONDS", "10"))
+# Customers kept in the cache; the least recently used are dropped first
+CUSTOMER_OVERVIEW_CACHE_SIZE = int(os.getenv("CUSTOMER_OVERVIEW_CACHE_SIZE", "5000"))
+
+overview_lookups = metrics.counter(
+    "customer_overview_cache_total", "Customer overview lookups by result (hit, miss, shared)", ["result"]
+)
+
+
+class CustomerOverviewCache:
+    """
+    Short-TTL cache of encoded GET /customers/{id}/overview bodies, keyed by customer.
+    Routes that add messages or change a customer's conversations call
+    invalidate(customer_id). Concurrent misses for one customer share a
+    single build.
+    """
+
+    def __init__(self, ttl: float = CUSTOMER_OVERVIEW_TTL_SECONDS, max_entries: int = CUSTOMER_OVERVIEW_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Customer ID -> (monotonic expiry, encoded body)
+        self._entries: "OrderedDict[int, Tuple[float, bytes]]" = OrderedDict()
+        self._building: Dict[int, asyncio.Task] = {}
+        metrics.gauge(
+            "customer_overview_cache_entries", "Customer overviews currently cached",
+            callback=lambda: {(): len(self._entries)}
+        )
+
+    async def get(self, customer_id: int, build: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """Cached overview for customer_id, or the result of build() (None if there is no such customer)"""
+        entry = self._entries.get(customer_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(customer_id)
+            overview_lookups.inc(("hit",))
+            return entry[1]
+
+        task = self._building.get(customer_id)
+        if task is None:
+            overview_lookups.inc(("miss",))
+            task = asyncio.ensure_future(self._build(customer_id, build))
+            self._building[customer_id] = task
+        else:
+            overview_lookups.inc(("shared",))
+        # A caller that disconnects doesn't cancel the build others wait on
+        return await asyncio.shield(task)
+
+    async def _build(self, customer_id: int, build: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        this = asyncio.current_task()
+        try:
+            body = await build()
+        finally:
+            # invalidate() during the build means it may have read older data; don't keep it
+            current = self._building.get(customer_id) is this
+            if current:
+                del self._building[customer_id]
+        if current and body is not None:
+            self._entries[customer_id] = (time.monotonic() + self.ttl, body)
+            self._entries.move_to_end(customer_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def invalidate(self, customer_id: int):
+        """Drop a customer's overview after a write that changes it"""
+        self._entries.pop(customer_id, None)
+        self._building.pop(customer_id, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._building.clear()
+
+
+# Global customer overview cache instance
+customer_overviews = CustomerOverviewCache()
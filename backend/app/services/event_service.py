@@ -0,0 +1,113 @@
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import select, func
+
+from ..database import IS_POSTGRES
+from ..models import Conversation, Message, MessagePriority, MessageStatus
+
+ACTIVE_STATUSES = (MessageStatus.OPEN, MessageStatus.IN_PROGRESS)
+
+# What GET /conversations/stats counts a conversation under: (status, priority, unassigned)
+StatsState = Tuple[MessageStatus, MessagePriority, bool]
+
+
+def bump_version(conversation: Conversation):
+    """Advance a conversation's version; call once in every write unit that changes it"""
+    if IS_POSTGRES:
+        # Atomic under concurrent transactions; read back with RETURNING on flush
+        conversation.version = Conversation.version + 1
+    else:
+        # SQLite writes are serialized, so this can't lose a concurrent bump
+        conversation.version = (conversation.version or 0) + 1
+
+
+def stats_state(conversation) -> StatsState:
+    return (
+        conversation.status,
+        conversation.priority,
+        conversation.agent_id is None and conversation.status in ACTIVE_STATUSES
+    )
+
+
+def stats_delta(before: Optional[StatsState], after: Optional[StatsState]) -> dict:
+    """
+    Change to the /conversations/stats counters when a conversation goes from
+    state before to state after (None: not counted). Only non-zero counters
+    are included.
+    """
+    return combine_deltas([(before, -1), (after, 1)])
+
+
+def combine_deltas(changes: Iterable[Tuple[Optional[StatsState], int]]) -> dict:
+    by_status, by_priority, unassigned = {}, {}, 0
+    for state, count in changes:
+        if state is None:
+            continue
+        status, priority, is_unassigned = state
+        by_status[status.value] = by_status.get(status.value, 0) + count
+        by_priority[priority.value] = by_priority.get(priority.value, 0) + count
+        unassigned += count if is_unassigned else 0
+    delta = {}
+    if any(by_status.values()):
+        delta["by_status"] = {key: value for key, value in by_status.items() if value}
+    if any(by_priority.values()):
+        delta["by_priority"] = {key: value for key, value in by_priority.items() if value}
+    if unassigned:
+        delta["unassigned"] = unassigned
+    return delta
+
+
+def unread_count(session, conversation_id: int) -> int:
+    """Unread customer messages in a conversation, from inside a write unit"""
+    return session.execute(
+        select(func.count(Message.id)).where(
+            Message.conversation_id == conversation_id,
+            Message.is_from_customer.is_(True),
+            Message.read_at.is_(None)
+        )
+    ).scalar()
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() + "Z" if value is not None else None
+
+
+def conversation_summary(conversation, agent_name: Optional[str] = None, customer=None) -> dict:
+    """
+    Versioned state of a conversation's inbox row, carried by conversation events.
+    agent_name and customer are included when given; without them clients
+    keep what they have.
+    """
+    summary = {
+        "id": conversation.id,
+        "customer_id": conversation.customer_id,
+        "agent_id": conversation.agent_id,
+        "status": conversation.status.value,
+        "priority": conversation.priority.value,
+        "subject": conversation.subject,
+        "created_at": _timestamp(conversation.created_at),
+        "updated_at": _timestamp(conversation.updated_at),
+        "version": conversation.version
+    }
+    if conversation.agent_id is None:
+        summary["agent_name"] = None
+    elif agent_name is not None:
+        summary["agent_name"] = agent_name
+    if customer is not None:
+        summary["customer"] = {"id": customer.id, "name": customer.name, "email": customer.email}
+    return summary
+
+
+def message_row(message) -> dict:
+    return {
+        "id": message.id,
+        "conversation_id": message.conversation_id,
+        "customer_id": message.customer_id,
+        "agent_id": message.agent_id,
+        "content": message.content,
+        "is_from_customer": message.is_from_customer,
+        "priority": message.priority.value,
+        "created_at": _timestamp(message.created_at),
+        "read_at": _timestamp(message.read_at)
+    }
@@ -0,0 +1,415 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+import asyncio
+import os
+
+from sqlalchemy import select, func, case, desc, and_
+from sqlalchemy.orm import selectinload
+
+from ..database import read_session_maker
+from ..models import Conversation, Message, MessagePriority, MessageStatus
+from .event_service import conversation_summary, message_row
+from .metrics_service import metrics
+from .routing_service import PRIORITY_RANK
+from .websocket_manager import manager, ConnectionManager
+
+# Rows kept per view; subscribers see at most this many
+INBOX_VIEW_ROWS = int(os.getenv("INBOX_VIEW_ROWS", "200"))
+# Rows in a subscriber's window unless it asks for another limit
+INBOX_VIEW_DEFAULT_LIMIT = 50
+
+# Events that change inbox rows
+VIEW_EVENTS = {"new_conversation", "new_message", "conversation_update", "messages_read", "conversations_archived"}
+
+view_loads = metrics.counter("inbox_view_loads_total", "Inbox views loaded or reloaded from the database")
+view_diffs = metrics.counter("inbox_view_diffs_total", "Inbox diff frames sent, per subscriber")
+
+# Ascending order is inbox order: most urgent, then most recently updated, then newest
+SortKey = Tuple[int, float, int]
+
+
+class InboxFilter(NamedTuple):
+    """The filters of GET /conversations; one view is kept per distinct combination"""
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    agent_id: Optional[int] = None
+    unassigned: bool = False
+
+    @classmethod
+    def from_data(cls, data: dict) -> "InboxFilter":
+        """Validated filters from a subscribe_inbox frame; raises ValueError"""
+        status = data.get("status") or None
+        priority = data.get("priority") or None
+        agent_id = data.get("agent_id") or None
+        if status is not None:
+            MessageStatus(status)
+        if priority is not None:
+            MessagePriority(priority)
+        if agent_id is not None and not isinstance(agent_id, int):
+            raise ValueError("agent_id must be an integer")
+        return cls(status, priority, agent_id, bool(data.get("unassigned")))
+
+    @property
+    def view_id(self) -> str:
+        return urlencode({key: value for key, value in self._asdict().items() if value})
+
+    def matches(self, row: dict) -> bool:
+        return (
+            (self.status is None or row["status"] == self.status)
+            and (self.priority is None or row["priority"] == self.priority)
+            and (self.agent_id is None or row["agent_id"] == self.agent_id)
+            and (not self.unassigned or row["agent_id"] is None)
+        )
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.status is not None:
+            conditions.append(Conversation.status == MessageStatus(self.status))
+        if self.priority is not None:
+            conditions.append(Conversation.priority == MessagePriority(self.priority))
+        if self.agent_id is not None:
+            conditions.append(Conversation.agent_id == self.agent_id)
+        if self.unassigned:
+            conditions.append(Conversation.agent_id.is_(None))
+        return conditions
+
+
+def sort_key(row: dict) -> SortKey:
+    updated_at = datetime.fromisoformat(row["updated_at"].rstrip("Z"))
+    return (-PRIORITY_RANK[MessagePriority(row["priority"])], -updated_at.timestamp(), -row["id"])
+
+
+class InboxView:
+    """
+    Sorted keys of the first rows matching one filter. When more rows match
+    than are kept, the view is incomplete: a row sorting after the last kept
+    key is outside it, and it is reloaded if it shrinks below a window.
+    """
+
+    def __init__(self, filters: InboxFilter):
+        self.filters = filters
+        self.keys: List[SortKey] = []
+        self.members: Dict[int, SortKey] = {}
+        self.complete = True
+        # Connection ID -> window size
+        self.subscribers: Dict[str, int] = {}
+
+    def load(self, rows: List[dict], complete: bool):
+        self.members = {row["id"]: sort_key(row) for row in rows}
+        self.keys = sorted(self.members.values())
+        self.complete = complete
+
+    def window(self, limit: int) -> List[int]:
+        return [-key[2] for key in self.keys[:limit]]
+
+    def place(self, conversation_id: int, row: Optional[dict]) -> bool:
+        """Move a conversation to where its row sorts (None: remove it); True if the view changed"""
+        old = self.members.pop(conversation_id, None)
+        if old is not None:
+            del self.keys[bisect_left(self.keys, old)]
+        key = sort_key(row) if row is not None and self.filters.matches(row) else None
+        if key is not None and (self.complete or (self.keys and key < self.keys[-1])):
+            self.members[conversation_id] = key
+            insort(self.keys, key)
+            if len(self.keys) > INBOX_VIEW_ROWS:
+                del self.members[-self.keys.pop()[2]]
+                self.complete = False
+        return old is not None or conversation_id in self.members
+
+    @property
+    def needs_reload(self) -> bool:
+        return not self.complete and len(self.keys) < max(self.subscribers.values(), default=0)
+
+
+def window_diff(before: List[int], after: List[int], rows: Dict[int, dict], changed: set) -> List[dict]:
+    """
+    Ops turning window before into after when applied in order: remove by id,
+    insert at index, move to index. Moves also carry rows updated in place.
+    """
+    after_ids = set(after)
+    ops = [{"op": "remove", "id": conversation_id} for conversation_id in before if conversation_id not in after_ids]
+    current = [conversation_id for conversation_id in before if conversation_id in after_ids]
+    for index, conversation_id in enumerate(after):
+        if index < len(current) and current[index] == conversation_id:
+            if conversation_id in changed:
+                ops.append({"op": "move", "id": conversation_id, "index": index, "row": rows[conversation_id]})
+            continue
+        if conversation_id in current:
+            current.remove(conversation_id)
+            op = {"op": "move", "id": conversation_id, "index": index}
+            if conversation_id in changed:
+                op["row"] = rows[conversation_id]
+        else:
+            op = {"op": "insert", "index": index, "row": rows[conversation_id]}
+        current.insert(index, conversation_id)
+        ops.append(op)
+    return ops
+
+
+async def load_rows(conditions: list, limit: Optional[int] = None) -> List[dict]:
+    """
+    Inbox rows matching conditions in inbox order: the conversation summary
+    with customer and agent name, last message and unread count. Reads the
+    primary, since the rows are then kept current from events.
+    """
+    async with read_session_maker() as db:
+        query = select(Conversation).where(*conditions).options(
+            selectinload(Conversation.customer),
+            selectinload(Conversation.assigned_agent)
+        ).order_by(
+            case(*[(Conversation.priority == p, rank) for p, rank in PRIORITY_RANK.items()], else_=0).desc(),
+            desc(Conversation.updated_at),
+            desc(Conversation.id)
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        conversations = (await db.execute(query)).scalars().all()
+        if not conversations:
+            return []
+        ids = [c.id for c in conversations]
+
+        unread = and_(Message.is_from_customer.is_(True), Message.read_at.is_(None))
+        result = await db.execute(
+            select(Message.conversation_id, func.sum(case((unread, 1), else_=0)))
+            .where(Message.conversation_id.in_(ids))
+            .group_by(Message.conversation_id)
+        )
+        unread_counts = dict(result.all())
+
+        # Newest message of each conversation
+        ranked = select(
+            Message.id,
+            func.row_number().over(
+                partition_by=Message.conversation_id,
+                order_by=(desc(Message.created_at), desc(Message.id))
+            ).label("rank")
+        ).where(Message.conversation_id.in_(ids)).subquery()
+        result = await db.execute(select(Message).join(ranked, ranked.c.id == Message.id).where(ranked.c.rank == 1))
+        last_messages = {m.conversation_id: m for m in result.scalars().all()}
+
+    rows = []
+    for conversation in conversations:
+        agent = conversation.assigned_agent
+        row = conversation_summary(conversation, agent.name if agent else None, customer=conversation.customer)
+        last_message = last_messages.get(conversation.id)
+        row["last_message"] = message_row(last_message) if last_message else None
+        row["unread_count"] = unread_counts.get(conversation.id) or 0
+        rows.append(row)
+    return rows
+
+
+class InboxViews:
+    """
+    Live inbox views shared by every agent watching the same filters.
+    Broadcast conversation events update each view once, in memory; its
+    subscribers get the resulting insert/move/remove diffs of their window
+    instead of re-running the inbox query. Events and subscriptions are
+    applied by one task in broadcast order, so a view loaded from the
+    database misses no write broadcast after it.
+    """
+
+    def __init__(self, connection_manager: ConnectionManager):
+        self.connection_manager = connection_manager
+        self.views: Dict[InboxFilter, InboxView] = {}
+        # Connection ID -> filters it is subscribed to
+        self.subscriptions: Dict[str, InboxFilter] = {}
+        # Rows of conversations in at least one view
+        self.rows: Dict[int, dict] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        connection_manager.add_listener(self._on_broadcast)
+        metrics.gauge("inbox_views", "Live inbox views", callback=lambda: {(): len(self.views)})
+        metrics.gauge(
+            "inbox_view_subscriptions", "Connections subscribed to an inbox view",
+            callback=lambda: {(): len(self.subscriptions)}
+        )
+
+    def _on_broadcast(self, message: dict):
+        if self._task is not None and message["type"] in VIEW_EVENTS:
+            self._queue.put_nowait(("event", message))
+
+    def subscribe(self, connection_id: str, data: dict):
+        """Subscribe a connection to a view, replacing its previous one; raises ValueError"""
+        filters = InboxFilter.from_data(data)
+        limit = data.get("limit", INBOX_VIEW_DEFAULT_LIMIT)
+        if not isinstance(limit, int) or limit < 1:
+            raise ValueError("limit must be a positive integer")
+        self._queue.put_nowait(("subscribe", (connection_id, filters, min(limit, INBOX_VIEW_ROWS))))
+
+    def unsubscribe(self, connection_id: str):
+        """Drop a connection's subscription, e.g. when it disconnects"""
+        self._queue.put_nowait(("unsubscribe", (connection_id,)))
+
+    def _unsubscribe(self, connection_id: str):
+        filters = self.subscriptions.pop(connection_id, None)
+        view = self.views.get(filters)
+        if view is None:
+            return
+        view.subscribers.pop(connection_id, None)
+        if not view.subscribers:
+            del self.views[filters]
+            self._forget_rows(view.members)
+
+    def _forget_rows(self, conversation_ids):
+        for conversation_id in conversation_ids:
+            if not any(conversation_id in view.members for view in self.views.values()):
+                self.rows.pop(conversation_id, None)
+
+    async def _load(self, view: InboxView):
+        rows = await load_rows(view.filters.conditions(), INBOX_VIEW_ROWS + 1)
+        view_loads.inc()
+        complete = len(rows) <= INBOX_VIEW_ROWS
+        rows = rows[:INBOX_VIEW_ROWS]
+        previous = list(view.members)
+        # Loaded rows are as new as any event applied so far
+        self.rows.update((row["id"], row) for row in rows)
+        view.load(rows, complete)
+        self._forget_rows(previous)
+
+    async def _send_snapshot(self, view: InboxView, connection_ids: List[str], reason: str):
+        for connection_id in connection_ids:
+            window = view.window(view.subscribers[connection_id])
+            await self.connection_manager.send_to([connection_id], {
+                "type": "inbox_snapshot",
+                "data": {"view": view.filters.view_id, "reason": reason, "rows": [self.rows[i] for i in window]}
+            })
+
+    async def _subscribe(self, connection_id: str, filters: InboxFilter, limit: int):
+        # Resubscribing to the same filters keeps the view
+        if self.subscriptions.get(connection_id) != filters:
+            self._unsubscribe(connection_id)
+        if connection_id not in self.connection_manager.connections:
+            self._unsubscribe(connection_id)
+            return
+        view = self.views.get(filters)
+        if view is None:
+            view = InboxView(filters)
+            await self._load(view)
+            self.views[filters] = view
+        view.subscribers[connection_id] = limit
+        self.subscriptions[connection_id] = filters
+        await self._send_snapshot(view, [connection_id], "subscribed")
+
+    async def _fetch_row(self, conversation_id: int) -> Optional[dict]:
+        rows = await load_rows([Conversation.id == conversation_id])
+        view_loads.inc()
+        return rows[0] if rows else None
+
+    async def _updated_row(self, message: dict) -> Tuple[Optional[int], Optional[dict]]:
+        """(conversation ID, its row after the event) for an event that changes one conversation"""
+        data = message["data"]
+        summary = data.get("conversation")
+        conversation_id = summary["id"] if summary else data.get("conversation_id", data.get("id"))
+        row = self.rows.get(conversation_id)
+
+        if row is None:
+            if summary is None:
+                # Not in any view and no state to place it with
+                return conversation_id, None
+            if "customer" in summary:
+                row = {**summary, "last_message": None, "unread_count": 0}
+            elif any(view.filters.matches(summary) for view in self.views.values()):
+                return conversation_id, await self._fetch_row(conversation_id)
+            else:
+                return conversation_id, None
+        elif summary is not None and summary["version"] > row["version"]:
+            if summary["agent_id"] != row["agent_id"] and "agent_name" not in summary:
+                # New agent's name unknown here
+                return conversation_id, await self._fetch_row(conversation_id)
+            row = {**row, **summary}
+
+        if message["type"] == "new_message":
+            row = {**row, "last_message": {field: data.get(field) for field in (
+                "id", "conversation_id", "customer_id", "agent_id", "content", "is_from_customer",
+                "priority", "created_at"
+            )}}
+            row["last_message"]["read_at"] = None
+        if "unread_count" in data:
+            row = {**row, "unread_count": data["unread_count"]}
+        return conversation_id, row
+
+    async def _apply(self, message: dict):
+        if not self.views:
+            return
+        if message["type"] == "conversations_archived":
+            changes = {conversation_id: None for conversation_id in message["data"]["conversation_ids"]}
+        else:
+            conversation_id, row = await self._updated_row(message)
+            if conversation_id is None or (row is None and conversation_id not in self.rows):
+                return
+            changes = {conversation_id: row}
+
+        for conversation_id, row in changes.items():
+            if row is not None:
+                self.rows[conversation_id] = row
+
+        for view in list(self.views.values()):
+            limits = set(view.subscribers.values())
+            before = {limit: view.window(limit) for limit in limits}
+            changed = False
+            for conversation_id, row in changes.items():
+                changed |= view.place(conversation_id, row)
+            if not changed:
+                continue
+            if view.needs_reload:
+                await self._load(view)
+                await self._send_snapshot(view, list(view.subscribers), "reloaded")
+                continue
+            for limit in limits:
+                ops = window_diff(before[limit], view.window(limit), self.rows, set(changes))
+                if ops:
+                    connection_ids = [cid for cid, size in view.subscribers.items() if size == limit]
+                    await self.connection_manager.send_to(connection_ids, {
+                        "type": "inbox_diff",
+                        "data": {"view": view.filters.view_id, "ops": ops}
+                    })
+                    view_diffs.inc(amount=len(connection_ids))
+        self._forget_rows(changes)
+
+    async def _run(self):
+        while True:
+            kind, item = await self._queue.get()
+            try:
+                if kind == "subscribe":
+                    await self._subscribe(*item)
+                elif kind == "unsubscribe":
+                    self._unsubscribe(*item)
+                else:
+                    await self._apply(item)
+            except Exception as e:
+                print(f"Error updating inbox views: {e}")
+
+    def start(self):
+        """Start applying events and subscriptions"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> dict:
+        return {
+            "views": [
+                {
+                    "view": filters.view_id,
+                    "rows": len(view.keys),
+                    "complete": view.complete,
+                    "subscribers": len(view.subscribers)
+                }
+                for filters, view in self.views.items()
+            ],
+            "subscriptions": len(self.subscriptions),
+            "cached_rows": len(self.rows)
+        }
+
+
+# Global inbox views instance
+inbox_views = InboxViews(manager)
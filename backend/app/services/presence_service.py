@@ -0,0 +1,115 @@
+from typing import Awaitable, Callable, List, Optional
+from datetime import datetime
+import os
+
+from sqlalchemy import update
+
+from ..models import Agent
+from .scheduler_service import scheduler, IntervalTrigger
+from .websocket_manager import manager, ConnectionManager
+from .write_queue_service import write_queue
+
+# How often changed presence is written back to the agents table
+PRESENCE_FLUSH_INTERVAL_SECONDS = float(os.getenv("PRESENCE_FLUSH_INTERVAL_SECONDS", "10"))
+
+
+class PresenceTracker:
+    """
+    Tracks agent online state in memory, derived from live WebSocket connections.
+    Changes are broadcast immediately as presence deltas and written to
+    Agent.is_online / Agent.last_seen in periodic batched updates.
+    """
+
+    def __init__(self, connection_manager: ConnectionManager):
+        self.connection_manager = connection_manager
+        # Agents currently online
+        self.online: set[int] = set()
+        # Last time each agent was seen connecting or disconnecting
+        self.last_seen: dict[int, datetime] = {}
+        # Agents whose presence changed since the last database flush
+        self.dirty: set[int] = set()
+        # Called with (agent_id, is_online) whenever an agent's state flips
+        self.listeners: List[Callable[[int, bool], Awaitable[None]]] = []
+
+    def add_listener(self, listener: Callable[[int, bool], Awaitable[None]]):
+        """Register a coroutine to be notified of presence changes"""
+        self.listeners.append(listener)
+
+    def is_online(self, agent_id: int) -> bool:
+        return agent_id in self.online
+
+    def get_last_seen(self, agent_id: int) -> Optional[datetime]:
+        return self.last_seen.get(agent_id)
+
+    async def set_online(self, agent_id: int, is_online: bool):
+        """Record a presence change and broadcast it if the state flipped"""
+        now = datetime.utcnow()
+        self.last_seen[agent_id] = now
+        self.dirty.add(agent_id)
+
+        if is_online == (agent_id in self.online):
+            return
+        if is_online:
+            self.online.add(agent_id)
+        else:
+            self.online.discard(agent_id)
+
+        await self.connection_manager.broadcast({
+            "type": "agent_presence",
+            "data": {
+                "agent_id": agent_id,
+                "is_online": is_online,
+                "last_seen": now.isoformat() + "Z"
+            }
+        })
+
+        for listener in self.listeners:
+            try:
+                await listener(agent_id, is_online)
+            except Exception as e:
+                print(f"Error in presence listener: {e}")
+
+    async def agent_connected(self, agent_id: int):
+        """Called after an agent opens a WebSocket connection"""
+        await self.set_online(agent_id, True)
+
+    async def agent_disconnected(self, agent_id: int):
+        """Called after an agent's connection closes; offline once none remain"""
+        if agent_id not in self.connection_manager.agent_connections:
+            await self.set_online(agent_id, False)
+
+    async def flush(self):
+        """Write changed presence to the database in a single batch"""
+        if not self.dirty:
+            return
+
+        agent_ids, self.dirty = self.dirty, set()
+        rows = [
+            {"id": agent_id, "is_online": agent_id in self.online, "last_seen": self.last_seen[agent_id]}
+            for agent_id in agent_ids
+        ]
+        try:
+            def store(session):
+                session.execute(update(Agent), rows)
+
+            await write_queue.submit(store)
+        except Exception:
+            # Retry these agents on the next flush
+            self.dirty |= agent_ids
+            raise
+
+    async def stop(self):
+        """Write any outstanding changes"""
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Error flushing agent presence: {e}")
+
+
+# Global presence tracker instance
+presence_tracker = PresenceTracker(manager)
+# Each worker writes the presence it tracks
+scheduler.add(
+    "presence_flush", IntervalTrigger(PRESENCE_FLUSH_INTERVAL_SECONDS), presence_tracker.flush,
+    singleton=False, jitter=0
+)
@@ -0,0 +1,224 @@
+from typing import List, Optional
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+
+from .metrics_service import metrics
+
+# Token required by the profiling endpoints and X-Profile header; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Default sampling interval and longest allowed timed profile
+PROFILER_INTERVAL_SECONDS = float(os.getenv("PROFILER_INTERVAL_SECONDS", "0.005"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+# Number of finished profiles kept for download
+PROFILER_HISTORY = int(os.getenv("PROFILER_HISTORY", "20"))
+# A callback blocking the event loop for longer than this is captured; 0 disables
+LOOP_STALL_THRESHOLD_SECONDS = float(os.getenv("LOOP_STALL_THRESHOLD_SECONDS", "0.25"))
+# Number of recent stalls kept
+LOOP_STALL_HISTORY = int(os.getenv("LOOP_STALL_HISTORY", "50"))
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """Check a presented admin token; always false when no token is configured"""
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def collapse_stack(frame) -> str:
+    """
+    Render a frame's stack root-first in the collapsed format used by
+    flamegraph.pl, speedscope and inferno: "outer (file);inner (file)".
+    Line numbers are left out so samples of the same function aggregate.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = "/".join(code.co_filename.replace("\\", "/").rsplit("/", 2)[-2:])
+        names.append(f"{code.co_name} ({filename})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profile:
+    """Stack samples collected over one profiling window"""
+
+    def __init__(self, trigger: str, interval: float):
+        self.id: str = uuid.uuid4().hex[:12]
+        self.trigger = trigger
+        self.interval = interval
+        self.started_at = datetime.utcnow()
+        self.duration: float = 0.0
+        self.samples: Counter = Counter()
+
+    def collapsed(self) -> str:
+        """Flame-graph-ready output: one "stack count" line per distinct stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat() + "Z",
+            "duration_seconds": round(self.duration, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": sum(self.samples.values()),
+            "distinct_stacks": len(self.samples)
+        }
+
+
+class SamplingProfiler:
+    """
+    Samples the event loop thread's stack from a background thread.
+    Nothing runs while no profile is active; one profile runs at a time.
+    """
+
+    def __init__(self, history: int = PROFILER_HISTORY):
+        self.profiles: OrderedDict[str, Profile] = OrderedDict()
+        self.history = history
+        self.active: Optional[Profile] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def busy(self) -> bool:
+        return self.active is not None
+
+    def start(self, trigger: str, interval: float = PROFILER_INTERVAL_SECONDS, all_threads: bool = False) -> Profile:
+        """Start sampling; raises RuntimeError if a profile is already running"""
+        if self.active is not None:
+            raise RuntimeError("A profile is already running")
+        profile = Profile(trigger, max(interval, 0.001))
+        self.active = profile
+        self._stop.clear()
+        target_thread = None if all_threads else threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._sample, args=(profile, target_thread), name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+        return profile
+
+    def stop(self) -> Optional[Profile]:
+        """Stop sampling and keep the finished profile for download"""
+        profile = self.active
+        if profile is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.active = None
+        self.profiles[profile.id] = profile
+        while len(self.profiles) > self.history:
+            self.profiles.popitem(last=False)
+        return profile
+
+    async def run(self, seconds: float, interval: float = PROFILER_INTERVAL_SECONDS, all_threads: bool = False) -> Profile:
+        """Profile the process for a number of seconds"""
+        self.start(f"timed {seconds:g}s", interval, all_threads)
+        try:
+            await asyncio.sleep(min(seconds, PROFILER_MAX_SECONDS))
+        finally:
+            profile = self.stop()
+        return profile
+
+    def _sample(self, profile: Profile, thread_id: Optional[int]):
+        own_id = threading.get_ident()
+        started = time.monotonic()
+        while not self._stop.wait(profile.interval):
+            frames = sys._current_frames()
+            if thread_id is not None:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profile.samples[collapse_stack(frame)] += 1
+                continue
+            for ident, frame in frames.items():
+                if ident != own_id:
+                    profile.samples[f"thread-{ident};{collapse_stack(frame)}"] += 1
+        profile.duration = time.monotonic() - started
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self.profiles.get(profile_id)
+
+    def list(self) -> List[dict]:
+        return [profile.to_dict() for profile in reversed(self.profiles.values())]
+
+
+class StallMonitor:
+    """
+    Detects event loop stalls from a watchdog thread.
+    The thread posts a no-op callback to the loop; if it has not run within the
+    threshold, the loop is blocked and the loop thread's stack is sampled until
+    it recovers, so the offending code shows up in the capture.
+    """
+
+    def __init__(self, threshold: float = LOOP_STALL_THRESHOLD_SECONDS, history: int = LOOP_STALL_HISTORY):
+        self.threshold = threshold
+        self.stalls: deque = deque(maxlen=history)
+        self.stall_count = metrics.counter("event_loop_stalls_total", "Event loop stalls longer than the threshold")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+
+    def start(self):
+        """Start watching the running event loop"""
+        if self.threshold <= 0 or self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-stall-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the watchdog thread"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        sample_interval = min(PROFILER_INTERVAL_SECONDS * 2, self.threshold / 5)
+        while not self._stop.wait(self.threshold / 2):
+            answered = threading.Event()
+            posted = time.monotonic()
+            try:
+                self._loop.call_soon_threadsafe(answered.set)
+            except RuntimeError:  # loop closed
+                return
+            if answered.wait(self.threshold):
+                continue
+
+            samples: Counter = Counter()
+            while not answered.is_set() and not self._stop.is_set():
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    samples[collapse_stack(frame)] += 1
+                answered.wait(sample_interval)
+            self._record(time.monotonic() - posted, samples)
+
+    def _record(self, duration: float, samples: Counter):
+        top = samples.most_common(1)[0][0] if samples else ""
+        self.stalls.append({
+            "detected_at": datetime.utcnow().isoformat() + "Z",
+            "duration_ms": round(duration * 1000, 1),
+            "samples": sum(samples.values()),
+            "top_stack": top,
+            "stacks": dict(samples.most_common(10))
+        })
+        # Metrics are only updated on the loop thread
+        self._loop.call_soon_threadsafe(self.stall_count.inc)
+        innermost = top.rsplit(";", 1)[-1] if top else "unknown"
+        print(f"Event loop blocked for {duration * 1000:.0f} ms in {innermost}")
+
+    def get_stalls(self) -> List[dict]:
+        return list(reversed(self.stalls))
+
+
+# Global profiler and stall monitor instances
+sampling_profiler = SamplingProfiler()
+stall_monitor = StallMonitor()
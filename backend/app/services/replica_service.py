@@ -0,0 +1,169 @@
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import asyncio
+import itertools
+import os
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from ..database import replica_engines, read_session_maker
+from ..models import ReplicationHeartbeat
+from .metrics_service import metrics
+from .write_queue_service import write_queue
+
+# Replicas further behind the primary than this are skipped
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+# How often the primary heartbeat is written and each replica's copy of it read
+REPLICA_HEARTBEAT_SECONDS = float(os.getenv("REPLICA_HEARTBEAT_SECONDS", "1"))
+# A replica that doesn't answer the lag check within this is treated as down
+REPLICA_CHECK_TIMEOUT_SECONDS = float(os.getenv("REPLICA_CHECK_TIMEOUT_SECONDS", "1"))
+
+# Agent making the current request, from the X-Agent-Id header
+request_agent_id: ContextVar[Optional[int]] = ContextVar("request_agent_id", default=None)
+
+replica_reads = metrics.counter(
+    "db_replica_reads_total", "Sessions opened for replica-eligible reads by target", ["target"]
+)
+
+
+class Replica:
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        # Primary time of the newest heartbeat this replica has applied
+        self.position: Optional[float] = None
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.error is None and self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+
+
+class ReplicaRouter:
+    """
+    Sends read-only sessions for the heavy list and search endpoints to read
+    replicas, falling back to the primary.
+
+    The primary rewrites a heartbeat row every REPLICA_HEARTBEAT_SECONDS; the
+    heartbeat a replica has applied tells how far behind it is. A replica is
+    used only while its lag is under REPLICA_MAX_LAG_SECONDS and it answers.
+
+    Read-your-writes: after an agent's write request completes, that agent's
+    reads only go to replicas whose heartbeat was written after it, so an
+    agent never reads state older than their own change.
+    """
+
+    def __init__(self, engines: List[AsyncEngine]):
+        self.replicas = [Replica(f"replica{i}", engine) for i, engine in enumerate(engines)]
+        self.enabled = bool(self.replicas)
+        # Agent ID -> primary time their last write request finished
+        self.last_write: Dict[int, float] = {}
+        self._next = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        if self.enabled:
+            metrics.gauge(
+                "db_replica_lag_seconds", "Seconds each replica is behind the primary heartbeat (-1 if unknown)",
+                ["replica"],
+                callback=lambda: {(r.name,): r.lag if r.lag is not None else -1 for r in self.replicas}
+            )
+
+    def note_write(self, agent_id: int):
+        """Record that an agent's write has committed on the primary"""
+        self.last_write[agent_id] = time.time()
+
+    def choose(self, agent_id: Optional[int] = None) -> Optional[Replica]:
+        """A replica fresh enough for this agent, or None for the primary"""
+        written = self.last_write.get(agent_id) if agent_id is not None else None
+        candidates = [
+            r for r in self.replicas
+            if r.healthy and (written is None or r.position >= written)
+        ]
+        if not candidates:
+            return None
+        return candidates[next(self._next) % len(candidates)]
+
+    def session(self) -> AsyncSession:
+        """Session for a replica-eligible read by the current request's agent"""
+        replica = self.choose(request_agent_id.get())
+        replica_reads.inc((replica.name if replica else "primary",))
+        if replica is None:
+            return read_session_maker()
+        return replica.session_maker()
+
+    async def heartbeat(self):
+        """Write the primary heartbeat, then read each replica's copy of it"""
+        def beat(session):
+            session.merge(ReplicationHeartbeat(id=1, written_at=time.time()))
+
+        await write_queue.submit(beat)
+        await asyncio.gather(*[self._check(replica) for replica in self.replicas])
+        # Entries older than the lag limit are satisfied by every usable replica
+        cutoff = time.time() - REPLICA_MAX_LAG_SECONDS
+        self.last_write = {agent: at for agent, at in self.last_write.items() if at > cutoff}
+
+    async def _check(self, replica: Replica):
+        try:
+            async with replica.session_maker() as session:
+                position = await asyncio.wait_for(
+                    session.scalar(select(ReplicationHeartbeat.written_at).where(ReplicationHeartbeat.id == 1)),
+                    REPLICA_CHECK_TIMEOUT_SECONDS
+                )
+        except Exception as e:
+            if replica.error is None:
+                reason = str(e).splitlines()[0] if str(e) else ""
+                print(f"Replica {replica.name} unavailable, reading from the primary: {e.__class__.__name__} {reason}")
+            replica.error = f"{e.__class__.__name__}"
+            return
+        replica.error = None
+        replica.position = position
+        replica.lag = time.time() - position if position is not None else None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                print(f"Error checking replicas: {e}")
+            await asyncio.sleep(REPLICA_HEARTBEAT_SECONDS)
+
+    def start(self):
+        """Start the heartbeat loop; replicas are unused until their first check"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_status(self) -> List[dict]:
+        return [
+            {
+                "name": r.name,
+                "healthy": r.healthy,
+                "lag_seconds": round(r.lag, 3) if r.lag is not None else None,
+                "error": r.error
+            }
+            for r in self.replicas
+        ]
+
+
+async def get_replica_db():
+    """Session for the heavy read endpoints; see ReplicaRouter"""
+    async with replica_router.session() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+# Global replica router instance
+replica_router = ReplicaRouter(replica_engines)
@@ -0,0 +1,330 @@
+from typing import Callable, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import heapq
+import os
+
+from sqlalchemy import select, update
+
+from ..database import read_session_maker
+from ..models import Agent, Conversation, MessagePriority
+from .conversation_cache_service import conversation_cache
+from .customer_overview_service import customer_overviews
+from .event_service import ACTIVE_STATUSES, stats_state, stats_delta, conversation_summary
+from .websocket_manager import manager, ConnectionManager
+from .presence_service import presence_tracker
+from .scheduler_service import scheduler, IntervalTrigger
+from .write_queue_service import write_queue
+
+# Set to "false" to leave unassigned conversations for agents to claim manually
+AUTO_ROUTING_ENABLED = os.getenv("AUTO_ROUTING_ENABLED", "true").lower() == "true"
+# Open conversations an agent can hold before routing skips them
+MAX_OPEN_CONVERSATIONS_PER_AGENT = int(os.getenv("MAX_OPEN_CONVERSATIONS_PER_AGENT", "5"))
+# How often each worker rebuilds its routing queue, picking up changes made through other workers
+ROUTING_RECONCILE_SECONDS = float(os.getenv("ROUTING_RECONCILE_SECONDS", "300"))
+
+PRIORITY_RANK = {
+    MessagePriority.LOW: 0,
+    MessagePriority.MEDIUM: 1,
+    MessagePriority.HIGH: 2,
+    MessagePriority.URGENT: 3
+}
+
+
+class RoutingQueue:
+    """
+    In-memory routing state with no I/O.
+    Unassigned conversations sit in a max-heap by (priority rank, wait time) and
+    online agents in a min-heap by open load. Stale heap entries are skipped
+    lazily, so every update and assignment is O(log n).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        # (-rank, enqueued_at, conversation_id)
+        self.conversation_heap: list = []
+        # Current heap key of each queued conversation
+        self.queued: dict[int, tuple] = {}
+        # (load, agent_id)
+        self.agent_heap: list = []
+        self.online: set[int] = set()
+        self.loads: dict[int, int] = {}
+        # Active (open or in progress) conversations -> assigned agent or None
+        self.assignments: dict[int, Optional[int]] = {}
+        # Assignments whose claim is still being written -> agent
+        self.reserved: dict[int, int] = {}
+
+    def _push_agent(self, agent_id: int):
+        load = self.loads.get(agent_id, 0)
+        if agent_id in self.online and load < self.capacity:
+            heapq.heappush(self.agent_heap, (load, agent_id))
+            if len(self.agent_heap) > 2 * len(self.online) + 64:
+                self.agent_heap = [
+                    (self.loads.get(a, 0), a) for a in self.online
+                    if self.loads.get(a, 0) < self.capacity
+                ]
+                heapq.heapify(self.agent_heap)
+
+    def _adjust_load(self, agent_id: int, delta: int):
+        self.loads[agent_id] = max(0, self.loads.get(agent_id, 0) + delta)
+        self._push_agent(agent_id)
+
+    def _enqueue(self, conversation_id: int, rank: int, enqueued_at: float):
+        key = (-rank, enqueued_at, conversation_id)
+        if self.queued.get(conversation_id) == key:
+            return
+        self.queued[conversation_id] = key
+        heapq.heappush(self.conversation_heap, key)
+        if len(self.conversation_heap) > 2 * len(self.queued) + 64:
+            self.conversation_heap = list(self.queued.values())
+            heapq.heapify(self.conversation_heap)
+
+    def update_conversation(
+        self,
+        conversation_id: int,
+        agent_id: Optional[int],
+        is_active: bool,
+        rank: int,
+        enqueued_at: float
+    ):
+        """Reconcile routing state with the current state of a conversation"""
+        self.reserved.pop(conversation_id, None)
+        previous = self.assignments.get(conversation_id)
+        if previous is not None and (not is_active or previous != agent_id):
+            self._adjust_load(previous, -1)
+
+        if is_active:
+            if agent_id is not None and previous != agent_id:
+                self._adjust_load(agent_id, 1)
+            self.assignments[conversation_id] = agent_id
+        else:
+            self.assignments.pop(conversation_id, None)
+
+        if is_active and agent_id is None:
+            self._enqueue(conversation_id, rank, enqueued_at)
+        else:
+            self.queued.pop(conversation_id, None)
+
+    def set_agent_online(self, agent_id: int, is_online: bool):
+        if is_online:
+            self.online.add(agent_id)
+            self._push_agent(agent_id)
+        else:
+            # Heap entries for offline agents are dropped when they surface
+            self.online.discard(agent_id)
+
+    def _peek_conversation(self) -> Optional[int]:
+        while self.conversation_heap:
+            key = self.conversation_heap[0]
+            if self.queued.get(key[2]) == key:
+                return key[2]
+            heapq.heappop(self.conversation_heap)
+        return None
+
+    def _peek_agent(self) -> Optional[int]:
+        while self.agent_heap:
+            load, agent_id = self.agent_heap[0]
+            if agent_id in self.online and self.loads.get(agent_id, 0) == load and load < self.capacity:
+                return agent_id
+            heapq.heappop(self.agent_heap)
+        return None
+
+    def next_assignment(self) -> Optional[Tuple[int, int]]:
+        """Most urgent waiting conversation and least loaded available agent"""
+        conversation_id = self._peek_conversation()
+        if conversation_id is None:
+            return None
+        agent_id = self._peek_agent()
+        if agent_id is None:
+            return None
+        return conversation_id, agent_id
+
+    def assign(self, conversation_id: int, agent_id: int):
+        """Record a successful assignment"""
+        self.queued.pop(conversation_id, None)
+        self.assignments[conversation_id] = agent_id
+        self._adjust_load(agent_id, 1)
+
+    def reserve(self, conversation_id: int, agent_id: int):
+        """Record an assignment before it is claimed, so no other dispatch picks either of the pair"""
+        self.assign(conversation_id, agent_id)
+        self.reserved[conversation_id] = agent_id
+
+    def release(self, conversation_id: int):
+        """
+        Undo the reservation of a claim that failed (the conversation was
+        assigned or closed elsewhere). It is not requeued; if its state was
+        synced meanwhile, that state stands.
+        """
+        agent_id = self.reserved.pop(conversation_id, None)
+        if agent_id is not None:
+            self.assignments.pop(conversation_id, None)
+            self._adjust_load(agent_id, -1)
+
+
+class RoutingEngine:
+    """
+    Automatically assigns unassigned conversations to online agents.
+    Assignments are persisted with a compare-and-set UPDATE, so a conversation
+    claimed manually (or by another worker) in the meantime is left alone.
+    """
+
+    def __init__(self, connection_manager: ConnectionManager, capacity: int):
+        self.connection_manager = connection_manager
+        self.queue = RoutingQueue(capacity)
+        self.agent_names: dict[int, str] = {}
+        self.assigned_total = 0
+        self.conflicts_total = 0
+        self._lock = asyncio.Lock()
+        # Called with each conversation routing assigns, like after a manual assignment
+        # (services that import this module, e.g. SLA tracking, can't be called directly)
+        self.listeners: List[Callable[[Conversation], None]] = []
+
+    def add_listener(self, listener: Callable[[Conversation], None]):
+        """Register a function to be told about automatic assignments"""
+        self.listeners.append(listener)
+
+    async def load(self):
+        """Rebuild routing state from the database"""
+        async with read_session_maker() as session:
+            result = await session.execute(select(Agent.id, Agent.name))
+            self.agent_names = {row[0]: row[1] for row in result.all()}
+
+            result = await session.execute(
+                select(
+                    Conversation.id, Conversation.agent_id,
+                    Conversation.priority, Conversation.created_at
+                ).where(Conversation.status.in_(ACTIVE_STATUSES))
+            )
+            for conversation_id, agent_id, priority, created_at in result.all():
+                self.queue.update_conversation(
+                    conversation_id, agent_id, True,
+                    PRIORITY_RANK.get(priority, 0), created_at.timestamp()
+                )
+
+        for agent_id in presence_tracker.online:
+            self.queue.set_agent_online(agent_id, True)
+
+    async def reconcile(self):
+        """
+        Replace the routing queue with one rebuilt from the database. Updates
+        made while it loads may be overwritten by older rows; claims are
+        compare-and-set, so at worst a claim conflicts and is dropped.
+        """
+        async with self._lock:
+            queue, self.queue = self.queue, RoutingQueue(self.queue.capacity)
+            try:
+                await self.load()
+            except Exception:
+                self.queue = queue
+                raise
+        await self.dispatch()
+
+    def _update_queue(self, conversation: Conversation):
+        self.queue.update_conversation(
+            conversation.id,
+            conversation.agent_id,
+            conversation.status in ACTIVE_STATUSES,
+            PRIORITY_RANK.get(conversation.priority, 0),
+            (conversation.created_at or datetime.utcnow()).timestamp()
+        )
+
+    async def sync_conversation(self, conversation: Conversation):
+        """Call after committing any change to a conversation's status, priority or agent"""
+        self._update_queue(conversation)
+        await self.dispatch()
+
+    async def agent_presence_changed(self, agent_id: int, is_online: bool):
+        self.queue.set_agent_online(agent_id, is_online)
+        if is_online:
+            await self.dispatch()
+
+    async def _claim(self, conversation_id: int, agent_id: int) -> Optional[Conversation]:
+        """Assign only if the conversation is still active and unassigned; returns it if assigned"""
+        # The unit runs on the writer thread; agent_names is only updated here, on the loop
+        need_name = agent_id not in self.agent_names
+
+        def claim(session):
+            result = session.execute(
+                update(Conversation)
+                .where(
+                    Conversation.id == conversation_id,
+                    Conversation.agent_id.is_(None),
+                    Conversation.status.in_(ACTIVE_STATUSES)
+                )
+                .values(agent_id=agent_id, updated_at=datetime.utcnow(), version=Conversation.version + 1)
+            )
+            name = None
+            if need_name:
+                name = session.execute(select(Agent.name).where(Agent.id == agent_id)).scalar()
+            if result.rowcount != 1:
+                return None, name
+            return session.get(Conversation, conversation_id), name
+
+        conversation, name = await write_queue.submit(claim)
+        if need_name:
+            self.agent_names[agent_id] = name or f"Agent {agent_id}"
+        return conversation
+
+    async def dispatch(self):
+        """
+        Assign waiting conversations while agents have capacity. Only picking
+        and reserving a pair happens under the lock; claims and broadcasts of
+        concurrent dispatches run side by side, each on its own pair.
+        """
+        if not AUTO_ROUTING_ENABLED:
+            return
+
+        while True:
+            async with self._lock:
+                pair = self.queue.next_assignment()
+                if pair is None:
+                    return
+                conversation_id, agent_id = pair
+                self.queue.reserve(conversation_id, agent_id)
+
+            try:
+                conversation = await self._claim(conversation_id, agent_id)
+            except BaseException:
+                self.queue.release(conversation_id)
+                raise
+            if conversation is None:
+                self.conflicts_total += 1
+                self.queue.release(conversation_id)
+                continue
+
+            # Confirms the reservation, or records the claim in a queue rebuilt meanwhile
+            self._update_queue(conversation)
+            self.assigned_total += 1
+            customer_overviews.invalidate(conversation.customer_id)
+            conversation_cache.conversation_changed(conversation)
+            agent_name = self.agent_names.get(agent_id)
+            # Claimed conversations were active and unassigned
+            before = (conversation.status, conversation.priority, True)
+            await self.connection_manager.broadcast_conversation_update({
+                "id": conversation_id,
+                "agent_id": agent_id,
+                "agent_name": agent_name,
+                "conversation": conversation_summary(conversation, agent_name),
+                "stats_delta": stats_delta(before, stats_state(conversation))
+            })
+            for listener in self.listeners:
+                listener(conversation)
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": AUTO_ROUTING_ENABLED,
+            "capacity_per_agent": self.queue.capacity,
+            "queued": len(self.queue.queued),
+            "online_agents": len(self.queue.online),
+            "loads": dict(self.queue.loads),
+            "assigned_total": self.assigned_total,
+            "conflicts_total": self.conflicts_total
+        }
+
+
+# Global routing engine instance
+routing_engine = RoutingEngine(manager, MAX_OPEN_CONVERSATIONS_PER_AGENT)
+presence_tracker.add_listener(routing_engine.agent_presence_changed)
+if AUTO_ROUTING_ENABLED:
+    scheduler.add("routing_reconcile", IntervalTrigger(ROUTING_RECONCILE_SECONDS), routing_engine.reconcile, singleton=False)
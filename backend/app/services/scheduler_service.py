@@ -0,0 +1,323 @@
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+
+from sqlalchemy import select, update, or_
+
+from ..database import read_session_maker, upsert
+from ..models import JobLease
+from .metrics_service import metrics
+from .write_queue_service import write_queue
+
+# Set to "false" to run no background jobs in this worker
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "true").lower() == "true"
+# A singleton job's lease lasts this long past its last renewal, so a worker
+# that dies mid-run blocks the job for at most this long
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Random delay added to each scheduled run unless a job sets its own
+JOB_JITTER_SECONDS = float(os.getenv("JOB_JITTER_SECONDS", "5"))
+
+JOB_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+job_runs = metrics.counter(
+    "job_runs_total",
+    "Background job runs by result (ok, error, leased: another worker holds the run, overlapping: still running)",
+    ["job", "result"]
+)
+job_duration = metrics.histogram("job_duration_seconds", "Background job run time", ["job"], JOB_DURATION_BUCKETS)
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
+class IntervalTrigger:
+    """Every `seconds`, at multiples of it since the epoch, so every worker picks the same times"""
+
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            raise ValueError("interval must be positive")
+        self.seconds = seconds
+
+    def next_after(self, now: float) -> float:
+        return (now // self.seconds + 1) * self.seconds
+
+    def __str__(self) -> str:
+        return f"every {self.seconds:g}s"
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> set:
+    """Values of one cron field: *, n, a-b, with an optional /step, comma-separated"""
+    values = set()
+    for part in field.split(","):
+        span, _, step = part.partition("/")
+        if span == "*":
+            start, end = low, high
+        elif "-" in span:
+            start, end = (int(value) for value in span.split("-", 1))
+        else:
+            start = int(span)
+            end = high if step else start
+        step = int(step) if step else 1
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"cron field {field!r} is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronTrigger:
+    """
+    Five-field cron expression in UTC: minute hour day-of-month month day-of-week
+    (0 or 7 is Sunday). As in cron, when both day fields are restricted a day
+    matching either runs.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression {expression!r} needs 5 fields")
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        self.weekdays = {day % 7 for day in _parse_cron_field(fields[4], 0, 7)}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        in_month = moment.day in self.days
+        in_week = moment.isoweekday() % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, now: float) -> float:
+        moment = datetime.fromtimestamp(now, timezone.utc).replace(second=0, microsecond=0, tzinfo=None)
+        moment += timedelta(minutes=1)
+        # Skip whole months, days and hours that can't match
+        limit = moment + timedelta(days=5 * 366)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment.replace(tzinfo=timezone.utc).timestamp()
+        raise ValueError(f"cron expression {self.expression!r} never matches")
+
+    def __str__(self) -> str:
+        return f"cron {self.expression}"
+
+
+class Job:
+    """A coroutine function run on a trigger, with the outcome of its last run"""
+
+    def __init__(self, name: str, trigger, func: Callable[[], Awaitable], singleton: bool, jitter: float):
+        self.name = name
+        self.trigger = trigger
+        self.func = func
+        self.singleton = singleton
+        self.jitter = jitter
+        self.running = False
+        # Unix time of the next scheduled run, before jitter
+        self.next_run: Optional[float] = None
+        self.last_started: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_result: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    def get_stats(self) -> dict:
+        return {
+            "name": self.name,
+            "trigger": str(self.trigger),
+            "singleton": self.singleton,
+            "jitter_seconds": self.jitter,
+            "running": self.running,
+            "next_run": _timestamp(self.next_run),
+            "last_started": _timestamp(self.last_started),
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "runs": {
+                labels[1]: int(count) for labels, count in job_runs.values.items() if labels[0] == self.name
+            }
+        }
+
+
+class JobScheduler:
+    """
+    Runs maintenance jobs inside each worker on interval or cron triggers.
+    A singleton job first takes its lease in job_leases, so each scheduled run
+    happens in one worker of a deployment; the lease is held until the next
+    scheduled time. Other jobs run in every worker, e.g. to flush that
+    worker's in-memory state. A run still going when the next one is due is
+    skipped. Jobs write in bounded batches through the write queue and yield
+    between them, so they don't hold up requests.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+
+    def add(
+        self,
+        name: str,
+        trigger,
+        func: Callable[[], Awaitable],
+        singleton: bool = True,
+        jitter: float = JOB_JITTER_SECONDS
+    ) -> Job:
+        """Register a job; call at import time, before start()"""
+        if name in self.jobs:
+            raise ValueError(f"job {name!r} is already registered")
+        job = self.jobs[name] = Job(name, trigger, func, singleton, jitter)
+        return job
+
+    async def _loop(self, job: Job):
+        while True:
+            job.next_run = job.trigger.next_after(time.time())
+            await asyncio.sleep(max(job.next_run - time.time(), 0) + random.uniform(0, job.jitter))
+            try:
+                await self.run(job, job.trigger.next_after(job.next_run))
+            except Exception as e:
+                # run() records job failures itself; whatever gets here must not end the schedule
+                print(f"Error scheduling job {job.name}: {e}")
+
+    async def run(self, job: Job, lease_until: float) -> str:
+        """Run a job unless it is still running here or another worker holds this run"""
+        if job.running:
+            job_runs.inc((job.name, "overlapping"))
+            return "overlapping"
+        job.running = True
+        renewal = None
+        try:
+            if job.singleton:
+                try:
+                    acquired = await self._acquire(job.name)
+                except Exception as e:
+                    # e.g. database busy; the next scheduled run tries again
+                    job.last_result, job.last_error = "error", f"lease: {e}"
+                    job_runs.inc((job.name, "error"))
+                    print(f"Error taking lease for job {job.name}: {e}")
+                    return "error"
+                if not acquired:
+                    job_runs.inc((job.name, "leased"))
+                    return "leased"
+                renewal = asyncio.create_task(self._renew(job.name))
+
+            job.last_started = time.time()
+            started = time.perf_counter()
+            try:
+                await job.func()
+                job.last_result, job.last_error = "ok", None
+            except Exception as e:
+                job.last_result, job.last_error = "error", str(e)
+                print(f"Error in background job {job.name}: {e}")
+            job.last_duration = time.perf_counter() - started
+            job_duration.observe(job.last_duration, (job.name,))
+            job_runs.inc((job.name, job.last_result))
+            return job.last_result
+        finally:
+            job.running = False
+            if renewal is not None:
+                renewal.cancel()
+                # Keep this run's lease until the next one is due; past that, free it now
+                try:
+                    await self._extend(job.name, max(lease_until, time.time()))
+                except Exception as e:
+                    print(f"Error releasing lease for job {job.name}: {e}")
+
+    async def _acquire(self, name: str) -> bool:
+        """Take the job's lease if it is free or already ours"""
+        now = datetime.utcnow()
+
+        def acquire(session):
+            statement = upsert(JobLease).values(
+                name=name, owner=self.owner,
+                expires_at=now + timedelta(seconds=JOB_LEASE_SECONDS), acquired_at=now
+            )
+            statement = statement.on_conflict_do_update(
+                index_elements=[JobLease.name],
+                set_={
+                    "owner": statement.excluded.owner,
+                    "expires_at": statement.excluded.expires_at,
+                    "acquired_at": statement.excluded.acquired_at
+                },
+                where=or_(JobLease.expires_at <= now, JobLease.owner == self.owner)
+            ).returning(JobLease.name)
+            return session.execute(statement).first() is not None
+
+        return await write_queue.submit(acquire)
+
+    async def _extend(self, name: str, until: float):
+        """Move our lease's expiry to until (Unix time)"""
+        expires_at = datetime.fromtimestamp(until, timezone.utc).replace(tzinfo=None)
+
+        def extend(session):
+            session.execute(
+                update(JobLease)
+                .where(JobLease.name == name, JobLease.owner == self.owner)
+                .values(expires_at=expires_at)
+            )
+
+        await write_queue.submit(extend)
+
+    async def _renew(self, name: str):
+        """Keep the lease of a long run alive"""
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                await self._extend(name, time.time() + JOB_LEASE_SECONDS)
+            except Exception as e:
+                print(f"Error renewing lease for job {name}: {e}")
+
+    def start(self):
+        """Start a scheduling loop per registered job"""
+        if not JOBS_ENABLED or self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._loop(job)) for job in self.jobs.values()]
+
+    async def stop(self):
+        """Stop scheduling; a job that is running is cancelled between its write units"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def get_status(self) -> dict:
+        """Jobs with their last runs, and who holds each singleton lease"""
+        async with read_session_maker() as session:
+            result = await session.execute(select(JobLease))
+            leases = {lease.name: lease for lease in result.scalars().all()}
+        now = datetime.utcnow()
+        jobs = []
+        for job in self.jobs.values():
+            stats = job.get_stats()
+            lease = leases.get(job.name)
+            if job.singleton:
+                stats["lease"] = lease and {
+                    "owner": lease.owner,
+                    "ours": lease.owner == self.owner,
+                    "active": lease.expires_at > now,
+                    "expires_at": lease.expires_at.isoformat() + "Z",
+                    "acquired_at": lease.acquired_at.isoformat() + "Z"
+                }
+            jobs.append(stats)
+        return {"enabled": JOBS_ENABLED, "worker": self.owner, "jobs": jobs}
+
+
+# Global job scheduler instance
+scheduler = JobScheduler()
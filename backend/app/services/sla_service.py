@@ -0,0 +1,329 @@
+from typing import Optional
+from datetime import datetime, timezone
+import asyncio
+import heapq
+import os
+import time
+
+from sqlalchemy import select, func, or_
+
+from ..database import read_session_maker
+from ..models import Conversation, Message, MessagePriority
+from .websocket_manager import manager, ConnectionManager
+from .conversation_cache_service import conversation_cache
+from .customer_overview_service import customer_overviews
+from .event_service import bump_version, stats_state, stats_delta, conversation_summary
+from .presence_service import presence_tracker
+from .routing_service import routing_engine, ACTIVE_STATUSES
+from .write_queue_service import write_queue
+
+SLA_ENABLED = os.getenv("SLA_ENABLED", "true").lower() == "true"
+# Customer messages older than this when the server starts are treated as
+# historical backlog and not escalated (e.g. imported sample data)
+SLA_IGNORE_OLDER_THAN_HOURS = float(os.getenv("SLA_IGNORE_OLDER_THAN_HOURS", "72"))
+# An escalation whose write fails is tried again after this long
+SLA_RETRY_SECONDS = float(os.getenv("SLA_RETRY_SECONDS", "30"))
+
+FIRST_RESPONSE = "first_response"
+NEXT_RESPONSE = "next_response"
+
+# Seconds allowed before a reply is due, per priority
+SLA_TARGETS = {
+    MessagePriority.URGENT: {FIRST_RESPONSE: 5 * 60, NEXT_RESPONSE: 10 * 60},
+    MessagePriority.HIGH: {FIRST_RESPONSE: 15 * 60, NEXT_RESPONSE: 30 * 60},
+    MessagePriority.MEDIUM: {FIRST_RESPONSE: 60 * 60, NEXT_RESPONSE: 2 * 60 * 60},
+    MessagePriority.LOW: {FIRST_RESPONSE: 4 * 60 * 60, NEXT_RESPONSE: 8 * 60 * 60},
+}
+
+ESCALATION = {
+    MessagePriority.LOW: MessagePriority.MEDIUM,
+    MessagePriority.MEDIUM: MessagePriority.HIGH,
+    MessagePriority.HIGH: MessagePriority.URGENT,
+    MessagePriority.URGENT: MessagePriority.URGENT
+}
+
+
+def _timestamp(value: datetime) -> float:
+    """Unix timestamp of a naive UTC datetime"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class SLAState:
+    """Response-time tracking for one active conversation"""
+
+    def __init__(self, priority: MessagePriority, agent_id: Optional[int], has_agent_reply: bool):
+        self.priority = priority
+        self.agent_id = agent_id
+        self.has_agent_reply = has_agent_reply
+        # When the oldest unanswered customer message arrived, if any
+        self.awaiting_since: Optional[float] = None
+        self.deadline: Optional[float] = None
+        # The deadline that was missed, while its escalation is being retried
+        self.missed_deadline: Optional[float] = None
+        self.breaches = 0
+
+    @property
+    def kind(self) -> str:
+        return NEXT_RESPONSE if self.has_agent_reply else FIRST_RESPONSE
+
+
+class SLAScheduler:
+    """
+    Fires escalations when conversations miss their response-time targets.
+    Deadlines live in a heap with lazy invalidation and a single task sleeps
+    until the earliest one, so no database work happens between breaches.
+    """
+
+    def __init__(self, connection_manager: ConnectionManager):
+        self.connection_manager = connection_manager
+        self.states: dict[int, SLAState] = {}
+        # (deadline, conversation_id); stale when it no longer matches the state
+        self.heap: list = []
+        self.breaches_total = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def _schedule(self, conversation_id: int, state: SLAState, start: float):
+        state.deadline = start + SLA_TARGETS[state.priority][state.kind]
+        heapq.heappush(self.heap, (state.deadline, conversation_id))
+        if len(self.heap) > 2 * len(self.states) + 64:
+            self.heap = [
+                (s.deadline, cid) for cid, s in self.states.items() if s.deadline is not None
+            ]
+            heapq.heapify(self.heap)
+        if self.heap[0][1] == conversation_id:
+            self._wakeup.set()
+
+    def _retry(self, conversation_id: int, state: SLAState):
+        """Fire a failed escalation again later"""
+        if state.missed_deadline is None:
+            state.missed_deadline = state.deadline
+        state.deadline = time.time() + SLA_RETRY_SECONDS
+        heapq.heappush(self.heap, (state.deadline, conversation_id))
+
+    def _cancel(self, state: SLAState):
+        state.awaiting_since = None
+        state.deadline = None
+        state.missed_deadline = None
+        state.breaches = 0
+
+    async def load(self):
+        """Rebuild deadlines from the database after a restart"""
+        self.states = {}
+        self.heap = []
+
+        last_agent_reply = (
+            select(
+                Message.conversation_id,
+                func.max(Message.created_at).label("replied_at")
+            )
+            .where(Message.is_from_customer == False)
+            .group_by(Message.conversation_id)
+            .subquery()
+        )
+        # Oldest customer message that arrived after the last agent reply
+        awaiting = (
+            select(Message.conversation_id, func.min(Message.created_at))
+            .outerjoin(last_agent_reply, last_agent_reply.c.conversation_id == Message.conversation_id)
+            .where(
+                Message.is_from_customer == True,
+                or_(
+                    last_agent_reply.c.replied_at.is_(None),
+                    Message.created_at > last_agent_reply.c.replied_at
+                )
+            )
+            .group_by(Message.conversation_id)
+        )
+
+        async with read_session_maker() as session:
+            result = await session.execute(
+                select(
+                    Conversation.id, Conversation.priority, Conversation.agent_id,
+                    last_agent_reply.c.replied_at
+                )
+                .outerjoin(last_agent_reply, last_agent_reply.c.conversation_id == Conversation.id)
+                .where(Conversation.status.in_(ACTIVE_STATUSES))
+            )
+            for conversation_id, priority, agent_id, replied_at in result.all():
+                self.states[conversation_id] = SLAState(priority, agent_id, replied_at is not None)
+
+            result = await session.execute(awaiting)
+            awaiting_since = dict(result.all())
+
+        cutoff = time.time() - SLA_IGNORE_OLDER_THAN_HOURS * 3600
+        for conversation_id, state in self.states.items():
+            since = awaiting_since.get(conversation_id)
+            if since is None or _timestamp(since) < cutoff:
+                continue
+            state.awaiting_since = _timestamp(since)
+            self._schedule(conversation_id, state, state.awaiting_since)
+
+    def customer_message(self, conversation: Conversation, created_at: datetime):
+        """Start (or tighten) the response clock after a customer message"""
+        state = self.states.get(conversation.id)
+        if state is None:
+            state = self.states[conversation.id] = SLAState(conversation.priority, conversation.agent_id, False)
+
+        state.agent_id = conversation.agent_id
+        priority_changed = state.priority != conversation.priority
+        state.priority = conversation.priority
+
+        if state.awaiting_since is None:
+            state.awaiting_since = _timestamp(created_at)
+            self._schedule(conversation.id, state, state.awaiting_since)
+        elif priority_changed and state.breaches == 0:
+            self._schedule(conversation.id, state, state.awaiting_since)
+
+    def agent_replied(self, conversation: Conversation):
+        """Stop the response clock once an agent answers"""
+        state = self.states.get(conversation.id)
+        if state is None:
+            state = self.states[conversation.id] = SLAState(conversation.priority, conversation.agent_id, True)
+        state.has_agent_reply = True
+        state.agent_id = conversation.agent_id
+        self._cancel(state)
+
+    def conversation_updated(self, conversation: Conversation):
+        """Track status, priority and assignment changes"""
+        if conversation.status not in ACTIVE_STATUSES:
+            self.states.pop(conversation.id, None)
+            return
+
+        state = self.states.get(conversation.id)
+        if state is None:
+            return
+        state.agent_id = conversation.agent_id
+        if state.priority != conversation.priority:
+            state.priority = conversation.priority
+            if state.awaiting_since is not None and state.breaches == 0:
+                self._schedule(conversation.id, state, state.awaiting_since)
+
+    async def _breach(self, conversation_id: int, state: SLAState, now: float):
+        """Escalate a conversation that missed its deadline"""
+        deadline = state.deadline
+        # Presence lives on the loop; the unit checks the row's agent against this copy
+        online = frozenset(presence_tracker.online)
+
+        def escalate(session):
+            # Locked on PostgreSQL so a concurrent close can't land in between
+            conversation = session.get(Conversation, conversation_id, with_for_update=True)
+            if conversation is None or conversation.status not in ACTIVE_STATUSES:
+                return None, None, None, False
+            # Escalate from the row, not our state, which may lag a change just
+            # committed; ESCALATION never lowers a priority
+            before = stats_state(conversation)
+            previous_priority = conversation.priority
+            conversation.priority = ESCALATION[conversation.priority]
+            # Hand the conversation back to routing if its agent is not around
+            reassign = conversation.agent_id is not None and conversation.agent_id not in online
+            if reassign:
+                conversation.agent_id = None
+            conversation.updated_at = datetime.utcnow()
+            bump_version(conversation)
+            session.flush()
+            return conversation, before, previous_priority, reassign
+
+        # State changes only once the escalation is written; _run retries if it isn't
+        conversation, before, previous_priority, reassign = await write_queue.submit(escalate)
+        if conversation is None:
+            # Closed or removed elsewhere since we last heard about it
+            self.states.pop(conversation_id, None)
+            return
+        missed = state.missed_deadline or deadline
+        state.missed_deadline = None
+        state.breaches += 1
+        self.breaches_total += 1
+        state.priority = conversation.priority
+        state.agent_id = conversation.agent_id
+        # Check again after another full target at the new priority, unless an
+        # agent answered while the escalation was being written
+        if state.deadline == deadline:
+            self._schedule(conversation_id, state, now)
+        customer_overviews.invalidate(conversation.customer_id)
+        conversation_cache.conversation_changed(conversation)
+
+        await self.connection_manager.broadcast({
+            "type": "sla_breach",
+            "data": {
+                "conversation_id": conversation_id,
+                "kind": state.kind,
+                "breaches": state.breaches,
+                "previous_priority": previous_priority.value,
+                "priority": state.priority.value,
+                "overdue_seconds": round(now - missed),
+                "reassigned": reassign,
+                "agent_id": state.agent_id
+            }
+        })
+
+        await self.connection_manager.broadcast_conversation_update({
+            "id": conversation_id,
+            "priority": state.priority.value,
+            "agent_id": state.agent_id,
+            "conversation": conversation_summary(conversation),
+            "stats_delta": stats_delta(before, stats_state(conversation))
+        })
+
+        await routing_engine.sync_conversation(conversation)
+
+    async def _run(self):
+        while True:
+            # Drop entries made stale by replies, closes or reschedules
+            while self.heap:
+                deadline, conversation_id = self.heap[0]
+                state = self.states.get(conversation_id)
+                if state is not None and state.deadline == deadline:
+                    break
+                heapq.heappop(self.heap)
+
+            self._wakeup.clear()
+            timeout = self.heap[0][0] - time.time() if self.heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            deadline, conversation_id = heapq.heappop(self.heap)
+            state = self.states[conversation_id]
+            try:
+                await self._breach(conversation_id, state, time.time())
+            except Exception as e:
+                print(f"Error escalating conversation {conversation_id}: {e}")
+                # Still the same deadline: nothing replied or closed meanwhile
+                if self.states.get(conversation_id) is state and state.deadline == deadline:
+                    self._retry(conversation_id, state)
+
+    async def start(self):
+        """Rebuild state and start firing escalations"""
+        if not SLA_ENABLED or self._task is not None:
+            return
+        await self.load()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> dict:
+        awaiting = [s for s in self.states.values() if s.deadline is not None]
+        now = time.time()
+        return {
+            "enabled": SLA_ENABLED,
+            "tracked_conversations": len(self.states),
+            "awaiting_reply": len(awaiting),
+            "overdue": sum(1 for s in awaiting if s.deadline <= now),
+            "breaches_total": self.breaches_total,
+            "next_deadline_in_seconds": round(self.heap[0][0] - now, 1) if self.heap else None
+        }
+
+
+# Global SLA scheduler instance
+sla_scheduler = SLAScheduler(manager)
+routing_engine.add_listener(sla_scheduler.conversation_updated)
@@ -0,0 +1,195 @@
+from typing import List, Optional
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+import os
+import re
+import time
+import warnings
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Opt-in: profiling adds engine listeners and a middleware, so it is off by default
+SQL_PROFILING_ENABLED = os.getenv("SQL_PROFILING", "false").lower() == "true"
+# Queries allowed per request before a QueryBudgetExceeded warning
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "10"))
+# Per-route overrides, e.g. "POST /api/external/messages=12,GET /api/conversations/=4"
+SQL_QUERY_BUDGETS = os.getenv("SQL_QUERY_BUDGETS", "")
+# Number of recent request profiles kept for the debug endpoint
+SQL_PROFILE_HISTORY = int(os.getenv("SQL_PROFILE_HISTORY", "200"))
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class QueryBudgetExceeded(UserWarning):
+    """A request issued more SQL statements than its route's budget"""
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Normalize a statement so executions that differ only in parameters match:
+    literals become ?, and IN lists of any length collapse to (?...).
+    """
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _LITERAL.sub("?", statement)
+    return _PLACEHOLDER_LIST.sub("(?...)", statement)
+
+
+def parse_budgets(spec: str) -> dict:
+    budgets = {}
+    for item in spec.split(","):
+        if "=" in item:
+            route, limit = item.rsplit("=", 1)
+            budgets[route.strip()] = int(limit)
+    return budgets
+
+
+class RequestProfile:
+    """SQL statements issued while serving one request"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.started_at = datetime.utcnow()
+        self.statements: List[str] = []
+        self.db_seconds: float = 0.0
+        self.budget: Optional[int] = None
+        # Context variable token, restored when the request finishes
+        self.token = None
+
+    @property
+    def query_count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self) -> List[dict]:
+        """Fingerprints executed more than once, most frequent first (N+1 candidates)"""
+        counts = Counter(self.statements)
+        return [
+            {"count": count, "statement": statement}
+            for statement, count in counts.most_common()
+            if count > 1
+        ]
+
+    def to_dict(self, include_statements: bool = False) -> dict:
+        data = {
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "started_at": self.started_at.isoformat() + "Z",
+            "query_count": self.query_count,
+            "db_ms": round(self.db_seconds * 1000, 3),
+            "budget": self.budget,
+            "over_budget": self.budget is not None and self.query_count > self.budget,
+            "repeated": self.repeated()
+        }
+        if include_statements:
+            data["statements"] = self.statements
+        return data
+
+
+class SQLProfiler:
+    """
+    Attributes SQL statements to the request that issued them.
+    Profiles are attached to responses as headers, kept in a short history for
+    the debug endpoint, and checked against per-route query budgets.
+    """
+
+    def __init__(self, enabled: bool, default_budget: int, budgets: dict, history: int):
+        self.enabled = enabled
+        self.default_budget = default_budget
+        self.budgets = budgets
+        self.recent: deque = deque(maxlen=history)
+        self.current: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+        self._instrumented = set()
+
+    def budget_for(self, method: str, route: str) -> int:
+        return self.budgets.get(f"{method} {route}", self.default_budget)
+
+    def set_budget(self, method: str, route: str, limit: int):
+        """Override the query budget for one route"""
+        self.budgets[f"{method} {route}"] = limit
+
+    def instrument(self, engine: AsyncEngine):
+        """Record statements executed on the engine against the current request"""
+        sync_engine = getattr(engine, "sync_engine", engine)  # async engines wrap a sync one
+        if not self.enabled or sync_engine in self._instrumented:
+            return
+        self._instrumented.add(sync_engine)
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["profile_started"].pop()
+            profile = self.current.get()
+            if profile is not None:
+                profile.statements.append(fingerprint(statement))
+                profile.db_seconds += elapsed
+
+    def begin(self, method: str, path: str) -> RequestProfile:
+        profile = RequestProfile(method, path)
+        profile.token = self.current.set(profile)
+        return profile
+
+    def finish(self, profile: RequestProfile, route: str):
+        """Close a request profile and warn if it went over budget"""
+        self.current.reset(profile.token)
+        profile.route = route
+        profile.budget = self.budget_for(profile.method, route)
+        self.recent.append(profile)
+
+        if profile.query_count > profile.budget:
+            repeated = profile.repeated()
+            detail = f"; most repeated ({repeated[0]['count']}x): {repeated[0]['statement'][:120]}" if repeated else ""
+            warnings.warn(
+                f"{profile.method} {route} issued {profile.query_count} queries "
+                f"(budget {profile.budget}){detail}",
+                QueryBudgetExceeded,
+                stacklevel=2
+            )
+
+    def get_profiles(self, route: Optional[str] = None, over_budget: bool = False, limit: int = 50) -> List[dict]:
+        """Most recent request profiles, newest first"""
+        profiles = [
+            p for p in reversed(self.recent)
+            if (route is None or p.route == route) and (not over_budget or p.query_count > p.budget)
+        ]
+        return [p.to_dict(include_statements=True) for p in profiles[:limit]]
+
+    def get_summary(self) -> List[dict]:
+        """Per-route query counts over the recent history, heaviest first"""
+        routes: dict = {}
+        for profile in self.recent:
+            key = (profile.method, profile.route)
+            summary = routes.setdefault(key, {
+                "method": profile.method,
+                "route": profile.route,
+                "requests": 0,
+                "max_queries": 0,
+                "total_queries": 0,
+                "total_db_ms": 0.0,
+                "budget": profile.budget,
+                "over_budget": 0
+            })
+            summary["requests"] += 1
+            summary["max_queries"] = max(summary["max_queries"], profile.query_count)
+            summary["total_queries"] += profile.query_count
+            summary["total_db_ms"] += profile.db_seconds * 1000
+            summary["over_budget"] += profile.query_count > profile.budget
+
+        result = []
+        for summary in routes.values():
+            summary["avg_queries"] = round(summary.pop("total_queries") / summary["requests"], 2)
+            summary["avg_db_ms"] = round(summary.pop("total_db_ms") / summary["requests"], 3)
+            result.append(summary)
+        return sorted(result, key=lambda s: s["max_queries"], reverse=True)
+
+
+# Global SQL profiler instance
+sql_profiler = SQLProfiler(SQL_PROFILING_ENABLED, SQL_QUERY_BUDGET, parse_budgets(SQL_QUERY_BUDGETS), SQL_PROFILE_HISTORY)
@@ -0,0 +1,100 @@
+from typing import Optional, Tuple
+import asyncio
+import os
+import time
+
+from .websocket_manager import manager, ConnectionManager
+
+# Seconds without a typing frame before an agent is considered to have stopped
+TYPING_TIMEOUT_SECONDS = float(os.getenv("TYPING_TIMEOUT_SECONDS", "5"))
+# How often coalesced typing transitions are broadcast
+TYPING_FLUSH_INTERVAL_SECONDS = float(os.getenv("TYPING_FLUSH_INTERVAL_SECONDS", "0.5"))
+
+TypingKey = Tuple[int, int]  # (conversation_id, agent_id)
+
+
+class TypingTracker:
+    """
+    Coalesces typing indicators per (conversation, agent).
+    Incoming typing frames only refresh in-memory state; state transitions
+    are collected and broadcast in one periodic presence frame.
+    """
+
+    def __init__(self, connection_manager: ConnectionManager):
+        self.connection_manager = connection_manager
+        # Currently typing (conversation_id, agent_id) -> expiry (monotonic time)
+        self.typing: dict[TypingKey, float] = {}
+        # Transitions not yet broadcast: key -> is_typing
+        self.pending: dict[TypingKey, bool] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _transition(self, key: TypingKey, is_typing: bool):
+        """Record a state change, cancelling an unsent opposite change"""
+        if self.pending.get(key) is (not is_typing):
+            del self.pending[key]
+        else:
+            self.pending[key] = is_typing
+
+    def update(self, conversation_id: int, agent_id: int, is_typing: bool):
+        """Apply a typing frame from an agent"""
+        key = (conversation_id, agent_id)
+        if is_typing:
+            if key not in self.typing:
+                self._transition(key, True)
+            self.typing[key] = time.monotonic() + TYPING_TIMEOUT_SECONDS
+        elif key in self.typing:
+            del self.typing[key]
+            self._transition(key, False)
+
+    def clear_agent(self, agent_id: int):
+        """Stop all typing indicators for an agent (e.g. on disconnect)"""
+        for key in [key for key in self.typing if key[1] == agent_id]:
+            del self.typing[key]
+            self._transition(key, False)
+
+    def expire(self, now: float = None):
+        """Stop typing indicators that have not been refreshed in time"""
+        now = now if now is not None else time.monotonic()
+        for key in [key for key, expires_at in self.typing.items() if expires_at <= now]:
+            del self.typing[key]
+            self._transition(key, False)
+
+    async def flush(self):
+        """Broadcast pending transitions as a single presence frame"""
+        self.expire()
+        if not self.pending:
+            return
+
+        updates = [
+            {"conversation_id": conversation_id, "agent_id": agent_id, "is_typing": is_typing}
+            for (conversation_id, agent_id), is_typing in self.pending.items()
+        ]
+        self.pending = {}
+        await self.connection_manager.broadcast_typing_presence(updates)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(TYPING_FLUSH_INTERVAL_SECONDS)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing typing indicators: {e}")
+
+    def start(self):
+        """Start the periodic flush loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flush loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global typing tracker instance
+typing_tracker = TypingTracker(manager)
@@ -1,60 +1,368 @@
-from typing import List, Set
+from typing import Callable, List, Optional, Set, Union
+from collections import deque
+from datetime import datetime
+from itertools import islice
 from fastapi import WebSocket
 import json
 import asyncio
+import os
+import time
+import uuid
+
+from .metrics_service import metrics, FANOUT_BUCKETS
+
+try:
+    import msgpack
+except ImportError:  # Binary protocol is optional; clients fall back to JSON
+    msgpack = None
+
+# Number of recent broadcast events kept for resuming dropped sessions
+REPLAY_BUFFER_SIZE = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "1000"))
+# Conversations whose last broadcast version is remembered to drop stale state
+TRACKED_CONVERSATION_VERSIONS = 50_000
+
+# WebSocket subprotocols, in server preference order
+MSGPACK_SUBPROTOCOL = "branch.msgpack.v1"
+JSON_SUBPROTOCOL = "branch.json.v1"
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+# Server heartbeat interval and how long a silent connection is kept before reaping
+HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("WS_HEARTBEAT_INTERVAL_SECONDS", "25"))
+IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "75"))
+# Frames waiting to be sent to one connection before it is dropped as too slow;
+# a resume replays its missed events through the same queue
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", str(2 * REPLAY_BUFFER_SIZE)))
+# Longest a single send may take before the connection is dropped; checked every
+# half timeout, and also the longest wait for a close frame to go out
+SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+
+broadcast_fanout = metrics.histogram(
+    "websocket_broadcast_fanout", "Connections each broadcast was sent to", ["type"], FANOUT_BUCKETS
+)
+broadcast_duration = metrics.histogram(
+    "websocket_broadcast_seconds", "Time to queue a broadcast for all connections", ["type"]
+)
+broadcast_failures = metrics.counter(
+    "websocket_send_failures_total", "Sends that failed or timed out and dropped the connection"
+)
+slow_connections_dropped = metrics.counter(
+    "websocket_slow_connections_dropped_total", "Connections dropped because their send queue was full"
+)
+stale_states_dropped = metrics.counter(
+    "websocket_stale_conversation_states_total",
+    "Conversation states left out of an event because a newer version was already sent"
+)
+
+
+def encode_frame(message: dict, encoding: str) -> Union[str, bytes]:
+    """Serialize a message for the given wire encoding"""
+    if encoding == ENCODING_MSGPACK:
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message, separators=(",", ":"))
+
+
+def decode_frame(frame: dict, encoding: str) -> dict:
+    """
+    Deserialize a received ASGI websocket frame.
+    Raises ValueError if the frame cannot be decoded.
+    """
+    if frame.get("bytes") is not None:
+        if encoding != ENCODING_MSGPACK:
+            raise ValueError("Binary frames require the msgpack subprotocol")
+        try:
+            return msgpack.unpackb(frame["bytes"], raw=False)
+        except Exception as e:
+            raise ValueError(str(e)) from e
+    return json.loads(frame.get("text") or "")
+
+
+class Connection:
+    """A single live WebSocket connection and its liveness state"""
+    
+    def __init__(self, websocket: WebSocket, agent_id: Optional[int], encoding: str):
+        self.id: str = uuid.uuid4().hex
+        self.websocket = websocket
+        self.agent_id = agent_id
+        self.encoding = encoding
+        self.connected_at: datetime = datetime.utcnow()
+        self.last_seen_at: datetime = self.connected_at
+        # Monotonic clock for idle checks, immune to wall-clock changes
+        self.last_seen: float = time.monotonic()
+        # Frames waiting for this connection's writer task, in send order
+        self.outbox: deque = deque()
+        self.writer: Optional[asyncio.Task] = None
+        # Resolved to wake the writer once it has sent everything
+        self.wakeup: Optional[asyncio.Future] = None
+        # Monotonic time the send in progress started, None while idle
+        self.send_started: Optional[float] = None
+        # Set when the server drops the connection; its writer then closes it with this code
+        self.close_code: Optional[int] = None
+    
+    def touch(self):
+        """Record activity from the client"""
+        self.last_seen = time.monotonic()
+        self.last_seen_at = datetime.utcnow()
+    
+    def to_dict(self) -> dict:
+        return {
+            "connection_id": self.id,
+            "agent_id": self.agent_id,
+            "encoding": self.encoding,
+            "connected_at": self.connected_at.isoformat() + "Z",
+            "last_seen_at": self.last_seen_at.isoformat() + "Z",
+            "idle_seconds": round(time.monotonic() - self.last_seen, 3)
+        }
 
 
 class ConnectionManager:
     """
     Manages WebSocket connections for real-time messaging.
-    Supports multiple agents connecting simultaneously.
+    Supports multiple agents connecting simultaneously, each with any number
+    of connections (e.g. several browser tabs).
     """
     
     def __init__(self):
-        # All active agent connections
-        self.active_connections: List[WebSocket] = []
-        # Map agent_id to their WebSocket
-        self.agent_connections: dict[int, WebSocket] = {}
+        # All live connections by connection ID
+        self.connections: dict[str, Connection] = {}
+        # Index from WebSocket to its connection
+        self.socket_connections: dict[WebSocket, Connection] = {}
+        # Map agent_id to the IDs of their connections
+        self.agent_connections: dict[int, Set[str]] = {}
         # Track which conversations each agent is viewing
         self.agent_viewing: dict[int, Set[int]] = {}
+        # Identifies this event stream; sequence numbers are only comparable
+        # within one stream, so a server restart forces clients to resync
+        self.stream_id: str = uuid.uuid4().hex
+        # Monotonic sequence number of the last broadcast event
+        self.sequence: int = 0
+        # Ring buffer of recent sequenced events for replay on resume
+        self.replay_buffer: deque = deque(maxlen=REPLAY_BUFFER_SIZE)
+        # Conversation ID -> version of the last conversation state broadcast
+        self.conversation_versions: dict[int, int] = {}
+        # One broadcast at a time, so every connection's queue gets events in sequence order
+        self._broadcast_lock = asyncio.Lock()
+        # Called with every broadcast event, in sequence order
+        self.listeners: List[Callable[[dict], None]] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog_task: Optional[asyncio.Task] = None
+    
+    def negotiate_subprotocol(self, requested: List[str]) -> Optional[str]:
+        """Pick the preferred subprotocol offered by the client, if any"""
+        if MSGPACK_SUBPROTOCOL in requested and msgpack is not None:
+            return MSGPACK_SUBPROTOCOL
+        if JSON_SUBPROTOCOL in requested:
+            return JSON_SUBPROTOCOL
+        return None
     
-    async def connect(self, websocket: WebSocket, agent_id: int = None):
+    def get_encoding(self, websocket: WebSocket) -> str:
+        """Get the wire encoding negotiated for a connection"""
+        connection = self.socket_connections.get(websocket)
+        return connection.encoding if connection else ENCODING_JSON
+    
+    async def connect(self, websocket: WebSocket, agent_id: int = None) -> Connection:
         """Accept a new WebSocket connection"""
-        await websocket.accept()
-        self.active_connections.append(websocket)
+        subprotocol = self.negotiate_subprotocol(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=subprotocol)
+        encoding = ENCODING_MSGPACK if subprotocol == MSGPACK_SUBPROTOCOL else ENCODING_JSON
+        
+        connection = Connection(websocket, agent_id, encoding)
+        connection.writer = asyncio.create_task(self._write_frames(connection))
+        self.connections[connection.id] = connection
+        self.socket_connections[websocket] = connection
         if agent_id:
-            self.agent_connections[agent_id] = websocket
-            self.agent_viewing[agent_id] = set()
+            self.agent_connections.setdefault(agent_id, set()).add(connection.id)
+            self.agent_viewing.setdefault(agent_id, set())
+        return connection
     
-    def disconnect(self, websocket: WebSocket, agent_id: int = None):
+    def disconnect(self, connection_id: str):
         """Remove a WebSocket connection"""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        connection = self.connections.pop(connection_id, None)
+        if connection is None:
+            return
+        self.socket_connections.pop(connection.websocket, None)
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        # Unsent frames are discarded
+        connection.outbox.clear()
+        
+        agent_id = connection.agent_id
         if agent_id and agent_id in self.agent_connections:
-            del self.agent_connections[agent_id]
-            del self.agent_viewing[agent_id]
+            self.agent_connections[agent_id].discard(connection_id)
+            # Forget the agent only once their last connection is gone
+            if not self.agent_connections[agent_id]:
+                del self.agent_connections[agent_id]
+                self.agent_viewing.pop(agent_id, None)
+    
+    def count_by_encoding(self) -> dict:
+        """Number of live connections per wire encoding, keyed for metrics"""
+        counts = {(ENCODING_JSON,): 0, (ENCODING_MSGPACK,): 0}
+        for connection in self.connections.values():
+            counts[(connection.encoding,)] += 1
+        return counts
+    
+    def get_connections(self) -> List[dict]:
+        """Describe all live connections"""
+        return [connection.to_dict() for connection in self.connections.values()]
+    
+    async def _send_frame(self, websocket: WebSocket, frame: Union[str, bytes]):
+        """Send an already serialized frame"""
+        if isinstance(frame, bytes):
+            await websocket.send_bytes(frame)
+        else:
+            await websocket.send_text(frame)
+    
+    async def _close(self, websocket: WebSocket, code: int):
+        """Close a WebSocket, giving up if the client doesn't take the close frame"""
+        try:
+            await asyncio.wait_for(websocket.close(code=code), SEND_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+    
+    async def _write_frames(self, connection: Connection):
+        """
+        Send a connection's queued frames in order. A send that fails drops
+        the connection, as does one that stalls (see drop_stalled_sends), so
+        a client that stops reading holds up nobody but itself.
+        """
+        loop = asyncio.get_running_loop()
+        outbox = connection.outbox
+        try:
+            while True:
+                while outbox:
+                    connection.send_started = time.monotonic()
+                    await self._send_frame(connection.websocket, outbox.popleft())
+                connection.send_started = None
+                connection.wakeup = loop.create_future()
+                await connection.wakeup
+        except asyncio.CancelledError:
+            # Disconnected; a connection dropped by the server is still open
+            if connection.close_code is None:
+                raise
+        except Exception as e:
+            print(f"Error sending to WebSocket connection {connection.id}: {e!r}")
+            broadcast_failures.inc()
+            connection.close_code = 1011
+            self.disconnect(connection.id)
+        await self._close(connection.websocket, connection.close_code)
+    
+    def _drop(self, connection: Connection, code: int = 1011):
+        """Disconnect a connection; its writer closes the socket without holding up the caller"""
+        connection.close_code = code
+        self.disconnect(connection.id)
+    
+    def _queue_frame(self, connection: Connection, frame: Union[str, bytes]):
+        """Queue a frame for a connection; one whose queue is full is dropped"""
+        if len(connection.outbox) >= SEND_QUEUE_SIZE:
+            print(f"Dropping WebSocket connection {connection.id}: {SEND_QUEUE_SIZE} frames unsent")
+            slow_connections_dropped.inc()
+            self._drop(connection)
+            return
+        connection.outbox.append(frame)
+        if connection.wakeup is not None and not connection.wakeup.done():
+            connection.wakeup.set_result(None)
+    
+    def drop_stalled_sends(self):
+        """Drop connections whose send in progress started over WS_SEND_TIMEOUT_SECONDS ago"""
+        deadline = time.monotonic() - SEND_TIMEOUT_SECONDS
+        stalled = [
+            c for c in self.connections.values() if c.send_started is not None and c.send_started < deadline
+        ]
+        for connection in stalled:
+            print(f"Dropping WebSocket connection {connection.id}: send stalled")
+            broadcast_failures.inc()
+            self._drop(connection)
+    
+    async def flush(self):
+        """Wait until every live connection has sent the frames queued so far"""
+        while any(c.outbox or c.send_started is not None for c in self.connections.values()):
+            await asyncio.sleep(0)
     
     async def send_personal_message(self, message: dict, websocket: WebSocket):
-        """Send a message to a specific WebSocket"""
+        """Send a message to a specific WebSocket, after any frames already queued for it"""
+        connection = self.socket_connections.get(websocket)
+        if connection is not None:
+            self._queue_frame(connection, encode_frame(message, connection.encoding))
+            return
         try:
-            await websocket.send_json(message)
+            await self._send_frame(websocket, encode_frame(message, ENCODING_JSON))
         except Exception as e:
             print(f"Error sending personal message: {e}")
     
-    async def broadcast(self, message: dict):
-        """Broadcast a message to all connected agents"""
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                print(f"Error broadcasting: {e}")
-                disconnected.append(connection)
+    def _order_conversation_state(self, message: dict) -> dict:
+        """
+        Per conversation, versions go out in increasing order: a state older than
+        one already broadcast (its request finished later) is left out. The
+        rest of the event (new message, stats delta) still applies.
+        """
+        data = message.get("data") or {}
+        conversation = data.get("conversation")
+        if conversation is None:
+            return message
+        conversation_id = conversation["id"]
+        last_version = self.conversation_versions.pop(conversation_id, 0)
+        if conversation["version"] <= last_version:
+            self.conversation_versions[conversation_id] = last_version
+            stale_states_dropped.inc()
+            return {**message, "data": {key: value for key, value in data.items() if key != "conversation"}}
+        self.conversation_versions[conversation_id] = conversation["version"]
+        if len(self.conversation_versions) > TRACKED_CONVERSATION_VERSIONS:
+            # Least recently broadcast first
+            del self.conversation_versions[next(iter(self.conversation_versions))]
+        return message
+    
+    async def broadcast(self, message: dict, replay: bool = True):
+        """
+        Broadcast a message to all connected agents.
+        Replayable events are stamped with a sequence number and kept in the
+        replay buffer so reconnecting clients can catch up. Broadcasts don't
+        interleave, so each connection receives events in sequence order.
+        The message is serialized once per wire encoding, not once per connection,
+        and queued for each connection's writer rather than sent here.
+        """
+        async with self._broadcast_lock:
+            started = time.perf_counter()
+            message = self._order_conversation_state(message)
+            if replay:
+                self.sequence += 1
+                message = {**message, "seq": self.sequence}
+                self.replay_buffer.append(message)
+            for listener in self.listeners:
+                listener(message)
+            
+            frames: dict[str, Union[str, bytes]] = {}
+            # Iterate over a snapshot; a connection whose queue is full is dropped
+            targets = list(self.connections.values())
+            for connection in targets:
+                frame = frames.get(connection.encoding)
+                if frame is None:
+                    frame = frames[connection.encoding] = encode_frame(message, connection.encoding)
+                self._queue_frame(connection, frame)
         
-        # Clean up disconnected connections
-        for conn in disconnected:
-            if conn in self.active_connections:
-                self.active_connections.remove(conn)
+        labels = (message["type"],)
+        broadcast_fanout.observe(len(targets), labels)
+        broadcast_duration.observe(time.perf_counter() - started, labels)
+    
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Have listener called with each broadcast event; it must not block"""
+        self.listeners.append(listener)
+    
+    async def send_to(self, connection_ids: List[str], message: dict):
+        """
+        Send one message to some connections, serialized once per encoding.
+        Goes out between broadcasts, never in the middle of one.
+        """
+        async with self._broadcast_lock:
+            frames: dict[str, Union[str, bytes]] = {}
+            for connection_id in connection_ids:
+                connection = self.connections.get(connection_id)
+                if connection is None:
+                    continue
+                frame = frames.get(connection.encoding)
+                if frame is None:
+                    frame = frames[connection.encoding] = encode_frame(message, connection.encoding)
+                self._queue_frame(connection, frame)
     
     async def broadcast_new_message(self, message_data: dict):
         """Broadcast a new message to all agents"""
@@ -77,16 +385,103 @@ class ConnectionManager:
             "data": conversation_data
         })
     
-    async def notify_agent_typing(self, conversation_id: int, agent_id: int, is_typing: bool):
-        """Notify other agents that an agent is typing"""
+    async def broadcast_messages_read(self, read_data: dict):
+        """Broadcast that a conversation's customer messages were read"""
+        await self.broadcast({
+            "type": "messages_read",
+            "data": read_data
+        })
+    
+    async def broadcast_typing_presence(self, updates: List[dict]):
+        """Broadcast a batch of coalesced typing indicator changes"""
         await self.broadcast({
-            "type": "agent_typing",
+            "type": "typing_presence",
+            "data": {"updates": updates}
+        }, replay=False)
+    
+    def get_events_since(self, stream_id: Optional[str], last_seq: int) -> Optional[List[dict]]:
+        """
+        Get buffered events after last_seq.
+        Returns None when the client cannot be caught up from the buffer
+        (different stream or the gap is older than the buffer).
+        """
+        if stream_id != self.stream_id or last_seq > self.sequence:
+            return None
+        if last_seq == self.sequence:
+            return []
+        if not self.replay_buffer or self.replay_buffer[0]["seq"] > last_seq + 1:
+            return None
+        start = last_seq + 1 - self.replay_buffer[0]["seq"]
+        return list(islice(self.replay_buffer, start, None))
+    
+    async def resume(self, websocket: WebSocket, stream_id: Optional[str], last_seq: int):
+        """Replay missed events to a reconnecting client, or ask it to resync"""
+        events = self.get_events_since(stream_id, last_seq)
+        connection = self.socket_connections.get(websocket)
+        if events is not None and connection is not None:
+            # The replay and "resumed" must fit in the connection's queue
+            if len(events) + 1 > SEND_QUEUE_SIZE - len(connection.outbox):
+                events = None
+        
+        if events is None:
+            await self.send_personal_message({
+                "type": "resync_required",
+                "data": {"stream_id": self.stream_id, "seq": self.sequence}
+            }, websocket)
+            return
+        
+        for event in events:
+            await self.send_personal_message(event, websocket)
+        
+        await self.send_personal_message({
+            "type": "resumed",
             "data": {
-                "conversation_id": conversation_id,
-                "agent_id": agent_id,
-                "is_typing": is_typing
+                "stream_id": self.stream_id,
+                "seq": events[-1]["seq"] if events else last_seq,
+                "replayed": len(events)
             }
-        })
+        }, websocket)
+    
+    async def reap_idle_connections(self):
+        """Close and unregister connections that have gone silent"""
+        deadline = time.monotonic() - IDLE_TIMEOUT_SECONDS
+        idle = [c for c in self.connections.values() if c.last_seen < deadline]
+        for connection in idle:
+            self._drop(connection, 1001)
+        if idle:
+            print(f"Reaped {len(idle)} idle WebSocket connection(s)")
+    
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+            try:
+                await self.reap_idle_connections()
+                # Clients answer with "pong", which refreshes their liveness
+                await self.broadcast({"type": "ping", "data": {}}, replay=False)
+            except Exception as e:
+                print(f"Error in WebSocket heartbeat: {e}")
+    
+    async def _send_watchdog_loop(self):
+        while True:
+            await asyncio.sleep(SEND_TIMEOUT_SECONDS / 2)
+            self.drop_stalled_sends()
+    
+    def start_heartbeat(self):
+        """Start sending server heartbeats, reaping idle connections and dropping stalled ones"""
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+            self._watchdog_task = asyncio.create_task(self._send_watchdog_loop())
+    
+    async def stop_heartbeat(self):
+        """Stop the heartbeat and send watchdog loops"""
+        for task in (self._heartbeat_task, self._watchdog_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._heartbeat_task = self._watchdog_task = None
     
     def set_agent_viewing(self, agent_id: int, conversation_id: int):
         """Track which conversation an agent is viewing"""
@@ -108,3 +503,8 @@ class ConnectionManager:
 
 # Global connection manager instance
 manager = ConnectionManager()
+
+metrics.gauge(
+    "websocket_connections", "Live WebSocket connections by wire encoding", ["encoding"],
+    callback=manager.count_by_encoding
+)
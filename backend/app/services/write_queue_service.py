@@ -0,0 +1,158 @@
+from typing import Callable, List, Optional, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import os
+import time
+
+from sqlalchemy.orm import Session
+
+from ..database import SQLITE_SINGLE_WRITER, write_engine, async_session_maker
+from .metrics_service import metrics
+
+# Most write units committed together in one transaction
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "100"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+T = TypeVar("T")
+WriteUnit = Callable[[Session], T]
+
+
+class WriteQueue:
+    """
+    Serializes database writes onto one connection and commits them in groups.
+
+    A write unit is a plain function taking a Session: it reads and writes
+    through that session and returns a result, but never commits. Units that
+    queue up while a batch is being written run together in the next
+    transaction, each in its own SAVEPOINT so a failing unit is rolled back
+    without affecting the rest of its batch. submit() returns once the unit's
+    batch has been committed.
+
+    In SQLite single-writer mode a batch runs start to finish on the writer
+    thread over a synchronous connection, so statements don't each wait for a
+    turn of the event loop. Otherwise every unit runs in its own session via
+    AsyncSession.run_sync.
+    """
+
+    def __init__(self, enabled: bool, max_batch: int = WRITE_BATCH_MAX):
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.batch_size = metrics.histogram(
+            "db_write_batch_size", "Write units committed per transaction", buckets=BATCH_SIZE_BUCKETS
+        )
+        self.queue_wait = metrics.histogram(
+            "db_write_queue_wait_seconds", "Time from submitting a write unit to its commit"
+        )
+        self.commit_duration = metrics.histogram(
+            "db_write_commit_seconds", "Time to run and commit one batch of write units"
+        )
+        self.units = metrics.counter(
+            "db_write_units_total", "Write units processed by outcome", ["outcome"]
+        )
+        metrics.gauge(
+            "db_write_queue_depth", "Write units waiting for the writer",
+            callback=lambda: {(): self.queue.qsize() if self.queue is not None else 0}
+        )
+
+    async def submit(self, unit: WriteUnit) -> T:
+        """Run a write unit and commit it; raises whatever the unit raised"""
+        if self._task is None:
+            async with async_session_maker() as session:
+                result = await session.run_sync(unit)
+                await session.commit()
+                return result
+
+        future = asyncio.get_running_loop().create_future()
+        # The unit runs in the caller's context so per-request DB stats still apply
+        await self.queue.put((unit, contextvars.copy_context(), future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            while len(batch) < self.max_batch and not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            started = time.perf_counter()
+            outcomes = await loop.run_in_executor(self._executor, self._write, batch)
+            self._resolve(batch, outcomes, started)
+            if stopping:
+                return
+
+    def _write(self, batch: List[tuple]) -> List[tuple]:
+        """Run a batch in one transaction on the writer thread; returns (result, error) per unit"""
+        outcomes = []
+        try:
+            with write_engine.connect() as conn:
+                with conn.begin():
+                    for unit, context, _, _ in batch:
+                        # Each unit gets its own session, joined to the batch transaction
+                        # through a SAVEPOINT that its commit releases
+                        try:
+                            with Session(
+                                bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint"
+                            ) as session:
+                                result = context.run(unit, session)
+                                session.commit()
+                            outcomes.append((result, None))
+                        except Exception as e:
+                            outcomes.append((None, e))
+        except Exception as e:
+            # The commit itself failed: nothing in the batch was written
+            outcomes = [(None, e)] * len(batch)
+        return outcomes
+
+    def _resolve(self, batch: List[tuple], outcomes: List[tuple], started: float):
+        finished = time.perf_counter()
+        self.batch_size.observe(len(batch))
+        self.commit_duration.observe(finished - started)
+        for (_, _, future, queued_at), (result, error) in zip(batch, outcomes):
+            self.queue_wait.observe(finished - queued_at)
+            self.units.inc(("error" if error else "committed",))
+            if future.done():  # caller went away
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def start(self):
+        """Start the writer thread and the task feeding it"""
+        if self.enabled and self._task is None:
+            self.queue = asyncio.Queue()
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Commit everything already queued, then stop the writer"""
+        if self._task is None:
+            return
+        await self.queue.put(None)
+        await self._task
+        self._task = None
+        # Units submitted while stopping
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is not None:
+                started = time.perf_counter()
+                self._resolve([item], self._write([item]), started)
+        self._executor.shutdown()
+        self._executor = None
+
+
+# Global write queue instance
+write_queue = WriteQueue(SQLITE_SINGLE_WRITER)
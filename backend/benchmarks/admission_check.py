@@ -0,0 +1,162 @@
+"""
+Admission control check.
+Floods POST /api/external/messages with low-priority "hello" messages from many
+customers while urgent fraud reports arrive, once with admission control and
+once without (each in its own process), and compares how long the urgent
+reports take. Checks that no urgent report is turned away, that shed requests
+get 429 with Retry-After, and that one customer flooding "hello" is rate
+limited while their urgent report still goes through.
+
+    python benchmarks/admission_check.py
+    python benchmarks/admission_check.py --flood 4000 --urgent 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] * 1000 if values else 0.0
+
+
+async def flood(args) -> dict:
+    """Runs in the child process, with admission control set up by its environment"""
+    sys.path.insert(0, BACKEND_DIR)
+    import httpx
+
+    from app.cli import run as setup_database
+    from app.main import app, lifespan
+    from app.services import admission
+
+    await setup_database("seed")
+    result = {"urgent_ms": [], "urgent_shed": 0, "low_ok": 0, "low_shed": 0, "retry_after": True}
+
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://admission", timeout=120) as client:
+            async def hello(i: int):
+                response = await client.post("/api/external/messages", json={
+                    "customer_email": f"hello{i}@example.com", "customer_name": f"Hello {i}", "content": "hello"
+                })
+                if response.status_code == 200:
+                    result["low_ok"] += 1
+                elif response.status_code == 429:
+                    result["low_shed"] += 1
+                    result["retry_after"] &= response.headers.get("retry-after", "").isdigit()
+
+            async def fraud(i: int):
+                # Spread over the flood
+                await asyncio.sleep(i * args.spacing)
+                started = time.perf_counter()
+                response = await client.post("/api/external/messages", json={
+                    "customer_email": f"victim{i}@example.com", "customer_name": f"Victim {i}",
+                    "content": "Fraud! Someone hacked my account and took my money"
+                })
+                if response.status_code == 200:
+                    result["urgent_ms"].append(time.perf_counter() - started)
+                else:
+                    result["urgent_shed"] += 1
+
+            await asyncio.gather(
+                *(hello(i) for i in range(args.flood)),
+                *(fraud(i) for i in range(args.urgent))
+            )
+
+            if admission.enabled:
+                # One customer floods "hello"; past the burst they are rate limited, but not their urgent report
+                statuses = []
+                for _ in range(30):
+                    response = await client.post("/api/customers/1/messages", json={"content": "hello"})
+                    statuses.append(response.status_code)
+                urgent = await client.post("/api/customers/1/messages", json={"content": "URGENT: fraud on my card"})
+                result["flooder"] = {
+                    "ok": statuses.count(200),
+                    "rate_limited": statuses.count(429),
+                    "urgent_status": urgent.status_code
+                }
+                result["stats"] = (await client.get("/api/external/admission")).json()
+                exported = (await client.get("/metrics")).text
+                result["exported"] = all(
+                    name in exported for name in ("admission_shed_total", "admission_queue_depth", "admission_in_flight")
+                )
+    return result
+
+
+def run(args, enabled: bool) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='branch-admission-')}/admission.db",
+        "AUTO_ROUTING_ENABLED": "false",
+        "JOBS_ENABLED": "false",
+        "ADMISSION_ENABLED": "true" if enabled else "false",
+        "ADMISSION_CONCURRENCY": str(args.concurrency),
+        "ADMISSION_QUEUE_SIZE": str(args.queue_size),
+    }
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", *sys.argv[1:]],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(args):
+    failures = []
+    results = {label: run(args, enabled) for label, enabled in (("admission", True), ("no admission", False))}
+
+    print(f"{args.flood} low-priority messages, {args.urgent} urgent reports, {args.concurrency} slots per route")
+    for label, result in results.items():
+        print(f"  {label:<14} urgent p50 {percentile(result['urgent_ms'], 0.5):7.1f} ms  "
+              f"p99 {percentile(result['urgent_ms'], 0.99):7.1f} ms  "
+              f"low accepted {result['low_ok']}, turned away {result['low_shed']}")
+
+    on, off = results["admission"], results["no admission"]
+    if on["urgent_shed"]:
+        failures.append(f"{on['urgent_shed']} urgent reports were turned away")
+    if not on["low_shed"]:
+        failures.append("no low-priority messages were shed under overload")
+    if not on["retry_after"]:
+        failures.append("a 429 came without a Retry-After in seconds")
+    if on["low_ok"] + on["low_shed"] != args.flood:
+        failures.append(f"{args.flood - on['low_ok'] - on['low_shed']} low-priority requests failed otherwise")
+    if percentile(on["urgent_ms"], 0.99) >= percentile(off["urgent_ms"], 0.99):
+        failures.append("admission control did not shorten the urgent reports' p99")
+    flooder = on["flooder"]
+    print(f"  flooding customer  {flooder['ok']} accepted, {flooder['rate_limited']} rate limited, "
+          f"urgent report {flooder['urgent_status']}")
+    if not flooder["rate_limited"] or flooder["urgent_status"] != 200:
+        failures.append(f"per-customer rate limit: {flooder}")
+    if not on["exported"]:
+        failures.append("admission metrics are missing from /metrics")
+    shed = on["stats"]["routes"]["/api/external/messages"]["shed"]
+    print(f"  shed by reason     {shed}")
+
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("  ok   urgent reports admitted first, low-priority flood shed with 429")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check priority-aware admission control under a message flood")
+    parser.add_argument("--flood", type=int, default=2000, help="Low-priority messages sent at once")
+    parser.add_argument("--urgent", type=int, default=20, help="Urgent reports sent during the flood")
+    parser.add_argument("--spacing", type=float, default=0.05, help="Seconds between urgent reports")
+    parser.add_argument("--concurrency", type=int, default=8, help="ADMISSION_CONCURRENCY")
+    parser.add_argument("--queue-size", type=int, default=64, help="ADMISSION_QUEUE_SIZE")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(flood(args))))
+    else:
+        main(args)
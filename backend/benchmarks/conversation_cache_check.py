@@ -0,0 +1,144 @@
+"""
+Hot conversation cache check.
+Makes random changes through the API (customer and agent messages, status and
+priority changes, claims, releases, reads, customer edits) while reading
+conversations, and checks that every GET /conversations/{id} answered from the
+cache matches the same request answered by the database, and that every message
+write leaves its conversation cached. Reports the hit rate and the latency of
+hits and misses.
+
+    python benchmarks/conversation_cache_check.py
+    python benchmarks/conversation_cache_check.py --steps 1000 --seed 7
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='branch-cache-')}/cache.db"
+# Few messages per conversation, so long threads are only partly cached
+os.environ.setdefault("CONVERSATION_CACHE_MESSAGES", "8")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.cli import run as setup_database
+from app.main import app
+from app.services import conversation_cache
+from app.services.conversation_cache_service import _size
+
+
+def random_change(client: TestClient, rng: random.Random, conversation: dict):
+    """Make one change; returns the response of a message write, which should cache the conversation"""
+    conversation_id = conversation["id"]
+    action = rng.choice(["customer", "customer", "agent", "agent", "status", "priority", "assign", "release", "read", "edit"])
+    if action == "customer":
+        return client.post(f"/api/customers/{conversation['customer_id']}/messages", json={
+            "content": rng.choice(["Where is my payment?", "URGENT: account locked", "thanks!", "Loan question"])
+        })
+    elif action == "agent":
+        agent_id = conversation["agent_id"] or rng.randint(1, 3)
+        return client.post(f"/api/conversations/{conversation_id}/messages", json={
+            "content": "On it", "conversation_id": conversation_id, "agent_id": agent_id
+        })
+    elif action == "status":
+        status = rng.choice(["in_progress", "in_progress", "resolved", "closed"])
+        client.put(f"/api/conversations/{conversation_id}", json={"status": status})
+    elif action == "priority":
+        client.put(f"/api/conversations/{conversation_id}", json={"priority": rng.choice(["low", "high", "urgent"])})
+    elif action == "assign":
+        client.post(f"/api/conversations/{conversation_id}/assign/{rng.randint(1, 3)}", params={"force": True})
+    elif action == "release" and conversation["agent_id"]:
+        client.post(f"/api/conversations/{conversation_id}/release", params={"agent_id": conversation["agent_id"]})
+    elif action == "read":
+        client.post(f"/api/conversations/{conversation_id}/read")
+    elif action == "edit":
+        client.put(f"/api/customers/{conversation['customer_id']}", json={"phone": f"555-{rng.randint(1000, 9999)}"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the hot conversation cache against the database")
+    parser.add_argument("--steps", type=int, default=400, help="Random changes to make")
+    parser.add_argument("--reads", type=int, default=5, help="Conversation reads after each change")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    asyncio.run(setup_database("seed"))
+    rng = random.Random(args.seed)
+    failures = []
+    timings = {"hit": [], "database": []}
+    writes = 0
+
+    with TestClient(app) as client:
+        for step in range(1, args.steps + 1):
+            conversations = client.get("/api/conversations/", params={"limit": 30}).json()
+            if not conversations:
+                break
+            # Only active conversations change, so no customer ends up with two of them
+            active = [c for c in conversations if c["status"] in ("open", "in_progress")]
+            if active:
+                conversation = rng.choice(active)
+                if rng.random() < 0.5:
+                    # Start from a cold entry, so the write has to fill it
+                    conversation_cache.drop(conversation["id"])
+                written = random_change(client, rng, conversation)
+                if written is not None and written.status_code == 200:
+                    writes += 1
+                    if conversation["id"] not in conversation_cache._entries:
+                        failures.append(f"step {step}: message write left conversation {conversation['id']} uncached")
+            for _ in range(args.reads):
+                conversation_id = rng.choice(conversations)["id"]
+                params = {"message_limit": rng.choice([3, 8])} if rng.random() < 0.3 else {}
+                url = f"/api/conversations/{conversation_id}"
+
+                hits = conversation_cache.get_stats()["lookups"].get("hit", 0)
+                started = time.perf_counter()
+                served = client.get(url, params=params)
+                elapsed = time.perf_counter() - started
+                hit = conversation_cache.get_stats()["lookups"].get("hit", 0) > hits
+                timings["hit" if hit else "database"].append(elapsed)
+                if not hit:
+                    continue
+
+                # The same request answered by the database; refills the entry
+                conversation_cache.drop(conversation_id)
+                expected = client.get(url, params=params)
+                if served.json() != expected.json():
+                    failures.append(f"step {step} {url} {params}: cached response differs from the database")
+
+        # Unknown ids must not leave reservations behind
+        for missing_id in range(10_000_000, 10_000_100):
+            client.get(f"/api/conversations/{missing_id}")
+        if conversation_cache._filling:
+            failures.append(f"{len(conversation_cache._filling)} reservations left after reads finished")
+        stats = client.get("/api/conversations/cache").json()
+    actual_bytes = sum(
+        _size(entry.header) + sum(_size(row) for row in entry.messages)
+        for entry in conversation_cache._entries.values()
+    )
+    if actual_bytes != stats["bytes"]:
+        failures.append(f"cache counts {stats['bytes']} bytes, its entries hold {actual_bytes}")
+
+    def median_ms(values: list) -> str:
+        return f"{sorted(values)[len(values) // 2] * 1000:.2f} ms" if values else "-"
+
+    print(f"{args.steps} changes, {args.steps * args.reads} conversation reads")
+    print(f"  lookups            {stats['lookups']}  (hit rate {stats['hit_rate']}, comparison reads included)")
+    print(f"  cached             {stats['entries']} conversations, {stats['bytes']} bytes")
+    print(f"  message writes     {writes}, each checked for leaving its conversation cached")
+    print(f"  median read        hit {median_ms(timings['hit'])}, database {median_ms(timings['database'])}")
+    for failure in failures[:20]:
+        print(f"  FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"  ok   {len(timings['hit'])} cached responses match the database")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Export memory check.
+Exports a small and a ten times larger generated database in every format
+through `python -m app.cli export` and fails if peak memory grows with the
+number of rows by more than the budget, i.e. if an export stops streaming.
+
+    python benchmarks/export_memory.py
+    python benchmarks/export_memory.py --messages 500000 --budget-mb 40
+"""
+
+import argparse
+import importlib.util
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Parquet needs the optional pyarrow dependency
+FORMATS = ["ndjson", "csv"] + (["parquet"] if importlib.util.find_spec("pyarrow") else [])
+
+
+def prepare(workdir: str, messages: int) -> dict:
+    from data.generate import generate_database
+
+    source = os.path.join(workdir, f"source-{messages}.db")
+    generate_database(source, messages, agents=10)
+    env = {**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/export-{messages}.db"}
+    subprocess.run([sys.executable, "-m", "app.cli", "import-sqlite", source], cwd=BACKEND_DIR, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+    return env
+
+
+def peak_mb(env: dict, export_format: str, output: str) -> float:
+    """Peak RSS of an export run in a fresh child process"""
+    command = [sys.executable, "-m", "app.cli", "export", "messages", "--format", export_format, "--output", output]
+    code = (
+        "import resource, subprocess, sys; "
+        f"subprocess.run({command!r}, check=True, stderr=subprocess.DEVNULL); "
+        "print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return int(result.stdout.strip().splitlines()[-1]) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if export memory grows with the number of rows")
+    parser.add_argument("--messages", type=int, default=200_000, help="Messages in the larger database")
+    parser.add_argument("--budget-mb", type=float, default=30, help="Allowed peak memory growth")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="branch-export-")
+    small = prepare(workdir, args.messages // 10)
+    large = prepare(workdir, args.messages)
+
+    failed = False
+    for export_format in FORMATS:
+        output = os.path.join(workdir, f"messages.{export_format}")
+        small_mb = peak_mb(small, export_format, output)
+        large_mb = peak_mb(large, export_format, output)
+        size_mb = os.path.getsize(output) / 1024 / 1024
+        growth = large_mb - small_mb
+        status = "ok" if growth <= args.budget_mb else "OVER BUDGET"
+        failed |= growth > args.budget_mb
+        print(f"{export_format:<8} {args.messages // 10:>9,} rows {small_mb:6.0f} MB   "
+              f"{args.messages:>9,} rows {large_mb:6.0f} MB ({size_mb:.0f} MB file)   "
+              f"growth {growth:+.0f} MB  {status}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Live inbox view check.
+Subscribes WebSocket connections to inbox views with different filters and
+windows, makes random changes through the API (customer and agent messages,
+status and priority changes, claims, releases, reads) and checks that each
+subscriber's window, built only from the snapshot and the diffs it was sent,
+matches both a fresh snapshot and GET /conversations with the same filters.
+
+    python benchmarks/inbox_view_check.py
+    python benchmarks/inbox_view_check.py --steps 500 --seed 7
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+WORKDIR = tempfile.mkdtemp(prefix="branch-inbox-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{WORKDIR}/inbox.db"
+# Small views, so rows fall out of them and incomplete views are reloaded
+os.environ.setdefault("INBOX_VIEW_ROWS", "30")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.cli import run as setup_database
+from app.main import app
+from app.services.inbox_view_service import view_loads, view_diffs, INBOX_VIEW_ROWS
+
+# (filters, window) per subscriber
+SUBSCRIPTIONS = [
+    ({}, 50),
+    ({}, 10),
+    ({"status": "open"}, 20),
+    ({"priority": "urgent"}, 50),
+    ({"agent_id": 1}, 50),
+    ({"unassigned": True}, 25),
+]
+
+
+def apply_ops(rows: list, ops: list) -> list:
+    """Apply inbox_diff ops the way a client does"""
+    rows = list(rows)
+    for op in ops:
+        if op["op"] == "remove":
+            rows = [row for row in rows if row["id"] != op["id"]]
+        elif op["op"] == "insert":
+            rows.insert(op["index"], op["row"])
+        else:
+            row = next(row for row in rows if row["id"] == op["id"])
+            rows.remove(row)
+            rows.insert(op["index"], op.get("row", row))
+    return rows
+
+
+def described(rows: list) -> list:
+    return [
+        (row["id"], row["version"], row["unread_count"], (row["last_message"] or {}).get("id"))
+        for row in rows
+    ]
+
+
+class Subscriber:
+    def __init__(self, client: TestClient, agent_id: int, filters: dict, limit: int):
+        self.filters = filters
+        self.limit = limit
+        self.socket = client.websocket_connect(f"/ws?agent_id={agent_id}").__enter__()
+        self.rows = None
+        self.diffs = 0
+
+    def sync(self) -> list:
+        """
+        Resubscribe and wait for the snapshot; diffs received first are applied.
+        The snapshot comes after every earlier event has reached the view.
+        """
+        self.socket.send_json({"type": "subscribe_inbox", "data": {**self.filters, "limit": self.limit}})
+        while True:
+            message = self.socket.receive_json()
+            if message["type"] == "inbox_diff":
+                self.rows = apply_ops(self.rows, message["data"]["ops"])
+                self.diffs += 1
+            elif message["type"] == "inbox_snapshot" and message["data"]["reason"] == "reloaded":
+                self.rows = message["data"]["rows"]
+            elif message["type"] == "inbox_snapshot":
+                snapshot = message["data"]["rows"]
+                applied, self.rows = self.rows, snapshot
+                return applied if applied is not None else snapshot
+
+
+def random_step(client: TestClient, rng: random.Random, conversations: list):
+    conversation = rng.choice(conversations)
+    conversation_id = conversation["id"]
+    action = rng.choice(["customer", "customer", "agent", "status", "priority", "assign", "release", "read"])
+    if action == "customer":
+        client.post("/api/external/messages", json={
+            "customer_id": conversation["customer_id"],
+            "content": rng.choice(["Where is my payment?", "URGENT: account locked", "thanks!", "Loan question"])
+        })
+    elif action == "agent" and conversation["agent_id"]:
+        client.post(f"/api/conversations/{conversation_id}/messages", json={
+            "content": "On it", "conversation_id": conversation_id, "agent_id": conversation["agent_id"]
+        })
+    elif action == "status":
+        status = rng.choice(["open", "in_progress", "resolved", "closed"])
+        client.put(f"/api/conversations/{conversation_id}", json={"status": status})
+    elif action == "priority":
+        priority = rng.choice(["low", "medium", "high", "urgent"])
+        client.put(f"/api/conversations/{conversation_id}", json={"priority": priority})
+    elif action == "assign":
+        client.post(f"/api/conversations/{conversation_id}/assign/{rng.randint(1, 3)}", params={"force": True})
+    elif action == "release" and conversation["agent_id"]:
+        client.post(f"/api/conversations/{conversation_id}/release", params={"agent_id": conversation["agent_id"]})
+    elif action == "read":
+        client.post(f"/api/conversations/{conversation_id}/read")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check live inbox views against the inbox query")
+    parser.add_argument("--steps", type=int, default=200, help="Random changes to make")
+    parser.add_argument("--check-every", type=int, default=25, help="Compare views after this many changes")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    asyncio.run(setup_database("seed"))
+    rng = random.Random(args.seed)
+    failures = []
+
+    with TestClient(app) as client:
+        subscribers = [
+            Subscriber(client, agent_id=index % 3 + 1, filters=filters, limit=limit)
+            for index, (filters, limit) in enumerate(SUBSCRIPTIONS)
+        ]
+        for subscriber in subscribers:
+            subscriber.sync()
+
+        for step in range(1, args.steps + 1):
+            conversations = client.get("/api/conversations/", params={"limit": 200}).json()
+            random_step(client, rng, conversations)
+            if step % args.check_every and step != args.steps:
+                continue
+            for subscriber in subscribers:
+                applied = subscriber.sync()
+                # Windows are capped at the rows a view keeps
+                expected = client.get(
+                    "/api/conversations/", params={**subscriber.filters, "limit": min(subscriber.limit, INBOX_VIEW_ROWS)}
+                ).json()
+                name = f"step {step} {subscriber.filters or 'all'} limit {subscriber.limit}"
+                if described(applied) != described(subscriber.rows):
+                    failures.append(f"{name}: diffs do not add up to the snapshot")
+                if [row["id"] for row in subscriber.rows] != [row["id"] for row in expected]:
+                    failures.append(f"{name}: snapshot differs from GET /conversations")
+
+        views = client.get("/api/conversations/views").json()
+        for subscriber in subscribers:
+            subscriber.socket.__exit__(None, None, None)
+
+    diffs = sum(subscriber.diffs for subscriber in subscribers)
+    print(f"{args.steps} changes, {len(SUBSCRIPTIONS)} subscribers in {len(views['views'])} live views")
+    print(f"  diffs applied by subscribers      {diffs}")
+    print(f"  diff frames sent                  {int(sum(view_diffs.values.values()))}")
+    print(f"  view loads and row fetches        {int(sum(view_loads.values.values()))}"
+          f"  (resubscribes included; {args.steps * len(SUBSCRIPTIONS)} inbox queries if every"
+          f" subscriber refetched after every change)")
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("  ok   every window matches its snapshot and the inbox query")
+
+
+if __name__ == "__main__":
+    main()
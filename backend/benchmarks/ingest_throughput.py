@@ -0,0 +1,137 @@
+"""
+Ingest throughput check.
+Starts a uvicorn worker on a seeded SQLite file and posts customer messages to
+POST /api/external/messages as fast as the concurrency allows, reporting
+accepted messages per second, latency and failures ("database is locked").
+
+    python benchmarks/ingest_throughput.py
+    python benchmarks/ingest_throughput.py --messages 5000 --concurrency 100
+    python benchmarks/ingest_throughput.py --compare   # single writer off vs on
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(base_url: str, server: subprocess.Popen, timeout: float = 30):
+    started = time.perf_counter()
+    async with httpx.AsyncClient() as client:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.05)
+    raise RuntimeError("Server did not become ready")
+
+
+async def drive(base_url: str, messages: int, concurrency: int, customers: int) -> dict:
+    latencies = []
+    failures = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def post(i: int):
+            customer = i % customers
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/api/external/messages", json={
+                        "customer_email": f"ingest{customer}@example.com",
+                        "customer_name": f"Ingest {customer}",
+                        "content": f"Message {i}: when will my loan be disbursed?"
+                    })
+                    key = None if response.status_code == 200 else f"HTTP {response.status_code}"
+                except httpx.HTTPError as e:
+                    key = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                if key:
+                    failures[key] = failures.get(key, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[post(i) for i in range(messages)])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    accepted = messages - sum(failures.values())
+    return {
+        "accepted_per_second": accepted / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "failures": failures
+    }
+
+
+def run(args, single_writer: str = None) -> dict:
+    path = args.database or os.path.join(tempfile.mkdtemp(prefix="branch-ingest-"), "branch_messaging.db")
+    env = {**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.abspath(path)}", "AUTO_ROUTING_ENABLED": "false"}
+    if single_writer is not None:
+        env["SQLITE_SINGLE_WRITER"] = single_writer
+    subprocess.run([sys.executable, "-m", "app.cli", "seed"], cwd=BACKEND_DIR, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    try:
+        asyncio.run(wait_ready(base_url, server))
+        return asyncio.run(drive(base_url, args.messages, args.concurrency, args.customers))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(label: str, result: dict):
+    failures = ", ".join(f"{count} {kind}" for kind, count in result["failures"].items()) or "none"
+    print(f"{label:<22} {result['accepted_per_second']:8.1f} msg/s  p50 {result['p50_ms']:7.1f} ms  "
+          f"p99 {result['p99_ms']:7.1f} ms  failures: {failures}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure POST /api/external/messages throughput")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--customers", type=int, default=500, help="Distinct sending customers")
+    parser.add_argument("--database", help="SQLite file to use (default: a fresh temporary file)")
+    parser.add_argument("--compare", action="store_true", help="Run with SQLITE_SINGLE_WRITER off, then on")
+    args = parser.parse_args()
+
+    if args.compare:
+        if args.database:
+            parser.error("--compare always uses fresh databases")
+        off = run(args, "false")
+        report("single writer off", off)
+        on = run(args, "true")
+        report("single writer on", on)
+        print(f"speed-up: {on['accepted_per_second'] / off['accepted_per_second']:.1f}x")
+    else:
+        report("ingest", run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+End-to-end load test.
+Replays GeneralistRails_Project_MessageData.csv (or synthetic traffic) against
+POST /api/external/messages while simulated agents listen on the WebSocket and
+reply through POST /api/conversations/{id}/messages.
+
+    # Start the app in this process on a throwaway SQLite database
+    python benchmarks/load_test.py --speed 3600 --agents 10
+
+    # Drive an already running server
+    python benchmarks/load_test.py --target http://localhost:8000 --synthetic 5000 --rate 50
+
+Reports throughput, p50/p95/p99 latency per endpoint, and the delay from a
+customer message being posted to it arriving on an agent's socket.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import websockets
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CSV = BACKEND_DIR / "GeneralistRails_Project_MessageData.csv"
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class Stats:
+    """Collects request latencies and delivery timings"""
+
+    def __init__(self):
+        self.latencies: dict[str, list] = {}
+        self.errors: dict[str, int] = {}
+        # message_id -> time the customer request was started
+        self.sent_at: dict[int, float] = {}
+        # message_id -> time the first agent socket received it
+        self.delivered_at: dict[int, float] = {}
+
+    def record(self, endpoint: str, started: float, ok: bool):
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - started)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def delivery_latencies(self) -> list:
+        return [
+            self.delivered_at[message_id] - sent
+            for message_id, sent in self.sent_at.items()
+            if message_id in self.delivered_at
+        ]
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, values in self.latencies.items():
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "throughput_rps": len(values) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000
+            }
+        delivery = self.delivery_latencies()
+        return {
+            "elapsed_seconds": elapsed,
+            "endpoints": endpoints,
+            "delivery": {
+                "messages": len(self.sent_at),
+                "delivered": len(delivery),
+                "p50_ms": percentile(delivery, 50) * 1000,
+                "p95_ms": percentile(delivery, 95) * 1000,
+                "p99_ms": percentile(delivery, 99) * 1000
+            }
+        }
+
+
+def load_csv_traffic(path: Path, speed: float, max_gap: float) -> list:
+    """Return (offset_seconds, customer_email, customer_name, content) sorted by time"""
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [
+            (datetime.strptime(row["Timestamp (UTC)"].strip(), "%Y-%m-%d %H:%M:%S"),
+             row["User ID"].strip(), row["Message Body"].strip())
+            for row in csv.DictReader(f)
+        ]
+    rows.sort(key=lambda row: row[0])
+
+    traffic = []
+    offset = 0.0
+    previous = rows[0][0] if rows else None
+    for timestamp, user_id, content in rows:
+        offset += min((timestamp - previous).total_seconds() / speed, max_gap)
+        previous = timestamp
+        traffic.append((offset, f"customer{user_id}@email.com", f"Customer {user_id}", content))
+    return traffic
+
+
+def synthetic_traffic(path: Path, count: int, rate: float, customers: int, seed: int) -> list:
+    """Poisson arrivals with message bodies sampled from the CSV"""
+    rng = random.Random(seed)
+    with open(path, "r", encoding="utf-8") as f:
+        bodies = [row["Message Body"].strip() for row in csv.DictReader(f)]
+
+    traffic = []
+    offset = 0.0
+    for _ in range(count):
+        offset += rng.expovariate(rate)
+        customer = rng.randint(1, customers)
+        traffic.append((offset, f"loadtest{customer}@example.com", f"Load Test {customer}", rng.choice(bodies)))
+    return traffic
+
+
+async def ensure_agents(client: httpx.AsyncClient, count: int) -> list:
+    """Create (or reuse) load test agents and return their IDs"""
+    result = await client.get("/api/agents/")
+    existing = {agent["email"]: agent["id"] for agent in result.json()}
+    agent_ids = []
+    for index in range(count):
+        email = f"loadtest-agent-{index}@example.com"
+        if email not in existing:
+            response = await client.post("/api/agents/", json={"name": f"Load Test Agent {index}", "email": email})
+            existing[email] = response.json()["id"]
+        agent_ids.append(existing[email])
+    return agent_ids
+
+
+async def run_agent(
+    ws_url: str,
+    client: httpx.AsyncClient,
+    agent_id: int,
+    index: int,
+    agent_count: int,
+    stats: Stats,
+    reply_probability: float,
+    think_time: float,
+    stop: asyncio.Event,
+    ready: asyncio.Event
+):
+    """Listen for events and reply to conversations this agent owns"""
+    owned: dict[int, int] = {}
+    rng = random.Random(agent_id)
+    replies = set()
+
+    async def reply(conversation_id: int):
+        await asyncio.sleep(rng.expovariate(1 / think_time) if think_time else 0)
+        started = time.perf_counter()
+        try:
+            response = await client.post(
+                f"/api/conversations/{conversation_id}/messages",
+                json={"content": "Thanks, looking into it now.", "conversation_id": conversation_id, "agent_id": agent_id}
+            )
+            stats.record("POST /api/conversations/{id}/messages", started, response.status_code == 200)
+        except httpx.HTTPError:
+            stats.record("POST /api/conversations/{id}/messages", started, False)
+
+    async with websockets.connect(f"{ws_url}/ws?agent_id={agent_id}", max_size=None) as ws:
+        ready.set()
+        while not stop.is_set():
+            try:
+                frame = await asyncio.wait_for(ws.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            received = time.perf_counter()
+            event = json.loads(frame)
+            data = event.get("data", {})
+
+            if event["type"] == "ping":
+                await ws.send(json.dumps({"type": "pong", "data": {}}))
+            elif event["type"] == "conversation_update" and "agent_id" in data:
+                owned[data["id"]] = data["agent_id"]
+            elif event["type"] == "new_message" and data.get("is_from_customer"):
+                stats.delivered_at.setdefault(data["id"], received)
+                conversation_id = data["conversation_id"]
+                owner = owned.get(conversation_id)
+                # Unassigned conversations are split between agents to avoid 403s
+                mine = owner == agent_id or (owner is None and conversation_id % agent_count == index)
+                if mine and rng.random() < reply_probability:
+                    task = asyncio.create_task(reply(conversation_id))
+                    replies.add(task)
+                    task.add_done_callback(replies.discard)
+
+    if replies:
+        await asyncio.gather(*replies, return_exceptions=True)
+
+
+async def send_customer_message(client: httpx.AsyncClient, stats: Stats, email: str, name: str, content: str):
+    started = time.perf_counter()
+    try:
+        response = await client.post(
+            "/api/external/messages",
+            json={"content": content, "customer_email": email, "customer_name": name}
+        )
+    except httpx.HTTPError:
+        stats.record("POST /api/external/messages", started, False)
+        return
+    stats.record("POST /api/external/messages", started, response.status_code == 200)
+    if response.status_code == 200:
+        stats.sent_at[response.json()["message_id"]] = started
+
+
+async def run_load(base_url: str, traffic: list, args) -> dict:
+    stats = Stats()
+    ws_url = base_url.replace("http://", "ws://").replace("https://", "wss://")
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        agent_ids = await ensure_agents(client, args.agents)
+        stop = asyncio.Event()
+        ready_events = [asyncio.Event() for _ in agent_ids]
+        agents = [
+            asyncio.create_task(run_agent(
+                ws_url, client, agent_id, index, len(agent_ids), stats,
+                args.reply_probability, args.think_time, stop, ready_events[index]
+            ))
+            for index, agent_id in enumerate(agent_ids)
+        ]
+        await asyncio.gather(*(ready.wait() for ready in ready_events))
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def send(offset: float, email: str, name: str, content: str):
+            delay = offset - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with semaphore:
+                await send_customer_message(client, stats, email, name, content)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send(*item) for item in traffic))
+        elapsed = time.perf_counter() - started
+
+        # Give in-flight broadcasts and replies a moment to land
+        await asyncio.sleep(args.drain)
+        stop.set()
+        await asyncio.gather(*agents, return_exceptions=True)
+
+    return stats.report(elapsed)
+
+
+async def run_in_process(traffic: list, args) -> dict:
+    """Serve the app from this process with uvicorn on a free local port"""
+    import uvicorn
+    from app.main import app
+    from app.database import engine, init_db, seed_initial_data
+
+    # SQL echo dominates request time; only keep it when asked for
+    engine.echo = args.sql_echo
+    await init_db()
+    await seed_initial_data()
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        return await run_load(f"http://127.0.0.1:{port}", traffic, args)
+    finally:
+        server.should_exit = True
+        await serve_task
+
+
+def print_report(report: dict):
+    print(f"\nElapsed: {report['elapsed_seconds']:.1f}s")
+    print(f"{'endpoint':<42}{'reqs':>7}{'errs':>6}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint, row in report["endpoints"].items():
+        print(f"{endpoint:<42}{row['requests']:>7}{row['errors']:>6}{row['throughput_rps']:>8.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+    delivery = report["delivery"]
+    print(f"\nCustomer message -> agent socket: {delivery['delivered']}/{delivery['messages']} delivered, "
+          f"p50 {delivery['p50_ms']:.1f} ms, p95 {delivery['p95_ms']:.1f} ms, p99 {delivery['p99_ms']:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay customer traffic against the messaging API")
+    parser.add_argument("--target", default="in-process",
+                        help="'in-process' (default) or the base URL of a running server")
+    parser.add_argument("--database-url", help="Database for in-process runs (default: a temporary SQLite file)")
+    parser.add_argument("--csv", type=Path, default=DEFAULT_CSV)
+    parser.add_argument("--speed", type=float, default=3600.0, help="Replay speed multiple for CSV timestamps")
+    parser.add_argument("--max-gap", type=float, default=1.0, help="Cap on the wait between replayed messages (s)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Send N synthetic messages instead of the CSV")
+    parser.add_argument("--rate", type=float, default=20.0, help="Synthetic arrivals per second")
+    parser.add_argument("--customers", type=int, default=1000, help="Distinct synthetic customers")
+    parser.add_argument("--agents", type=int, default=5)
+    parser.add_argument("--reply-probability", type=float, default=0.5)
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean agent reply delay (s)")
+    parser.add_argument("--concurrency", type=int, default=50, help="Max in-flight HTTP requests")
+    parser.add_argument("--drain", type=float, default=2.0, help="Seconds to wait for replies after sending")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sql-echo", action="store_true", help="Keep SQLAlchemy statement logging in-process")
+    parser.add_argument("--json", type=Path, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        traffic = synthetic_traffic(args.csv, args.synthetic, args.rate, args.customers, args.seed)
+    else:
+        traffic = load_csv_traffic(args.csv, args.speed, args.max_gap)
+    print(f"Replaying {len(traffic)} messages over ~{traffic[-1][0]:.1f}s with {args.agents} agents")
+
+    if args.target == "in-process":
+        # Configure the database before the app (and its engine) is imported
+        os.environ["DATABASE_URL"] = args.database_url or (
+            "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "load_test.db")
+        )
+        sys.path.insert(0, str(BACKEND_DIR))
+        report = asyncio.run(run_in_process(traffic, args))
+    else:
+        report = asyncio.run(run_load(args.target.rstrip("/"), traffic, args))
+
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
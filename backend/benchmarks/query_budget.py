@@ -0,0 +1,117 @@
+"""
+Query budget check.
+Exercises the main API routes against a freshly seeded database with SQL
+profiling enabled and fails if any route issues more statements than its
+budget, which catches N+1 query regressions.
+
+    python benchmarks/query_budget.py
+    python benchmarks/query_budget.py --budget 8 --verbose
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import warnings
+
+# Profiling is read from the environment at import time
+os.environ["SQL_PROFILING"] = "true"
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='branch-budget-')}/budget.db")
+os.environ.setdefault("AUTO_ROUTING_ENABLED", "false")
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.cli import run as setup_database
+from app.database import engine
+from app.services import sql_profiler, QueryBudgetExceeded
+
+
+def exercise(client: TestClient) -> list:
+    """Issue a representative request against each route; returns failed requests"""
+    failures = []
+
+    def call(method: str, url: str, **kwargs):
+        response = client.request(method, url, **kwargs)
+        if response.status_code >= 400:
+            failures.append(f"{method} {url} -> {response.status_code}")
+        return response
+
+    conversation = call("GET", "/api/conversations/").json()[0]
+    conversation_id = conversation["id"]
+    customer_id = conversation["customer_id"]
+    agent_id = conversation["agent_id"] or 1
+    other_agent_id = agent_id % 4 + 1
+
+    call("GET", "/api/conversations/", params={"status": "open", "priority": "high"})
+    call("GET", "/api/conversations/stats")
+    call("GET", f"/api/conversations/{conversation_id}")
+    call("PUT", f"/api/conversations/{conversation_id}", json={"status": "in_progress"})
+    call("POST", f"/api/conversations/{conversation_id}/messages", json={
+        "conversation_id": conversation_id, "agent_id": agent_id, "content": "Let me check that for you."
+    })
+    call("POST", f"/api/conversations/{conversation_id}/read")
+    call("POST", f"/api/conversations/{conversation_id}/assign/{other_agent_id}", params={"force": True})
+    call("POST", f"/api/conversations/{conversation_id}/release", params={"agent_id": other_agent_id})
+
+    call("GET", "/api/customers/")
+    call("GET", f"/api/customers/{customer_id}")
+    call("GET", f"/api/customers/{customer_id}/conversations")
+    call("GET", f"/api/customers/{customer_id}/overview")
+    call("POST", f"/api/customers/{customer_id}/messages", json={"content": "Any update on my loan?"})
+    call("POST", "/api/external/messages", json={
+        "customer_email": "budget-check@example.com", "customer_name": "Budget Check", "content": "Hello, urgent help"
+    })
+
+    call("GET", "/api/agents/")
+    call("GET", f"/api/agents/{agent_id}")
+    call("GET", "/api/canned-messages/")
+    call("GET", "/api/search/", params={"q": "loan"})
+    call("GET", "/api/search/suggestions", params={"q": "cu"})
+    call("GET", "/api/jobs/")
+    call("GET", "/api/external/admission")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if any route exceeds its SQL query budget")
+    parser.add_argument("--budget", type=int, help="Override the default per-request query budget")
+    parser.add_argument("--verbose", action="store_true", help="Print repeated statements for each route")
+    args = parser.parse_args()
+
+    if args.budget is not None:
+        sql_profiler.default_budget = args.budget
+    engine.echo = False
+    asyncio.run(setup_database("seed"))
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", QueryBudgetExceeded)
+        with TestClient(app) as client:
+            sql_profiler.recent.clear()  # ignore startup traffic
+            failures = exercise(client)
+
+    print(f"{'route':<62}{'queries':>9}{'budget':>8}{'db ms':>9}")
+    for summary in sorted(sql_profiler.get_summary(), key=lambda s: (s["route"], s["method"])):
+        flag = "  OVER BUDGET" if summary["over_budget"] else ""
+        print(f"{summary['method'] + ' ' + summary['route']:<62}{summary['max_queries']:>9}"
+              f"{summary['budget']:>8}{summary['avg_db_ms']:>9.2f}{flag}")
+    if args.verbose:
+        for profile in sql_profiler.get_profiles(limit=len(sql_profiler.recent)):
+            for repeated in profile["repeated"]:
+                print(f"  {profile['method']} {profile['route']}: {repeated['count']}x {repeated['statement'][:150]}")
+
+    violations = [w for w in caught if issubclass(w.category, QueryBudgetExceeded)]
+    for violation in violations:
+        print(f"QueryBudgetExceeded: {violation.message}")
+    for failure in failures:
+        print(f"Request failed: {failure}")
+    if violations or failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Read replica routing check.
+Simulates a primary and a replica with two SQLite files, copying the primary
+over the replica (SQLite's backup API) whenever "replication" is running, plus
+a second replica that can never be opened. Checks that heavy reads go to the
+replica, that an agent reads their own writes while the replica is behind, and
+that lagging or unreachable replicas fall back to the primary.
+
+    python benchmarks/replica_check.py
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+
+WORKDIR = tempfile.mkdtemp(prefix="branch-replica-")
+PRIMARY_PATH = os.path.join(WORKDIR, "primary.db")
+REPLICA_PATH = os.path.join(WORKDIR, "replica.db")
+
+# Replica settings are read from the environment at import time
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{PRIMARY_PATH}"
+os.environ["DATABASE_REPLICA_URLS"] = (
+    f"sqlite+aiosqlite:///{REPLICA_PATH},sqlite+aiosqlite:///{WORKDIR}/missing/replica.db"
+)
+os.environ["REPLICA_HEARTBEAT_SECONDS"] = "0.1"
+os.environ["REPLICA_MAX_LAG_SECONDS"] = "1"
+os.environ["AUTO_ROUTING_ENABLED"] = "false"
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from app.cli import run as setup_database
+from app.main import app, lifespan
+from app.services import replica_router
+from app.services.replica_service import replica_reads
+
+
+def replicate():
+    """Bring the replica file up to date with the primary"""
+    source = sqlite3.connect(PRIMARY_PATH)
+    target = sqlite3.connect(REPLICA_PATH)
+    source.backup(target)
+    target.close()
+    source.close()
+
+
+class Replication:
+    """Copies the primary to the replica every 50ms while running"""
+
+    def __init__(self):
+        self.running = True
+
+    async def run(self):
+        while True:
+            if self.running:
+                await asyncio.to_thread(replicate)
+            await asyncio.sleep(0.05)
+
+
+def reads() -> dict:
+    return {labels[0]: value for labels, value in replica_reads.values.items()}
+
+
+async def wait_until(condition, timeout: float = 5) -> bool:
+    for _ in range(int(timeout / 0.05)):
+        if condition():
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def run_checks() -> list:
+    failures = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}{': ' + detail if detail and not ok else ''}")
+        if not ok:
+            failures.append(name)
+
+    replication = Replication()
+    async with lifespan(app):
+        replicator = asyncio.create_task(replication.run())
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replica") as client:
+            healthy = await wait_until(lambda: replica_router.replicas[0].healthy)
+            check("replica becomes healthy", healthy, str(replica_router.get_status()))
+            check("unreachable replica is marked down", not replica_router.replicas[1].healthy)
+
+            before = reads()
+            response = await client.get("/api/conversations/", params={"limit": 50})
+            after = reads()
+            check("GET /api/conversations/ succeeds", response.status_code == 200, response.text[:200])
+            check("list reads go to the healthy replica",
+                  after.get("replica0", 0) == before.get("replica0", 0) + 1, str(after))
+            check("unreachable replica is never used", "replica1" not in after, str(after))
+
+            conversation = response.json()[0]
+            conversation_id = conversation["id"]
+            new_status = "resolved" if conversation["status"] != "resolved" else "open"
+
+            def listed_status(response) -> str:
+                return next(c["status"] for c in response.json() if c["id"] == conversation_id)
+
+            # Replica falls behind: agent 1 changes a conversation
+            replication.running = False
+            await asyncio.sleep(0.2)
+            response = await client.put(
+                f"/api/conversations/{conversation_id}", json={"status": new_status}, headers={"X-Agent-Id": "1"}
+            )
+            check("agent 1 updates the conversation", response.status_code == 200, response.text[:200])
+
+            before = reads()
+            own = await client.get("/api/conversations/", params={"limit": 50}, headers={"X-Agent-Id": "1"})
+            check("agent 1 reads their own write", listed_status(own) == new_status, listed_status(own))
+            check("agent 1 is served by the primary", reads().get("primary", 0) == before.get("primary", 0) + 1)
+
+            other = await client.get("/api/conversations/", params={"limit": 50}, headers={"X-Agent-Id": "2"})
+            check("agent 2 still reads the replica within the lag limit",
+                  listed_status(other) == conversation["status"], listed_status(other))
+
+            # The replica stays behind past REPLICA_MAX_LAG_SECONDS
+            lagging = await wait_until(lambda: not replica_router.replicas[0].healthy)
+            check("lagging replica is marked unhealthy", lagging, str(replica_router.get_status()))
+            before = reads()
+            other = await client.get("/api/conversations/", params={"limit": 50}, headers={"X-Agent-Id": "2"})
+            check("reads fall back to the primary when the replica lags",
+                  reads().get("primary", 0) == before.get("primary", 0) + 1 and listed_status(other) == new_status)
+
+            # Replication catches up: everyone is back on the replica, including agent 1
+            replication.running = True
+            recovered = await wait_until(lambda: replica_router.choose(1) is replica_router.replicas[0])
+            check("agent 1 returns to the replica once it has their write", recovered)
+            before = reads()
+            for path, params in (
+                ("/api/conversations/stats", {}),
+                ("/api/customers/", {}),
+                (f"/api/customers/{conversation['customer_id']}/conversations", {}),
+                ("/api/search/", {"q": "loan"}),
+                ("/api/search/suggestions", {"q": "cu"}),
+            ):
+                response = await client.get(path, params=params, headers={"X-Agent-Id": "1"})
+                check(f"GET {path}", response.status_code == 200, response.text[:200])
+            check("heavy read endpoints use the replica", reads().get("replica0", 0) == before.get("replica0", 0) + 5,
+                  str(reads()))
+
+            response = await client.get("/health")
+            check("/health reports replicas", "replicas" in response.json()["checks"], response.text[:200])
+
+        replicator.cancel()
+    return failures
+
+
+def main():
+    asyncio.run(setup_database("seed"))
+    replicate()
+    failures = asyncio.run(run_checks())
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
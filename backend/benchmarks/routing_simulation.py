@@ -0,0 +1,135 @@
+"""
+Routing simulation benchmark.
+Replays bursty conversation arrivals against the in-memory RoutingQueue with a
+simulated clock and reports queue wait times per priority.
+
+    python benchmarks/routing_simulation.py --agents 20 --conversations 20000
+"""
+
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.routing_service import RoutingQueue
+
+# Share of arrivals per priority rank (low, medium, high, urgent)
+PRIORITY_MIX = [0.35, 0.35, 0.2, 0.1]
+PRIORITY_NAMES = ["low", "medium", "high", "urgent"]
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def simulate(
+    agents: int,
+    capacity: int,
+    conversations: int,
+    base_rate: float,
+    burst_rate: float,
+    burst_probability: float,
+    handle_time: float,
+    seed: int
+) -> dict:
+    """
+    Run the simulation. Rates are conversations per second; arrivals switch
+    between a base and a burst rate, changing regime every 60 simulated seconds.
+    """
+    rng = random.Random(seed)
+    queue = RoutingQueue(capacity)
+    for agent_id in range(1, agents + 1):
+        queue.set_agent_online(agent_id, True)
+
+    # Event heap of (time, order, kind, conversation_id)
+    events = []
+    order = 0
+    now = 0.0
+    rate = base_rate
+    regime_ends = 60.0
+    for conversation_id in range(1, conversations + 1):
+        if now >= regime_ends:
+            rate = burst_rate if rng.random() < burst_probability else base_rate
+            regime_ends = now + 60.0
+        now += rng.expovariate(rate)
+        heapq.heappush(events, (now, order, "arrive", conversation_id))
+        order += 1
+
+    arrivals: dict[int, tuple] = {}
+    waits: dict[int, list] = {rank: [] for rank in range(4)}
+    routing_ops = 0
+    routing_seconds = 0.0
+
+    while events:
+        now, _, kind, conversation_id = heapq.heappop(events)
+        started = time.perf_counter()
+
+        if kind == "arrive":
+            rank = rng.choices(range(4), PRIORITY_MIX)[0]
+            arrivals[conversation_id] = (now, rank)
+            queue.update_conversation(conversation_id, None, True, rank, now)
+        else:
+            _, rank = arrivals[conversation_id]
+            queue.update_conversation(conversation_id, queue.assignments.get(conversation_id), False, rank, 0)
+
+        while True:
+            pair = queue.next_assignment()
+            if pair is None:
+                break
+            assigned_id, agent_id = pair
+            queue.assign(assigned_id, agent_id)
+            arrived_at, rank = arrivals[assigned_id]
+            waits[rank].append(now - arrived_at)
+            order += 1
+            heapq.heappush(events, (now + rng.expovariate(1 / handle_time), order, "resolve", assigned_id))
+
+        routing_seconds += time.perf_counter() - started
+        routing_ops += 1
+
+    return {
+        "waits": waits,
+        "routing_ops": routing_ops,
+        "routing_us_per_op": routing_seconds / max(routing_ops, 1) * 1e6,
+        "simulated_seconds": now
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate automatic routing under bursty arrivals")
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--capacity", type=int, default=5, help="Open conversations per agent")
+    parser.add_argument("--conversations", type=int, default=20000)
+    parser.add_argument("--base-rate", type=float, default=0.15, help="Arrivals per second")
+    parser.add_argument("--burst-rate", type=float, default=1.5, help="Arrivals per second during bursts")
+    parser.add_argument("--burst-probability", type=float, default=0.1)
+    parser.add_argument("--handle-time", type=float, default=300.0, help="Mean seconds to resolve")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    result = simulate(
+        args.agents, args.capacity, args.conversations, args.base_rate,
+        args.burst_rate, args.burst_probability, args.handle_time, args.seed
+    )
+
+    print(f"Simulated {args.conversations} conversations over {result['simulated_seconds'] / 3600:.1f}h "
+          f"with {args.agents} agents x {args.capacity} slots")
+    print(f"Routing cost: {result['routing_us_per_op']:.1f} us per event ({result['routing_ops']} events)")
+    print(f"{'priority':<10}{'count':>8}{'p50 (s)':>10}{'p95 (s)':>10}{'p99 (s)':>10}{'max (s)':>10}")
+    for rank in reversed(range(4)):
+        waits = result["waits"][rank]
+        print(f"{PRIORITY_NAMES[rank]:<10}{len(waits):>8}"
+              f"{percentile(waits, 50):>10.1f}{percentile(waits, 95):>10.1f}"
+              f"{percentile(waits, 99):>10.1f}{max(waits, default=0):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Background job scheduler check.
+Checks cron and interval trigger times, that two workers (schedulers with
+their own lease owner) running the same singleton job in the same slot run it
+once, that a failure to take a lease doesn't stop a job's schedule, and that
+the auto-close job works through a backlog of idle conversations without
+blocking the event loop for more than a few ms.
+
+    python benchmarks/scheduler_check.py
+    python benchmarks/scheduler_check.py --idle 5000 --max-block-ms 10
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='branch-jobs-')}/jobs.db"
+os.environ["AUTO_ROUTING_ENABLED"] = "false"
+# The jobs below are run by hand, not on their schedules
+os.environ["JOBS_ENABLED"] = "false"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.cli import run as setup_database
+from app.database import async_session_maker, copy_rows
+from app.main import app, lifespan
+from app.models import Agent, Conversation, Customer, Message, MessagePriority, MessageStatus
+from app.services import JobScheduler, IntervalTrigger, CronTrigger, auto_closer
+from app.services.auto_close_service import conversations_auto_closed
+
+# (expression, after, expected next run), UTC
+CRON_CASES = [
+    ("*/15 * * * *", "2026-03-01 10:07", "2026-03-01 10:15"),
+    ("0 3 * * *", "2026-03-01 03:00", "2026-03-02 03:00"),
+    ("30 9 * * 1-5", "2026-03-06 10:00", "2026-03-09 09:30"),  # Friday -> Monday
+    ("0 0 1 * *", "2026-01-31 12:00", "2026-02-01 00:00"),
+    ("0 12 29 2 *", "2026-03-01 00:00", "2028-02-29 12:00"),
+    ("0 0 13 * 5", "2026-03-01 00:00", "2026-03-06 00:00"),  # day 13 or any Friday
+    ("0 0 * * 7", "2026-03-01 00:00", "2026-03-08 00:00"),  # 7 is Sunday
+]
+
+
+def unix(text: str) -> float:
+    return datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc).timestamp()
+
+
+def check_triggers(failures: list):
+    for expression, after, expected in CRON_CASES:
+        actual = CronTrigger(expression).next_after(unix(after))
+        if actual != unix(expected):
+            got = datetime.fromtimestamp(actual, timezone.utc).strftime("%Y-%m-%d %H:%M")
+            failures.append(f"cron {expression!r} after {after}: {got}, expected {expected}")
+    for bad in ("* * * *", "61 * * * *", "*/0 * * * *", "5-1 * * * *"):
+        try:
+            CronTrigger(bad)
+            failures.append(f"cron {bad!r} was accepted")
+        except ValueError:
+            pass
+    if IntervalTrigger(300).next_after(unix("2026-03-01 10:07")) != unix("2026-03-01 10:10"):
+        failures.append("interval triggers are not aligned to the epoch")
+
+
+async def check_leases(failures: list):
+    """Two workers fire the same slot; only one runs it, the next slot is free again"""
+    runs = []
+
+    async def job():
+        runs.append(time.time())
+        await asyncio.sleep(0.05)
+
+    workers = [JobScheduler(), JobScheduler()]
+    jobs = [worker.add("lease_check", IntervalTrigger(3600), job) for worker in workers]
+    slot_end = time.time() + 0.5
+    results = await asyncio.gather(*(worker.run(job, slot_end) for worker, job in zip(workers, jobs)))
+    if sorted(results) != ["leased", "ok"] or len(runs) != 1:
+        failures.append(f"same slot in two workers: {results}, {len(runs)} runs")
+    # Still this slot: the other worker is turned away
+    loser = results.index("leased")
+    if await workers[loser].run(jobs[loser], slot_end) != "leased":
+        failures.append("lease was not held until the end of the slot")
+    await asyncio.sleep(max(slot_end - time.time(), 0) + 0.05)
+    if await workers[loser].run(jobs[loser], time.time() + 0.5) != "ok":
+        failures.append("lease was not free in the next slot")
+    status = await workers[loser].get_status()
+    lease = status["jobs"][0]["lease"]
+    if not lease or not lease["ours"]:
+        failures.append(f"status does not show the lease holder: {lease}")
+
+
+async def check_lease_errors(failures: list):
+    """A lease that can't be taken fails that run only; the job keeps its schedule"""
+    runs = []
+
+    async def job():
+        runs.append(time.time())
+
+    worker = JobScheduler()
+    acquire = worker._acquire
+    attempts = []
+
+    async def busy_once(name: str) -> bool:
+        attempts.append(name)
+        if len(attempts) == 1:
+            raise RuntimeError("database is locked")
+        return await acquire(name)
+
+    worker._acquire = busy_once
+    entry = worker.add("lease_error_check", IntervalTrigger(0.2), job, jitter=0)
+    loop = asyncio.create_task(worker._loop(entry))
+    await asyncio.sleep(0.7)
+    loop.cancel()
+    await asyncio.gather(loop, return_exceptions=True)
+    if len(attempts) < 2 or not runs:
+        failures.append(f"job stopped after a lease error: {len(attempts)} attempts, {len(runs)} runs")
+
+
+async def add_idle_conversations(count: int):
+    """Conversations in progress for a week, last answered by an agent"""
+    old = datetime.utcnow() - timedelta(days=7)
+    async with async_session_maker() as session:
+        customer_id = (await session.execute(Customer.__table__.select().limit(1))).first().id
+        agent_id = (await session.execute(Agent.__table__.select().limit(1))).first().id
+        first_id = (await session.execute(Conversation.__table__.select().order_by(Conversation.id.desc()).limit(1))).first().id + 1
+    ids = range(first_id, first_id + count)
+    async with async_session_maker() as session:
+        conn = await session.connection()
+        await copy_rows(conn, Conversation.__table__, ["id", "customer_id", "agent_id", "status", "priority", "subject", "created_at", "updated_at", "version"], [
+            (cid, customer_id, agent_id, MessageStatus.IN_PROGRESS.name, MessagePriority.MEDIUM.name, "Idle", old, old, 1)
+            for cid in ids
+        ])
+        await copy_rows(conn, Message.__table__, ["conversation_id", "customer_id", "agent_id", "content", "is_from_customer", "priority", "created_at"], [
+            row
+            for cid in ids
+            for row in (
+                (cid, customer_id, None, "Any update?", True, MessagePriority.MEDIUM.name, old - timedelta(hours=1)),
+                (cid, None, agent_id, "Fixed, let us know", False, MessagePriority.MEDIUM.name, old)
+            )
+        ])
+        await session.commit()
+
+
+async def check_auto_close(failures: list, idle: int, max_block_ms: float):
+    await add_idle_conversations(idle)
+    # (start, end) of event loop blocks, and of full garbage collections, which
+    # pause the whole process whatever it is running
+    gaps, collections = [], []
+
+    def on_gc(phase, info):
+        if info["generation"] == 2:
+            if phase == "start":
+                collections.append([time.perf_counter(), None])
+            else:
+                collections[-1][1] = time.perf_counter()
+
+    async def ticker():
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            gaps.append((last, now))
+            last = now
+
+    gc.callbacks.append(on_gc)
+    task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    closed = await auto_closer.close_idle()
+    elapsed = time.perf_counter() - started
+    task.cancel()
+    gc.callbacks.remove(on_gc)
+    again = await auto_closer.close_idle()
+
+    longest = max(end - start for start, end in gaps) * 1000
+    longest_job = max(
+        end - start for start, end in gaps
+        if not any(gc_start < end and (gc_end or end) > start for gc_start, gc_end in collections)
+    ) * 1000
+    print(f"  auto-close         {closed} conversations in {elapsed:.2f}s")
+    print(f"  event loop         longest block {longest_job:.1f} ms"
+          f" ({longest:.1f} ms including {len(collections)} full garbage collections)")
+    if closed < idle:
+        failures.append(f"auto-close closed {closed} of {idle} idle conversations")
+    if again:
+        failures.append(f"a second auto-close pass closed {again} more")
+    if int(sum(conversations_auto_closed.values.values())) != closed:
+        failures.append("conversations_auto_closed_total does not match")
+    if longest_job > max_block_ms:
+        failures.append(f"auto-close blocked the event loop for {longest_job:.1f} ms (limit {max_block_ms:g})")
+
+
+async def main(args):
+    failures = []
+    check_triggers(failures)
+    async with lifespan(app):
+        await check_leases(failures)
+        await check_lease_errors(failures)
+        await check_auto_close(failures, args.idle, args.max_block_ms)
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check background job triggers, leases and batching")
+    parser.add_argument("--idle", type=int, default=2000, help="Idle conversations for the auto-close job")
+    parser.add_argument("--max-block-ms", type=float, default=20, help="Longest allowed event loop block")
+    args = parser.parse_args()
+
+    asyncio.run(setup_database("seed"))
+    failures = asyncio.run(main(args))
+    print(f"  triggers           {len(CRON_CASES)} cron cases and epoch-aligned intervals")
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("  ok   triggers, singleton leases and batched auto-close")
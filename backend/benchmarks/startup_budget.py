@@ -0,0 +1,113 @@
+"""
+Cold start budget check.
+Measures how long `import app.main` takes in a fresh interpreter and how long
+the container's start command (the Dockerfile's CMD) takes to answer /health,
+and fails if either is over budget. Run it in CI so slow imports or boot-time
+work don't creep back in.
+
+    python benchmarks/startup_budget.py
+    python benchmarks/startup_budget.py --import-budget 1.5 --ready-budget 3 --runs 5
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DOCKERFILE = os.path.join(BACKEND_DIR, "Dockerfile")
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def measure_import(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def container_command(port: int) -> list:
+    """The Dockerfile's CMD (exec form), listening on 127.0.0.1:port"""
+    with open(DOCKERFILE) as f:
+        line = next(line for line in f if line.startswith("CMD "))
+    command = json.loads(line[len("CMD "):])
+    command[command.index("--host") + 1] = "127.0.0.1"
+    command[command.index("--port") + 1] = str(port)
+    return command
+
+
+def measure_ready(env: dict, timeout: float) -> float:
+    """Seconds from running the container's start command to its first successful /health response"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        container_command(port),
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"Server not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if cold start exceeds its budget")
+    parser.add_argument("--import-budget", type=float, default=2.0, help="Seconds allowed for import app.main")
+    parser.add_argument("--ready-budget", type=float, default=4.0, help="Seconds allowed until /health answers")
+    parser.add_argument("--runs", type=int, default=3, help="Measurements per check; the median is compared")
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='branch-startup-')}/startup.db"
+    }
+    # The image is seeded at build time (RUN python -m app.cli seed), not on start
+    subprocess.run([sys.executable, "-m", "app.cli", "seed"], cwd=BACKEND_DIR, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+
+    imports = [measure_import(env) for _ in range(args.runs)]
+    readies = [measure_ready(env, timeout=args.ready_budget * 5) for _ in range(args.runs)]
+
+    failed = False
+    for name, samples, budget in (
+        ("import app.main", imports, args.import_budget),
+        ("CMD to first /health", readies, args.ready_budget)
+    ):
+        median = statistics.median(samples)
+        status = "ok" if median <= budget else "OVER BUDGET"
+        failed |= median > budget
+        print(f"{name:<24} median {median:6.3f}s  (min {min(samples):.3f}s, budget {budget:.1f}s)  {status}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Micro-benchmark suite for backend hot paths.
+Times the priority/sentiment/keyword analysers, WebSocket broadcast fan-out,
+the conversation list, search and stats queries against seeded databases, and
+the initial seed import. Results can be saved as baselines and later runs
+compared against them to catch regressions.
+
+    python benchmarks/suite.py --save
+    python benchmarks/suite.py --compare --threshold 0.2
+    python benchmarks/suite.py --groups queries --sizes 10k,100k
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+CSV_PATH = BACKEND_DIR / "GeneralistRails_Project_MessageData.csv"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines.json"
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent / ".data"
+
+# The seed benchmark writes through the app's own engine, so point it at a
+# scratch database before anything imports app.database
+_scratch_dir = tempfile.mkdtemp(prefix="branch-bench-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_scratch_dir}/seed.db"
+
+# Add parent directory to path
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+
+from app import database
+from app.database import Base
+from app.api.conversations import get_conversations, get_conversation_stats
+from app.api.search import search
+from app.services import detect_priority, analyze_sentiment, extract_keywords, ConnectionManager
+from app.services.websocket_manager import MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL
+from data.generate import generate_database
+
+GROUPS = ["text", "broadcast", "queries", "seed"]
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+BROADCAST_FANOUT = [10, 100, 1000, 10_000]
+
+
+def load_csv_messages() -> list:
+    with open(CSV_PATH, "r", encoding="utf-8") as f:
+        return [row["Message Body"].strip() for row in csv.DictReader(f)]
+
+
+def measure(fn, min_rounds: int = 5, max_rounds: int = 1000, min_time: float = 1.0, ops: int = 1) -> dict:
+    """
+    Call fn repeatedly until both min_rounds and min_time are reached.
+    Each round performs `ops` operations; timings are reported per operation.
+    """
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_rounds:
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) / ops)
+        if len(samples) >= min_rounds and time.perf_counter() - started >= min_time:
+            break
+    return summarize(samples)
+
+
+async def measure_async(fn, min_rounds: int = 5, max_rounds: int = 1000, min_time: float = 1.0, ops: int = 1) -> dict:
+    """Async counterpart of measure(); fn is a coroutine function"""
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_rounds:
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) / ops)
+        if len(samples) >= min_rounds and time.perf_counter() - started >= min_time:
+            break
+    return summarize(samples)
+
+
+def summarize(samples: list) -> dict:
+    return {
+        "median_us": statistics.median(samples) * 1e6,
+        "min_us": min(samples) * 1e6,
+        "rounds": len(samples)
+    }
+
+
+# Text analysis
+
+def message_corpora(messages: list, seed: int) -> dict:
+    """
+    Message bodies grouped by length: the CSV as-is, plus longer bodies built
+    by joining several CSV messages the way chatty customers write.
+    """
+    rng = random.Random(seed)
+    long_messages = [" ".join(rng.sample(messages, rng.randint(3, 8))) for _ in range(len(messages))]
+    return {
+        "short": [m for m in messages if len(m) < 60],
+        "csv": messages,
+        "long": long_messages
+    }
+
+
+def bench_text(args, messages: list) -> dict:
+    results = {}
+    corpora = message_corpora(messages, args.seed)
+    for fn in (detect_priority, analyze_sentiment, extract_keywords):
+        for corpus_name, corpus in corpora.items():
+            def run(fn=fn, corpus=corpus):
+                for message in corpus:
+                    fn(message)
+            results[f"text.{fn.__name__}[{corpus_name}]"] = measure(run, ops=len(corpus), min_time=args.min_time)
+    return results
+
+
+# Broadcast fan-out
+
+class MockWebSocket:
+    """Stand-in for a Starlette WebSocket that accepts and discards frames"""
+
+    def __init__(self, subprotocol: str):
+        self.scope = {"subprotocols": [subprotocol]}
+        self.bytes_sent = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, data: str):
+        self.bytes_sent += len(data)
+
+    async def send_bytes(self, data: bytes):
+        self.bytes_sent += len(data)
+
+
+async def bench_broadcast(args, messages: list) -> dict:
+    results = {}
+    event = {
+        "type": "new_message",
+        "data": {
+            "id": 1,
+            "conversation_id": 1,
+            "content": messages[0],
+            "is_from_customer": True,
+            "priority": "high",
+            "created_at": datetime.utcnow().isoformat()
+        }
+    }
+    for fanout in BROADCAST_FANOUT:
+        manager = ConnectionManager()
+        for i in range(fanout):
+            # A mix of JSON and msgpack clients exercises both encoders
+            subprotocol = MSGPACK_SUBPROTOCOL if i % 4 == 0 else JSON_SUBPROTOCOL
+            await manager.connect(MockWebSocket(subprotocol), agent_id=i % 50 + 1)
+
+        async def broadcast():
+            # Includes the sends made by each connection's writer task
+            await manager.broadcast(event)
+            await manager.flush()
+
+        results[f"broadcast[{fanout}]"] = await measure_async(broadcast, min_time=args.min_time)
+        for connection_id in list(manager.connections):
+            manager.disconnect(connection_id)
+        # Let the cancelled writer tasks finish
+        await asyncio.sleep(0)
+    return results
+
+
+# Query benchmarks
+
+def dataset_path(args, size_name: str) -> Path:
+    """Return a cached database for the size, building it on first use"""
+    path = Path(args.data_dir) / f"messages-{size_name}-seed{args.seed}.db"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        print(f"Building {size_name} dataset at {path}...", file=sys.stderr)
+        started = time.perf_counter()
+        partial = path.with_suffix(".partial")
+        partial.unlink(missing_ok=True)
+        generate_database(str(partial), SIZES[size_name], seed=args.seed)
+        partial.rename(path)
+        print(f"  built in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return path
+
+
+async def bench_queries(args) -> dict:
+    results = {}
+    for size_name in args.sizes:
+        path = dataset_path(args, size_name)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def list_conversations():
+            async with session_maker() as db:
+                await get_conversations(
+                    skip=0, limit=50, status=None, priority=None, agent_id=None, unassigned=False, db=db
+                )
+
+        async def search_messages():
+            async with session_maker() as db:
+                await search(q="loan", search_in="all", priority=None, status=None, limit=50, db=db)
+
+        async def conversation_stats():
+            async with session_maker() as db:
+                await get_conversation_stats(db=db)
+
+        for name, fn in (
+            ("get_conversations", list_conversations),
+            ("search", search_messages),
+            ("get_conversation_stats", conversation_stats)
+        ):
+            results[f"queries.{name}[{size_name}]"] = await measure_async(
+                fn, min_rounds=3, max_rounds=200, min_time=args.min_time
+            )
+        await engine.dispose()
+    return results
+
+
+# Seed import
+
+async def bench_seed(args) -> dict:
+    database.engine.echo = False
+
+    async def seed():
+        async with database.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        t0 = time.perf_counter()
+        await database.seed_initial_data()
+        return time.perf_counter() - t0
+
+    samples = []
+    for _ in range(max(3, args.seed_rounds)):
+        samples.append(await seed())
+    await database.engine.dispose()
+    return {"seed.seed_initial_data": summarize(samples)}
+
+
+# Baselines
+
+def load_baseline(path: Path) -> dict:
+    if not path.exists():
+        sys.exit(f"No baseline at {path}; run with --save first")
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: Path, results: dict):
+    # Merge so partial runs (e.g. --groups text) only refresh their own entries
+    existing = {}
+    if path.exists():
+        with open(path) as f:
+            existing = json.load(f).get("results", {})
+    existing.update(results)
+    data = {
+        "saved_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "results": dict(sorted(existing.items()))
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    print(f"Saved {len(results)} results to {path}")
+
+
+def format_us(value: float) -> str:
+    if value >= 1e6:
+        return f"{value / 1e6:.2f}s"
+    if value >= 1e3:
+        return f"{value / 1e3:.2f}ms"
+    return f"{value:.2f}us"
+
+
+def report(results: dict, baseline: dict = None, threshold: float = 0.2) -> int:
+    """Print results, optionally against a baseline. Returns the number of regressions."""
+    width = max(len(name) for name in results) + 2
+    header = f"{'benchmark':<{width}}{'median':>12}{'min':>12}{'rounds':>8}"
+    if baseline is not None:
+        header += f"{'baseline':>12}{'change':>10}"
+    print(header)
+
+    regressions = 0
+    for name, result in results.items():
+        line = f"{name:<{width}}{format_us(result['median_us']):>12}{format_us(result['min_us']):>12}{result['rounds']:>8}"
+        if baseline is not None:
+            previous = baseline.get(name)
+            if previous is None:
+                line += f"{'-':>12}{'new':>10}"
+            else:
+                change = result["median_us"] / previous["median_us"] - 1
+                line += f"{format_us(previous['median_us']):>12}{change:>+10.1%}"
+                if change > threshold:
+                    line += "  REGRESSION"
+                    regressions += 1
+                elif change < -threshold:
+                    line += "  improved"
+        print(line)
+    return regressions
+
+
+async def run(args) -> dict:
+    messages = load_csv_messages()
+    results = {}
+    if "text" in args.groups:
+        results.update(bench_text(args, messages))
+    if "broadcast" in args.groups:
+        results.update(await bench_broadcast(args, messages))
+    if "queries" in args.groups:
+        results.update(await bench_queries(args))
+    if "seed" in args.groups:
+        results.update(await bench_seed(args))
+    if args.filter:
+        results = {name: result for name, result in results.items() if args.filter in name}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run backend micro-benchmarks")
+    parser.add_argument("--groups", default=",".join(GROUPS), help=f"Comma-separated subset of {','.join(GROUPS)}")
+    parser.add_argument("--sizes", default=",".join(SIZES), help=f"Dataset sizes for query benchmarks ({','.join(SIZES)})")
+    parser.add_argument("--filter", help="Only report benchmarks whose name contains this string")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Minimum seconds spent per benchmark")
+    parser.add_argument("--seed-rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for datasets and corpora")
+    parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR), help="Where generated databases are cached")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baselines file")
+    parser.add_argument("--save", action="store_true", help="Save results to the baselines file")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baselines file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    args.groups = [g for g in args.groups.split(",") if g]
+    args.sizes = [s.lower() for s in args.sizes.split(",") if s]
+    for group in args.groups:
+        if group not in GROUPS:
+            parser.error(f"Unknown group: {group}")
+    for size in args.sizes:
+        if size not in SIZES:
+            parser.error(f"Unknown size: {size}")
+
+    baseline = load_baseline(Path(args.baseline))["results"] if args.compare else None
+    results = asyncio.run(run(args))
+    if not results:
+        sys.exit("No benchmarks matched")
+
+    regressions = report(results, baseline, args.threshold)
+    if args.save:
+        save_baseline(Path(args.baseline), results)
+    if regressions:
+        print(f"{regressions} benchmark(s) regressed more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Synthetic dataset generator for benchmarking and capacity tests.
+Builds a SQLite database with the app schema holding any number of messages.
+Message text is generated from a word-level Markov chain trained on the sample
+CSV, so search selectivity and priority detection behave like real traffic.
+Output is deterministic for a given seed.
+
+    python data/generate.py --messages 10000000 --output /tmp/branch-10m.db
+"""
+
+import argparse
+import bisect
+import csv
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.schema import CreateTable
+from app.database import Base
+from app.models import MessagePriority, MessageStatus
+from app.services import detect_priority
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "GeneralistRails_Project_MessageData.csv")
+
+# Relative weights of conversation statuses and priorities
+STATUS_MIX = {
+    MessageStatus.OPEN: 0.25,
+    MessageStatus.IN_PROGRESS: 0.15,
+    MessageStatus.RESOLVED: 0.35,
+    MessageStatus.CLOSED: 0.25
+}
+PRIORITY_MIX = {
+    MessagePriority.LOW: 0.35,
+    MessagePriority.MEDIUM: 0.35,
+    MessagePriority.HIGH: 0.2,
+    MessagePriority.URGENT: 0.1
+}
+LOAN_STATUSES = [None, "pending", "approved", "disbursed", "repaying"]
+
+# Rows per executemany batch
+BATCH_SIZE = 50_000
+
+# Timestamps are passed as epoch seconds and formatted by SQLite the way
+# SQLAlchemy stores DateTime values
+TIMESTAMP = "datetime(?, 'unixepoch') || '.000000'"
+
+
+class TextModel:
+    """Word-level bigram Markov chain over the CSV message bodies"""
+
+    def __init__(self, bodies: list):
+        self.starts = []
+        self.transitions: dict[str, list] = {}
+        self.lengths = sorted(len(body.split()) for body in bodies if body.split())
+        for body in bodies:
+            words = body.split()
+            if not words:
+                continue
+            self.starts.append(words[0])
+            for current, following in zip(words, words[1:]):
+                self.transitions.setdefault(current, []).append(following)
+
+    def sentence(self, rng: random.Random) -> str:
+        # Lengths follow the CSV distribution, occasionally stretched for long rants
+        length = rng.choice(self.lengths)
+        if rng.random() < 0.05:
+            length *= rng.randint(2, 6)
+        word = rng.choice(self.starts)
+        words = [word]
+        while len(words) < length:
+            following = self.transitions.get(word)
+            word = rng.choice(following) if following else rng.choice(self.starts)
+            words.append(word)
+        return " ".join(words)
+
+
+def load_bodies() -> list:
+    with open(CSV_PATH, "r", encoding="utf-8") as f:
+        return [row["Message Body"].strip() for row in csv.DictReader(f)]
+
+
+def weighted_picker(rng: random.Random, mix: dict):
+    """Return a fast sampler for a {value: weight} mix"""
+    values = list(mix)
+    cumulative = list(itertools.accumulate(mix.values()))
+    total = cumulative[-1]
+    return lambda: values[bisect.bisect(cumulative, rng.random() * total)]
+
+
+def pareto_alpha(mean: float, cap: int) -> float:
+    """Find the Pareto shape whose mean, once capped at cap, is the requested mean"""
+    low, high = 1.0001, 50.0
+    for _ in range(60):
+        alpha = (low + high) / 2
+        capped_mean = (alpha - cap ** (1 - alpha)) / (alpha - 1)
+        if capped_mean > mean:
+            low = alpha
+        else:
+            high = alpha
+    return alpha
+
+
+def create_schema(conn: sqlite3.Connection):
+    """Create tables without secondary indexes; those are built after loading"""
+    engine = create_engine("sqlite://")
+    for table in Base.metadata.sorted_tables:
+        conn.execute(str(CreateTable(table).compile(engine)))
+
+
+def create_indexes(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                index.create(conn)
+    engine.dispose()
+
+
+def generate_database(
+    path: str,
+    messages: int,
+    agents: int = 50,
+    mean_messages: float = 8.0,
+    max_messages: int = 2000,
+    pool_size: int = 20_000,
+    seed: int = 42,
+    start: datetime = datetime(2017, 1, 1),
+    days: int = 365,
+    progress: bool = False
+) -> dict:
+    """
+    Write a new database at path with the given number of messages.
+    Messages per conversation follow a Pareto distribution with the given mean,
+    so a few conversations are very long and most are short.
+    Returns row counts per table.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    # Sample texts from a fixed pool; generating every body from the chain is too slow
+    model = TextModel(load_bodies())
+    pool = [model.sentence(rng) for _ in range(pool_size)]
+    pool_priorities = [detect_priority(text)[0].name for text in pool]
+
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+    conn.execute("PRAGMA cache_size=-262144")
+    create_schema(conn)
+    conn.execute("BEGIN")
+
+    epoch_start = int((start - datetime(1970, 1, 1)).total_seconds())
+    span = days * 86400
+
+    conn.executemany(
+        f"INSERT INTO agents (id, name, email, avatar_url, is_online, created_at) VALUES (?, ?, ?, ?, ?, {TIMESTAMP})",
+        (
+            (i, f"Agent {i}", f"agent{i}@branch.com",
+             f"https://api.dicebear.com/7.x/avataaars/svg?seed=Agent{i}", int(rng.random() < 0.6), epoch_start)
+            for i in range(1, agents + 1)
+        )
+    )
+
+    alpha = pareto_alpha(mean_messages, max_messages)
+    pick_status = weighted_picker(rng, {status.name: weight for status, weight in STATUS_MIX.items()})
+    pick_priority = weighted_picker(rng, {priority.name: weight for priority, weight in PRIORITY_MIX.items()})
+    random_ = rng.random
+    expovariate = rng.expovariate
+
+    customers = []
+    conversations = []
+    message_rows = []
+    counts = {"customers": 0, "conversations": 0, "messages": 0}
+    # Returning customers: a share of conversations reuse an earlier customer
+    customer_id = 0
+    conversation_id = 0
+    message_id = 0
+    next_report = 1_000_000
+
+    while message_id < messages:
+        conversation_id += 1
+        if customer_id and random_() < 0.3:
+            conversation_customer = int(random_() * customer_id) + 1
+        else:
+            customer_id += 1
+            conversation_customer = customer_id
+            joined = epoch_start + int(random_() * span)
+            loan_status = LOAN_STATUSES[int(random_() * len(LOAN_STATUSES))]
+            customers.append((
+                customer_id, f"Customer {customer_id}", f"customer{customer_id}@example.com",
+                f"+254{customer_id:09d}", "active", loan_status,
+                (int(random_() * 50) + 10) * 100.0 if loan_status else None,
+                joined, joined
+            ))
+
+        status = pick_status()
+        closed = status in ("RESOLVED", "CLOSED")
+        agent_id = None if status == "OPEN" and random_() < 0.4 else int(random_() * agents) + 1
+        count = min(int(rng.paretovariate(alpha) + 0.5), max_messages, messages - message_id)
+        opened = epoch_start + int(random_() * span)
+        # Open conversations end with a run of unread customer messages
+        unread_tail = 0 if closed else min(count, int(expovariate(0.5)))
+
+        at = opened
+        first_text = None
+        for i in range(count):
+            message_id += 1
+            text_index = int(random_() * pool_size)
+            from_customer = i == 0 or i >= count - unread_tail or random_() < 0.55
+            if first_text is None:
+                first_text = pool[text_index]
+            message_rows.append((
+                message_id, conversation_id,
+                conversation_customer if from_customer else None,
+                None if from_customer else (agent_id or int(random_() * agents) + 1),
+                pool[text_index], int(from_customer), pool_priorities[text_index], at,
+                at + 30 if from_customer and i < count - unread_tail else None
+            ))
+            at += int(expovariate(1 / 600)) + 1
+
+        conversations.append((
+            conversation_id, conversation_customer, agent_id, status, pick_priority(),
+            first_text[:50] + ("..." if len(first_text) > 50 else ""), opened, at
+        ))
+
+        if len(message_rows) >= BATCH_SIZE:
+            flush_rows(conn, customers, conversations, message_rows, counts)
+        if progress and message_id >= next_report:
+            print(f"  {message_id:,} messages ({time.perf_counter() - started:.0f}s)")
+            next_report += 1_000_000
+
+    flush_rows(conn, customers, conversations, message_rows, counts)
+    conn.execute("COMMIT")
+    conn.close()
+
+    if progress:
+        print(f"  building indexes ({time.perf_counter() - started:.0f}s)")
+    create_indexes(path)
+    counts["agents"] = agents
+    return counts
+
+
+def flush_rows(conn: sqlite3.Connection, customers: list, conversations: list, message_rows: list, counts: dict):
+    conn.executemany(
+        "INSERT INTO customers (id, name, email, phone, account_status, loan_status, loan_amount, "
+        f"account_created, last_activity) VALUES (?, ?, ?, ?, ?, ?, ?, {TIMESTAMP}, {TIMESTAMP})",
+        customers
+    )
+    conn.executemany(
+        "INSERT INTO conversations (id, customer_id, agent_id, status, priority, subject, created_at, updated_at) "
+        f"VALUES (?, ?, ?, ?, ?, ?, {TIMESTAMP}, {TIMESTAMP})",
+        conversations
+    )
+    conn.executemany(
+        "INSERT INTO messages (id, conversation_id, customer_id, agent_id, content, is_from_customer, "
+        f"priority, created_at, read_at) VALUES (?, ?, ?, ?, ?, ?, ?, {TIMESTAMP}, {TIMESTAMP})",
+        message_rows
+    )
+    counts["customers"] += len(customers)
+    counts["conversations"] += len(conversations)
+    counts["messages"] += len(message_rows)
+    customers.clear()
+    conversations.clear()
+    message_rows.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a large synthetic database")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--output", default="branch_synthetic.db", help="SQLite file to create (overwritten)")
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--mean-messages", type=float, default=8.0, help="Mean messages per conversation")
+    parser.add_argument("--max-messages", type=int, default=2000, help="Cap on messages per conversation")
+    parser.add_argument("--days", type=int, default=365, help="Time span covered by the data")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    print(f"Generating {args.messages:,} messages into {args.output}...")
+    counts = generate_database(
+        args.output, args.messages, agents=args.agents, mean_messages=args.mean_messages,
+        max_messages=args.max_messages, days=args.days, seed=args.seed, progress=True
+    )
+    print(f"Created {counts['customers']:,} customers, {counts['conversations']:,} conversations "
+          f"and {counts['messages']:,} messages in {time.perf_counter() - started:.1f}s")
+    print(f"Use it with DATABASE_URL=sqlite+aiosqlite:///{os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
 'use client';
 
-import { useState, useEffect, useRef, useCallback } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { MessageSquare, Users, Search, Settings, LogOut, Bell, Wifi, WifiOff, UserPlus } from 'lucide-react';
-import { API_ENDPOINTS, apiRequest } from '@/lib/api';
-import { Agent, ConversationListItem, Customer } from '@/lib/types';
+import { API_ENDPOINTS, apiRequest, setActingAgent } from '@/lib/api';
+import { Agent, ConversationListItem, Customer, CustomerOverview } from '@/lib/types';
 import { cn } from '@/lib/utils';
 import { WebSocketProvider, useWebSocket } from '@/lib/websocket';
 import ConversationList from './ConversationList';
@@ -21,15 +21,8 @@ function DashboardContent() {
   const [showSimulator, setShowSimulator] = useState(false);
   const [showAddAgent, setShowAddAgent] = useState(false);
   const [activeTab, setActiveTab] = useState<'messages' | 'simulator'>('messages');
-  const [conversationListKey, setConversationListKey] = useState(0);
   const { isConnected } = useWebSocket();
 
-  // Callback to trigger conversation list refresh
-  const handleConversationUpdate = useCallback(() => {
-    // Increment key to force ConversationList to re-fetch
-    setConversationListKey(prev => prev + 1);
-  }, []);
-
   useEffect(() => {
     const fetchAgents = async () => {
       try {
@@ -46,6 +39,10 @@ function DashboardContent() {
     fetchAgents();
   }, []);
 
+  useEffect(() => {
+    setActingAgent(selectedAgent?.id ?? null);
+  }, [selectedAgent]);
+
   const handleAgentCreated = (newAgent: Agent) => {
     setAgents(prev => [...prev, newAgent]);
     setSelectedAgent(newAgent); // Auto-select the new agent
@@ -72,11 +69,11 @@ function DashboardContent() {
   const handleSelectCustomer = async (customer: Customer) => {
     // Find or create a conversation for this customer
     try {
-      const conversations = await apiRequest<ConversationListItem[]>(
-        `${API_ENDPOINTS.customers}/${customer.id}/conversations`
+      const { conversations } = await apiRequest<CustomerOverview>(
+        `${API_ENDPOINTS.customers}/${customer.id}/overview`
       );
       if (conversations.length > 0) {
-        setSelectedConversation(conversations[0]);
+        setSelectedConversation({ ...conversations[0], customer });
         setActiveTab('messages');
       }
     } catch (error) {
@@ -183,11 +180,9 @@ function DashboardContent() {
         {/* Conversation List */}
         <div className="w-96">
           <ConversationList
-            key={conversationListKey}
             selectedId={selectedConversation?.id || null}
             onSelect={handleSelectConversation}
             agentId={selectedAgent.id}
-            onRefreshNeeded={handleConversationUpdate}
           />
         </div>
 
@@ -198,7 +193,6 @@ function DashboardContent() {
               <MessagePanel
                 conversationId={selectedConversation.id}
                 agentId={selectedAgent.id}
-                onConversationUpdate={handleConversationUpdate}
               />
               {selectedConversation.customer_id && !showSimulator && (
                 <CustomerPanel customerId={selectedConversation.customer_id} />
@@ -1,11 +1,18 @@
 'use client';
 
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { Search, Filter, RefreshCw, AlertCircle, Clock, CheckCircle, XCircle, User, Users } from 'lucide-react';
 import { API_ENDPOINTS, apiRequest } from '@/lib/api';
-import { ConversationListItem, Priority, ConversationStatus, ConversationStats } from '@/lib/types';
+import {
+  ConversationListItem, Priority, ConversationStatus, ConversationStats, StatsDelta, InboxSnapshotEvent,
+  InboxDiffEvent
+} from '@/lib/types';
 import { cn, formatDate, getPriorityBadgeColor, getStatusColor, truncate } from '@/lib/utils';
-import { useNewMessages, useConversationUpdates, useNewConversations } from '@/lib/websocket';
+import { applyStatsDelta, applyInboxOps, listItemFromRow } from '@/lib/events';
+import {
+  useWebSocket, useNewMessages, useConversationUpdates, useNewConversations, useConversationsArchived,
+  useResyncRequired, useInboxSnapshots, useInboxDiffs
+} from '@/lib/websocket';
 
 type AssignmentFilter = 'all' | 'mine' | 'unassigned' | 'others';
 
@@ -13,10 +20,9 @@ interface ConversationListProps {
   selectedId: number | null;
   onSelect: (conversation: ConversationListItem) => void;
   agentId: number;
-  onRefreshNeeded?: () => void;
 }
 
-export default function ConversationList({ selectedId, onSelect, agentId, onRefreshNeeded }: ConversationListProps) {
+export default function ConversationList({ selectedId, onSelect, agentId }: ConversationListProps) {
   const [conversations, setConversations] = useState<ConversationListItem[]>([]);
   const [stats, setStats] = useState<ConversationStats | null>(null);
   const [loading, setLoading] = useState(true);
@@ -26,26 +32,23 @@ export default function ConversationList({ selectedId, onSelect, agentId, onRefr
   const [assignmentFilter, setAssignmentFilter] = useState<AssignmentFilter>('all');
   const [showFilters, setShowFilters] = useState(false);
 
-  const fetchConversations = useCallback(async () => {
-    try {
-      let url = API_ENDPOINTS.conversations;
-      const params = new URLSearchParams();
-      
-      if (priorityFilter !== 'all') params.append('priority', priorityFilter);
-      if (statusFilter !== 'all') params.append('status', statusFilter);
-      
-      if (params.toString()) {
-        url += `?${params.toString()}`;
-      }
-      
-      const data = await apiRequest<ConversationListItem[]>(url);
-      setConversations(data);
-    } catch (error) {
-      console.error('Error fetching conversations:', error);
-    } finally {
-      setLoading(false);
-    }
-  }, [priorityFilter, statusFilter]);
+  const { isConnected, sendMessage } = useWebSocket();
+  // View of the current subscription; diffs for any other view are stale
+  const viewRef = useRef<string | null>(null);
+
+  // The server keeps the inbox for these filters and pushes a snapshot, then diffs
+  const subscribeInbox = useCallback(() => {
+    viewRef.current = null;
+    sendMessage({
+      type: 'subscribe_inbox',
+      data: {
+        status: statusFilter !== 'all' ? statusFilter : undefined,
+        priority: priorityFilter !== 'all' ? priorityFilter : undefined,
+        agent_id: assignmentFilter === 'mine' ? agentId : undefined,
+        unassigned: assignmentFilter === 'unassigned',
+      },
+    });
+  }, [sendMessage, statusFilter, priorityFilter, assignmentFilter, agentId]);
 
   const fetchStats = useCallback(async () => {
     try {
@@ -56,114 +59,48 @@ export default function ConversationList({ selectedId, onSelect, agentId, onRefr
     }
   }, []);
 
+  // Subscriptions end with the connection, so subscribe again after reconnecting
+  useEffect(() => {
+    if (isConnected) {
+      setLoading(true);
+      subscribeInbox();
+    }
+  }, [isConnected, subscribeInbox]);
+
   useEffect(() => {
-    fetchConversations();
     fetchStats();
-  }, [fetchConversations, fetchStats]);
+  }, [fetchStats]);
 
-  // Handle real-time new messages
-  const handleNewMessage = useCallback((data: unknown) => {
-    const messageData = data as { conversation_id: number; content: string; is_from_customer: boolean; created_at: string; priority: string };
-    setConversations(prev => {
-      const index = prev.findIndex(c => c.id === messageData.conversation_id);
-      if (index === -1) return prev;
-      
-      const updated = [...prev];
-      const conversation = { ...updated[index] };
-      conversation.updated_at = messageData.created_at;
-      conversation.last_message = {
-        id: Date.now(),
-        conversation_id: messageData.conversation_id,
-        content: messageData.content,
-        is_from_customer: messageData.is_from_customer,
-        priority: messageData.priority as Priority,
-        created_at: messageData.created_at,
-      };
-      if (messageData.is_from_customer) {
-        conversation.unread_count += 1;
-      }
-      updated[index] = conversation;
-      
-      // Re-sort by priority and updated time
-      return updated.sort((a, b) => {
-        const priorityOrder = { urgent: 4, high: 3, medium: 2, low: 1 };
-        const aPriority = priorityOrder[a.priority] || 0;
-        const bPriority = priorityOrder[b.priority] || 0;
-        if (aPriority !== bPriority) return bPriority - aPriority;
-        return new Date(b.updated_at).getTime() - new Date(a.updated_at).getTime();
-      });
-    });
+  const handleInboxSnapshot = useCallback((data: InboxSnapshotEvent) => {
+    if (data.reason === 'subscribed') {
+      viewRef.current = data.view;
+    } else if (data.view !== viewRef.current) {
+      return;
+    }
+    setConversations(data.rows.map(listItemFromRow));
+    setLoading(false);
   }, []);
 
-  // Handle conversation updates
-  const handleConversationUpdate = useCallback((data: unknown) => {
-    const updateData = data as { 
-      id: number; 
-      status?: string; 
-      priority?: string; 
-      agent_id?: number | null;
-      agent_name?: string | null;
-    };
-    setConversations(prev => prev.map(conv => {
-      if (conv.id === updateData.id) {
-        // Handle agent_id - it can be a number, null, or undefined
-        let newAgentId = conv.agent_id;
-        let newAssignedAgent = conv.assigned_agent;
-        
-        if (updateData.agent_id !== undefined) {
-          // agent_id was explicitly set (could be null for unassign or a number for assign)
-          newAgentId = updateData.agent_id === null ? undefined : updateData.agent_id;
-          newAssignedAgent = updateData.agent_id === null ? undefined : {
-            id: updateData.agent_id,
-            name: updateData.agent_name || `Agent ${updateData.agent_id}`,
-            email: '',
-            is_online: true,
-            created_at: new Date().toISOString()
-          };
-        }
-        
-        return {
-          ...conv,
-          status: (updateData.status as ConversationStatus) || conv.status,
-          priority: (updateData.priority as Priority) || conv.priority,
-          agent_id: newAgentId,
-          assigned_agent: newAssignedAgent,
-        };
-      }
-      return conv;
-    }));
-    fetchStats();
-  }, [fetchStats]);
+  const handleInboxDiff = useCallback((data: InboxDiffEvent) => {
+    if (data.view !== viewRef.current) return;
+    setConversations(prev => applyInboxOps(prev, data.ops));
+  }, []);
 
-  // Handle new conversations
-  const handleNewConversation = useCallback((data: unknown) => {
-    const newConv = data as { id: number; customer_id: number; priority: string; status: string; subject: string; customer_name: string; customer_email: string };
-    const newConversation: ConversationListItem = {
-      id: newConv.id,
-      customer_id: newConv.customer_id,
-      status: newConv.status as ConversationStatus,
-      priority: newConv.priority as Priority,
-      subject: newConv.subject,
-      created_at: new Date().toISOString(),
-      updated_at: new Date().toISOString(),
-      customer: {
-        id: newConv.customer_id,
-        name: newConv.customer_name,
-        email: newConv.customer_email,
-        account_status: 'active',
-        account_created: new Date().toISOString(),
-        last_activity: new Date().toISOString(),
-      },
-      unread_count: 1,
-    };
-    
-    setConversations(prev => [newConversation, ...prev]);
-    fetchStats();
-  }, [fetchStats]);
+  useInboxSnapshots(handleInboxSnapshot);
+  useInboxDiffs(handleInboxDiff);
+
+  // Rows come from the view; events still carry the changes to the counts
+  const handleStatsDelta = useCallback((data: { stats_delta?: StatsDelta }) => {
+    setStats(prev => prev && applyStatsDelta(prev, data.stats_delta));
+  }, []);
+
+  useNewMessages(handleStatsDelta);
+  useConversationUpdates(handleStatsDelta);
+  useNewConversations(handleStatsDelta);
+  useConversationsArchived(handleStatsDelta);
 
-  useNewMessages(handleNewMessage);
-  useConversationUpdates(handleConversationUpdate);
-  useNewConversations(handleNewConversation);
+  // Missed events could not be replayed, so reload the counts from the API
+  useResyncRequired(fetchStats);
 
   // Filter by search query and assignment
   const filteredConversations = conversations.filter(conv => {
@@ -320,7 +257,7 @@ export default function ConversationList({ selectedId, onSelect, agentId, onRefr
           <button
             onClick={() => {
               setLoading(true);
-              fetchConversations();
+              subscribeInbox();
               fetchStats();
             }}
             className="p-1 text-gray-500 hover:text-gray-700 hover:bg-gray-100 rounded"
@@ -3,7 +3,7 @@
 import { useState, useEffect } from 'react';
 import { User, Mail, Phone, CreditCard, Calendar, FileText, Activity, ExternalLink, DollarSign } from 'lucide-react';
 import { API_ENDPOINTS, apiRequest } from '@/lib/api';
-import { Customer, ConversationListItem } from '@/lib/types';
+import { CustomerOverview } from '@/lib/types';
 import { cn, formatDate } from '@/lib/utils';
 
 interface CustomerPanelProps {
@@ -11,20 +11,14 @@ interface CustomerPanelProps {
 }
 
 export default function CustomerPanel({ customerId }: CustomerPanelProps) {
-  const [customer, setCustomer] = useState<Customer | null>(null);
-  const [conversations, setConversations] = useState<ConversationListItem[]>([]);
+  const [overview, setOverview] = useState<CustomerOverview | null>(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     const fetchCustomerData = async () => {
       setLoading(true);
       try {
-        const [customerData, conversationsData] = await Promise.all([
-          apiRequest<Customer>(`${API_ENDPOINTS.customers}/${customerId}`),
-          apiRequest<ConversationListItem[]>(`${API_ENDPOINTS.customers}/${customerId}/conversations`),
-        ]);
-        setCustomer(customerData);
-        setConversations(conversationsData);
+        setOverview(await apiRequest<CustomerOverview>(`${API_ENDPOINTS.customers}/${customerId}/overview`));
       } catch (error) {
         console.error('Error fetching customer data:', error);
       } finally {
@@ -52,7 +46,7 @@ export default function CustomerPanel({ customerId }: CustomerPanelProps) {
     );
   }
 
-  if (!customer) {
+  if (!overview) {
     return (
       <div className="w-80 border-l border-gray-200 bg-white p-6 flex items-center justify-center text-gray-500">
         Customer not found
@@ -60,6 +54,8 @@ export default function CustomerPanel({ customerId }: CustomerPanelProps) {
     );
   }
 
+  const { customer, conversations } = overview;
+
   const getStatusColor = (status: string) => {
     switch (status) {
       case 'active':
@@ -176,8 +172,23 @@ export default function CustomerPanel({ customerId }: CustomerPanelProps) {
           </div>
           <div className="flex items-center justify-between">
             <span className="text-sm text-gray-600">Total Conversations</span>
-            <span className="text-sm font-medium text-gray-900">{conversations.length}</span>
+            <span className="text-sm font-medium text-gray-900">{overview.total_conversations}</span>
+          </div>
+          <div className="flex items-center justify-between">
+            <span className="text-sm text-gray-600">Messages</span>
+            <span className="text-sm font-medium text-gray-900">
+              {overview.total_messages}
+              {overview.unread_count > 0 && (
+                <span className="ml-1 text-xs text-blue-600">({overview.unread_count} unread)</span>
+              )}
+            </span>
           </div>
+          {overview.first_contact_at && (
+            <div className="flex items-center justify-between">
+              <span className="text-sm text-gray-600">First Contact</span>
+              <span className="text-sm text-gray-900">{formatDate(overview.first_contact_at)}</span>
+            </div>
+          )}
         </div>
       </div>
 
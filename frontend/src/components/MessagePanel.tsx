@@ -3,18 +3,20 @@
 import { useState, useEffect, useRef, useCallback } from 'react';
 import { Send, Paperclip, Smile, MoreVertical, CheckCircle, Clock, AlertTriangle, User, UserX, Shield } from 'lucide-react';
 import { API_ENDPOINTS, apiRequest } from '@/lib/api';
-import { Conversation, Message, CannedMessage, Priority, ConversationStatus } from '@/lib/types';
+import {
+  Conversation, Message, CannedMessage, Priority, ConversationStatus, NewMessageEvent, ConversationUpdateEvent
+} from '@/lib/types';
 import { cn, formatTime, getPriorityBadgeColor, getStatusColor } from '@/lib/utils';
-import { useNewMessages, useWebSocket } from '@/lib/websocket';
+import { applySummary } from '@/lib/events';
+import { useNewMessages, useConversationUpdates, useWebSocket } from '@/lib/websocket';
 import CannedMessagePicker from './CannedMessagePicker';
 
 interface MessagePanelProps {
   conversationId: number;
   agentId: number;
-  onConversationUpdate?: () => void;
 }
 
-export default function MessagePanel({ conversationId, agentId, onConversationUpdate }: MessagePanelProps) {
+export default function MessagePanel({ conversationId, agentId }: MessagePanelProps) {
   const [conversation, setConversation] = useState<Conversation | null>(null);
   const [messages, setMessages] = useState<Message[]>([]);
   const [loading, setLoading] = useState(true);
@@ -74,18 +76,7 @@ export default function MessagePanel({ conversationId, agentId, onConversationUp
   }, [conversationId, fetchConversation, wsSendMessage]);
 
   // Handle real-time new messages
-  const handleNewMessage = useCallback((data: unknown) => {
-    const messageData = data as { 
-      conversation_id: number; 
-      id: number;
-      content: string; 
-      is_from_customer: boolean; 
-      created_at: string;
-      priority: string;
-      customer_id?: number;
-      agent_id?: number;
-    };
-    
+  const handleNewMessage = useCallback((messageData: NewMessageEvent) => {
     if (messageData.conversation_id === conversationId) {
       const newMessage: Message = {
         id: messageData.id,
@@ -103,10 +94,24 @@ export default function MessagePanel({ conversationId, agentId, onConversationUp
         if (prev.some(m => m.id === newMessage.id)) return prev;
         return [...prev, newMessage];
       });
+      setConversation(prev => prev && applySummary(prev, messageData.conversation));
     }
   }, [conversationId]);
 
+  // Status, priority and assignment changes, including our own, arrive as versioned state
+  const handleConversationUpdate = useCallback((data: ConversationUpdateEvent) => {
+    setConversation(prev => prev && applySummary(prev, data.conversation));
+  }, []);
+
   useNewMessages(handleNewMessage);
+  useConversationUpdates(handleConversationUpdate);
+
+  // Keep the response of our own update if its event has not arrived yet
+  const applyUpdated = (updated: Conversation) => {
+    setConversation(prev => prev && (updated.version ?? 0) > (prev.version ?? 0)
+      ? { ...prev, ...updated, messages: prev.messages }
+      : prev);
+  };
 
   // Scroll to bottom when messages change
   useEffect(() => {
@@ -128,7 +133,6 @@ export default function MessagePanel({ conversationId, agentId, onConversationUp
       });
       
       setMessageText('');
-      onConversationUpdate?.();
     } catch (error) {
       console.error('Error sending message:', error);
     } finally {
@@ -148,12 +152,10 @@ export default function MessagePanel({ conversationId, agentId, onConversationUp
 
   const handleStatusChange = async (status: ConversationStatus) => {
     try {
-      await apiRequest(`${API_ENDPOINTS.conversations}/${conversationId}`, {
+      applyUpdated(await apiRequest<Conversation>(`${API_ENDPOINTS.conversations}/${conversationId}`, {
         method: 'PUT',
         body: JSON.stringify({ status }),
-      });
-      fetchConversation();
-      onConversationUpdate?.();
+      }));
     } catch (error) {
       console.error('Error updating status:', error);
     }
@@ -161,12 +163,10 @@ export default function MessagePanel({ conversationId, agentId, onConversationUp
 
   const handlePriorityChange = async (priority: Priority) => {
     try {
-      await apiRequest(`${API_ENDPOINTS.conversations}/${conversationId}`, {
+      applyUpdated(await apiRequest<Conversation>(`${API_ENDPOINTS.conversations}/${conversationId}`, {
         method: 'PUT',
         body: JSON.stringify({ priority }),
-      });
-      fetchConversation();
-      onConversationUpdate?.();
+      }));
     } catch (error) {
       console.error('Error updating priority:', error);
     }
@@ -177,8 +177,6 @@ export default function MessagePanel({ conversationId, agentId, onConversationUp
       await apiRequest(`${API_ENDPOINTS.conversations}/${conversationId}/assign/${agentId}`, {
         method: 'POST',
       });
-      fetchConversation();
-      onConversationUpdate?.();
     } catch (error: unknown) {
       const err = error as { message?: string };
       console.error('Error assigning conversation:', err);
@@ -191,8 +189,6 @@ export default function MessagePanel({ conversationId, agentId, onConversationUp
       await apiRequest(`${API_ENDPOINTS.conversations}/${conversationId}/release?agent_id=${agentId}`, {
         method: 'POST',
       });
-      fetchConversation();
-      onConversationUpdate?.();
     } catch (error: unknown) {
       const err = error as { message?: string };
       console.error('Error releasing conversation:', err);
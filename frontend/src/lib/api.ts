@@ -29,6 +29,14 @@ export const API_ENDPOINTS = {
   websocket: (agentId: number) => `${WS_BASE_URL}/ws?agent_id=${agentId}`,
 };
 
+// Agent using the dashboard, sent as X-Agent-Id so the backend can route
+// their reads to a replica that already has their own changes
+let actingAgentId: number | null = null;
+
+export function setActingAgent(agentId: number | null) {
+  actingAgentId = agentId;
+}
+
 // Helper function to ensure proper URL formatting
 function normalizeUrl(url: string): string {
   // Remove double slashes (except after protocol)
@@ -47,6 +55,7 @@ export async function apiRequest<T>(
     ...options,
     headers: {
       'Content-Type': 'application/json',
+      ...(actingAgentId !== null ? { 'X-Agent-Id': String(actingAgentId) } : {}),
       ...options.headers,
     },
   });
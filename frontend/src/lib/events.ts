@@ -0,0 +1,104 @@
+import {
+  Agent, ConversationListItem, ConversationStats, ConversationSummary, InboxOp, InboxRow, Message, StatsDelta
+} from './types';
+
+// Patch helpers for real-time events; see "Real-time events" in the README
+
+interface ConversationState {
+  id: number;
+  agent_id?: number;
+  assigned_agent?: Agent;
+  version?: number;
+}
+
+// Apply a conversation summary to local state of the same conversation unless it is already as new
+export function applySummary<T extends ConversationState>(conversation: T, summary?: ConversationSummary): T {
+  if (!summary || summary.id !== conversation.id || summary.version <= (conversation.version ?? 0)) {
+    return conversation;
+  }
+
+  let assignedAgent = conversation.assigned_agent;
+  if (summary.agent_id === null) {
+    assignedAgent = undefined;
+  } else if (summary.agent_name !== undefined || assignedAgent?.id !== summary.agent_id) {
+    assignedAgent = {
+      id: summary.agent_id,
+      name: summary.agent_name || `Agent ${summary.agent_id}`,
+      email: '',
+      is_online: true,
+      created_at: new Date().toISOString(),
+    };
+  }
+
+  return {
+    ...conversation,
+    agent_id: summary.agent_id ?? undefined,
+    status: summary.status,
+    priority: summary.priority,
+    subject: summary.subject,
+    updated_at: summary.updated_at,
+    version: summary.version,
+    assigned_agent: assignedAgent,
+  };
+}
+
+// Inbox row for a conversation the list has not seen yet
+export function listItemFromSummary(summary: ConversationSummary, lastMessage?: Message, unreadCount = 0): ConversationListItem {
+  const now = new Date().toISOString();
+  const row: ConversationListItem = {
+    id: summary.id,
+    customer_id: summary.customer_id,
+    status: summary.status,
+    priority: summary.priority,
+    created_at: summary.created_at,
+    updated_at: summary.updated_at,
+    customer: summary.customer && {
+      ...summary.customer,
+      account_status: 'active',
+      account_created: now,
+      last_activity: now,
+    },
+    last_message: lastMessage,
+    unread_count: unreadCount,
+  };
+  return applySummary(row, summary);
+}
+
+export function listItemFromRow(row: InboxRow): ConversationListItem {
+  return listItemFromSummary(row, row.last_message ?? undefined, row.unread_count);
+}
+
+// Apply inbox_diff ops in order: remove by id, insert at index, move to index
+export function applyInboxOps(conversations: ConversationListItem[], ops: InboxOp[]): ConversationListItem[] {
+  const result = [...conversations];
+  ops.forEach(op => {
+    if (op.op === 'insert') {
+      result.splice(op.index, 0, listItemFromRow(op.row));
+      return;
+    }
+    const index = result.findIndex(c => c.id === op.id);
+    if (index === -1) return;
+    const [conversation] = result.splice(index, 1);
+    if (op.op === 'move') {
+      result.splice(op.index, 0, op.row ? listItemFromRow(op.row) : conversation);
+    }
+  });
+  return result;
+}
+
+export function applyStatsDelta(stats: ConversationStats, delta?: StatsDelta): ConversationStats {
+  if (!delta) return stats;
+  const add = (counts: Record<string, number>, changes: Record<string, number> = {}) => {
+    const result = { ...counts };
+    Object.entries(changes).forEach(([key, change]) => {
+      result[key] = (result[key] || 0) + change;
+    });
+    return result;
+  };
+  return {
+    by_status: add(stats.by_status, delta.by_status),
+    by_priority: add(stats.by_priority, delta.by_priority),
+    unassigned: stats.unassigned + (delta.unassigned || 0),
+    archived: stats.archived !== undefined ? stats.archived + (delta.archived || 0) : undefined,
+  };
+}
@@ -17,6 +17,7 @@ export interface Agent {
   email: string;
   avatar_url?: string;
   is_online: boolean;
+  last_seen?: string;
   created_at: string;
 }
 
@@ -44,6 +45,9 @@ export interface Conversation {
   customer?: Customer;
   assigned_agent?: Agent;
   messages: Message[];
+  archived?: boolean;
+  // Bumped by the server on every change; newer state replaces older
+  version?: number;
 }
 
 export interface ConversationListItem {
@@ -59,6 +63,22 @@ export interface ConversationListItem {
   assigned_agent?: Agent;
   last_message?: Message;
   unread_count: number;
+  archived?: boolean;
+  version?: number;
+}
+
+export interface CustomerOverview {
+  customer: Customer;
+  // Most recently updated first, without the customer repeated on each
+  conversations: ConversationListItem[];
+  total_conversations: number;
+  open_conversations: number;
+  total_messages: number;
+  unread_count: number;
+  priority_counts: Record<Priority, number>;
+  first_contact_at?: string;
+  last_contact_at?: string;
+  recent_messages: Message[];
 }
 
 export interface CannedMessage {
@@ -76,6 +96,7 @@ export interface ConversationStats {
   by_status: Record<string, number>;
   by_priority: Record<string, number>;
   unassigned: number;
+  archived?: number;
 }
 
 export interface SearchResult {
@@ -90,6 +111,32 @@ export type ConversationStatus = 'open' | 'in_progress' | 'resolved' | 'closed';
 export interface WebSocketMessage {
   type: string;
   data: Record<string, unknown>;
+  // Sequence number of broadcast events, used to resume after a reconnect
+  seq?: number;
+}
+
+// Versioned state of a conversation's inbox row, carried by conversation events.
+// agent_name is null when unassigned and missing when it did not change.
+export interface ConversationSummary {
+  id: number;
+  customer_id: number;
+  agent_id: number | null;
+  status: ConversationStatus;
+  priority: Priority;
+  subject?: string;
+  created_at: string;
+  updated_at: string;
+  version: number;
+  agent_name?: string | null;
+  customer?: { id: number; name: string; email: string };
+}
+
+// Change to ConversationStats, added counter by counter; missing counters did not change
+export interface StatsDelta {
+  by_status?: Record<string, number>;
+  by_priority?: Record<string, number>;
+  unassigned?: number;
+  archived?: number;
 }
 
 export interface NewMessageEvent {
@@ -103,14 +150,20 @@ export interface NewMessageEvent {
   created_at: string;
   customer_name?: string;
   agent_name?: string;
+  // Unread customer messages in the conversation after this one (customer messages only)
+  unread_count?: number;
+  conversation?: ConversationSummary;
+  stats_delta?: StatsDelta;
 }
 
 export interface ConversationUpdateEvent {
   id: number;
   status?: string;
   priority?: string;
-  agent_id?: number;
-  agent_name?: string;
+  agent_id?: number | null;
+  agent_name?: string | null;
+  conversation?: ConversationSummary;
+  stats_delta?: StatsDelta;
 }
 
 export interface NewConversationEvent {
@@ -121,4 +174,39 @@ export interface NewConversationEvent {
   subject?: string;
   customer_name: string;
   customer_email: string;
+  conversation?: ConversationSummary;
+  stats_delta?: StatsDelta;
+}
+
+export interface MessagesReadEvent {
+  conversation_id: number;
+  unread_count: number;
+}
+
+export interface ConversationsArchivedEvent {
+  conversation_ids: number[];
+  stats_delta: StatsDelta;
+}
+
+// A row of a live inbox view: the conversation summary plus what the list shows
+export interface InboxRow extends ConversationSummary {
+  last_message: Message | null;
+  unread_count: number;
+}
+
+export type InboxOp =
+  | { op: 'insert'; index: number; row: InboxRow }
+  | { op: 'move'; id: number; index: number; row?: InboxRow }
+  | { op: 'remove'; id: number };
+
+export interface InboxSnapshotEvent {
+  view: string;
+  // 'reloaded' snapshots replace the window without a new subscription
+  reason: 'subscribed' | 'reloaded';
+  rows: InboxRow[];
+}
+
+export interface InboxDiffEvent {
+  view: string;
+  ops: InboxOp[];
 }
@@ -1,8 +1,11 @@
 'use client';
 
-import { createContext, useContext, useEffect, useState, useCallback, ReactNode } from 'react';
+import { createContext, useContext, useEffect, useState, useCallback, useRef, ReactNode } from 'react';
 import { API_ENDPOINTS } from './api';
-import { WebSocketMessage, NewMessageEvent, ConversationUpdateEvent, NewConversationEvent } from './types';
+import {
+  WebSocketMessage, NewMessageEvent, ConversationUpdateEvent, NewConversationEvent, MessagesReadEvent,
+  ConversationsArchivedEvent, InboxSnapshotEvent, InboxDiffEvent
+} from './types';
 
 interface WebSocketContextType {
   isConnected: boolean;
@@ -24,45 +27,136 @@ export function WebSocketProvider({ children, agentId }: WebSocketProviderProps)
   const [lastMessage, setLastMessage] = useState<WebSocketMessage | null>(null);
   const [subscribers, setSubscribers] = useState<Map<string, Set<(data: unknown) => void>>>(new Map());
 
+  // Resume state: the server stream we are following and the last event applied
+  const streamIdRef = useRef<string | null>(null);
+  const lastSeqRef = useRef(0);
+  // While resuming, events are held until the server confirms the replay
+  const resumingRef = useRef(false);
+  const heldEventsRef = useRef<WebSocketMessage[]>([]);
+  const subscribersRef = useRef(subscribers);
+  subscribersRef.current = subscribers;
+
   useEffect(() => {
-    const ws = new WebSocket(API_ENDPOINTS.websocket(agentId));
+    let ws: WebSocket;
+    let reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+    let reconnectAttempts = 0;
+    let closedByUs = false;
+
+    const dispatch = (message: WebSocketMessage) => {
+      setLastMessage(message);
 
-    ws.onopen = () => {
-      console.log('WebSocket connected');
-      setIsConnected(true);
+      // Notify subscribers
+      const typeSubscribers = subscribersRef.current.get(message.type);
+      if (typeSubscribers) {
+        typeSubscribers.forEach(callback => callback(message.data));
+      }
+
+      // Also notify 'all' subscribers
+      const allSubscribers = subscribersRef.current.get('all');
+      if (allSubscribers) {
+        allSubscribers.forEach(callback => callback(message));
+      }
     };
 
-    ws.onmessage = (event) => {
-      try {
-        const message: WebSocketMessage = JSON.parse(event.data);
-        setLastMessage(message);
-        
-        // Notify subscribers
-        const typeSubscribers = subscribers.get(message.type);
-        if (typeSubscribers) {
-          typeSubscribers.forEach(callback => callback(message.data));
+    // Apply a sequenced event once, in order; unsequenced events (typing) pass through
+    const applyEvent = (message: WebSocketMessage) => {
+      if (message.seq !== undefined) {
+        if (message.seq <= lastSeqRef.current) return;
+        lastSeqRef.current = message.seq;
+      }
+      dispatch(message);
+    };
+
+    const flushHeldEvents = () => {
+      const held = heldEventsRef.current.sort((a, b) => (a.seq ?? 0) - (b.seq ?? 0));
+      heldEventsRef.current = [];
+      resumingRef.current = false;
+      held.forEach(applyEvent);
+    };
+
+    const handleMessage = (message: WebSocketMessage) => {
+      switch (message.type) {
+        case 'ping':
+          // Server heartbeat: answer so the connection is not reaped as idle
+          ws.send(JSON.stringify({ type: 'pong', data: {} }));
+          return;
+        case 'connected': {
+          const { stream_id, seq } = message.data as { stream_id: string; seq: number };
+          if (streamIdRef.current && lastSeqRef.current > 0) {
+            // Reconnect: ask only for the events we missed
+            resumingRef.current = true;
+            ws.send(JSON.stringify({
+              type: 'resume',
+              data: { stream_id: streamIdRef.current, last_seq: lastSeqRef.current },
+            }));
+          } else {
+            streamIdRef.current = stream_id;
+            lastSeqRef.current = seq;
+          }
+          dispatch(message);
+          return;
         }
-        
-        // Also notify 'all' subscribers
-        const allSubscribers = subscribers.get('all');
-        if (allSubscribers) {
-          allSubscribers.forEach(callback => callback(message));
+        case 'resumed':
+          flushHeldEvents();
+          dispatch(message);
+          return;
+        case 'resync_required': {
+          // Gap is older than the server buffer: start over from the current position
+          const { stream_id, seq } = message.data as { stream_id: string; seq: number };
+          streamIdRef.current = stream_id;
+          lastSeqRef.current = seq;
+          heldEventsRef.current = heldEventsRef.current.filter(held => (held.seq ?? 0) > seq);
+          flushHeldEvents();
+          dispatch(message);
+          return;
         }
-      } catch (error) {
-        console.error('Error parsing WebSocket message:', error);
       }
-    };
 
-    ws.onclose = () => {
-      console.log('WebSocket disconnected');
-      setIsConnected(false);
+      if (resumingRef.current) {
+        heldEventsRef.current.push(message);
+      } else {
+        applyEvent(message);
+      }
     };
 
-    ws.onerror = (error) => {
-      console.error('WebSocket error:', error);
+    const connect = () => {
+      ws = new WebSocket(API_ENDPOINTS.websocket(agentId));
+
+      ws.onopen = () => {
+        console.log('WebSocket connected');
+        reconnectAttempts = 0;
+        setIsConnected(true);
+      };
+
+      ws.onmessage = (event) => {
+        try {
+          handleMessage(JSON.parse(event.data));
+        } catch (error) {
+          console.error('Error parsing WebSocket message:', error);
+        }
+      };
+
+      ws.onclose = () => {
+        console.log('WebSocket disconnected');
+        setIsConnected(false);
+        resumingRef.current = false;
+        heldEventsRef.current = [];
+        if (closedByUs) return;
+
+        // Exponential backoff with jitter so agents do not reconnect in lockstep after a deploy
+        const delay = Math.min(30000, 1000 * 2 ** reconnectAttempts) * (0.5 + Math.random());
+        reconnectAttempts += 1;
+        reconnectTimer = setTimeout(connect, delay);
+      };
+
+      ws.onerror = (error) => {
+        console.error('WebSocket error:', error);
+      };
+
+      setSocket(ws);
     };
 
-    setSocket(ws);
+    connect();
 
     // Ping to keep connection alive
     const pingInterval = setInterval(() => {
@@ -72,35 +166,15 @@ export function WebSocketProvider({ children, agentId }: WebSocketProviderProps)
     }, 30000);
 
     return () => {
+      closedByUs = true;
       clearInterval(pingInterval);
+      if (reconnectTimer) clearTimeout(reconnectTimer);
       ws.close();
+      streamIdRef.current = null;
+      lastSeqRef.current = 0;
     };
   }, [agentId]);
 
-  // Update subscribers ref when it changes
-  useEffect(() => {
-    if (socket) {
-      socket.onmessage = (event) => {
-        try {
-          const message: WebSocketMessage = JSON.parse(event.data);
-          setLastMessage(message);
-          
-          const typeSubscribers = subscribers.get(message.type);
-          if (typeSubscribers) {
-            typeSubscribers.forEach(callback => callback(message.data));
-          }
-          
-          const allSubscribers = subscribers.get('all');
-          if (allSubscribers) {
-            allSubscribers.forEach(callback => callback(message));
-          }
-        } catch (error) {
-          console.error('Error parsing WebSocket message:', error);
-        }
-      };
-    }
-  }, [socket, subscribers]);
-
   const sendMessage = useCallback((message: WebSocketMessage) => {
     if (socket && socket.readyState === WebSocket.OPEN) {
       socket.send(JSON.stringify(message));
@@ -172,3 +246,45 @@ export function useNewConversations(callback: (data: NewConversationEvent) => vo
     return subscribe('new_conversation', callback as (data: unknown) => void);
   }, [subscribe, callback]);
 }
+
+export function useMessagesRead(callback: (data: MessagesReadEvent) => void) {
+  const { subscribe } = useWebSocket();
+  
+  useEffect(() => {
+    return subscribe('messages_read', callback as (data: unknown) => void);
+  }, [subscribe, callback]);
+}
+
+export function useConversationsArchived(callback: (data: ConversationsArchivedEvent) => void) {
+  const { subscribe } = useWebSocket();
+  
+  useEffect(() => {
+    return subscribe('conversations_archived', callback as (data: unknown) => void);
+  }, [subscribe, callback]);
+}
+
+// Live inbox view: a snapshot after subscribe_inbox (or a reload), then diffs
+export function useInboxSnapshots(callback: (data: InboxSnapshotEvent) => void) {
+  const { subscribe } = useWebSocket();
+  
+  useEffect(() => {
+    return subscribe('inbox_snapshot', callback as (data: unknown) => void);
+  }, [subscribe, callback]);
+}
+
+export function useInboxDiffs(callback: (data: InboxDiffEvent) => void) {
+  const { subscribe } = useWebSocket();
+  
+  useEffect(() => {
+    return subscribe('inbox_diff', callback as (data: unknown) => void);
+  }, [subscribe, callback]);
+}
+
+// Fired when the server could not replay missed events and state must be refetched
+export function useResyncRequired(callback: () => void) {
+  const { subscribe } = useWebSocket();
+  
+  useEffect(() => {
+    return subscribe('resync_required', callback as (data: unknown) => void);
+  }, [subscribe, callback]);
+}
@@ -52,11 +52,10 @@ source venv/bin/activate
 echo "Installing Python dependencies..."
 pip install -r requirements.txt -q
 
-# Run seed script if database doesn't exist
-if [ ! -f "branch_messaging.db" ]; then
-    echo "Seeding database with sample data..."
-    python data/seed.py
-fi
+# Create missing tables, upgrade the schema of an existing database and
+# load sample data into an empty one
+echo "Setting up database..."
+python -m app.cli seed
 
 # Start backend in background
 echo "Starting backend server..."